@@ -0,0 +1,448 @@
+"""
+Benchmarks for the 5GSliceNet generator.
+
+Usage:
+    python benchmark.py templates [--rounds N]
+    python benchmark.py yaml [--slices N]
+    python benchmark.py copy [--slices N] [--workers N]
+    python benchmark.py values [--slices N] [--mode MODE]
+    python benchmark.py placement [--gnbs N] [--sites N] [--upfs N]
+    python benchmark.py subscribers [--count N] [--chunk-size N]
+    python benchmark.py suite [--sizes N ...] [--modes MODE ...] [--output FILE]
+                              [--baseline FILE] [--threshold RATIO]
+"""
+import argparse
+import contextlib
+import copy
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import yaml
+
+from network.backends import MemoryBackend
+from network.function import AMF, AUSF, CHF, NRF, NSSF, PCF, SMF, UDM, UDR, UPF, WebUI, MongoDB
+from network.identifiers import PLMN, Guami, TAI, NSSAI, NssaiInPlmn, PfcpForSMF, PfcpForUPF, DNN
+from network.placement import UpfPlacement, np as placement_numpy
+from network.slice_nets import SliceNetModeOne, SliceNetModeTwo, SliceNetModeThree, SliceNetModeFour
+from network.subscribers import SUBSCRIBER_FORMATS, SubscriberGenerator
+from network.templates import templates
+from network.utils import ConfigUtils, PyYamlDumper, YamlDumper, YamlLoader, DEFAULT_WORKERS
+
+MODES = {
+    "mode1": lambda n: SliceNetModeOne(n, ["internet"] * n),
+    "mode2": lambda n: SliceNetModeTwo(n, ["internet"] * n),
+    "mode3": lambda n: SliceNetModeThree(1, ["internet"], n),
+    "mode4": lambda n: SliceNetModeFour(n, ["internet"] * n),
+}
+
+FIXTURE_CHARTS = ["common", "free5gc", "free5gc-amf", "free5gc-ausf", "free5gc-chf", "free5gc-nrf",
+                  "free5gc-nssf", "free5gc-pcf", "free5gc-smf", "free5gc-smf-ulcl", "free5gc-udm",
+                  "free5gc-udr", "free5gc-upf", "free5gc-webui", "mongodb", "ueransim-gnb"]
+
+
+def make_fixture_charts(root, files_per_chart=30, file_size=4096):
+    """
+    Create a stand-in for the basic charts repository under `root/charts`, so that
+    `configure()` can be benchmarked without a checkout of 5gc-basic-charts.
+    """
+    for chart in FIXTURE_CHARTS:
+        chart_dir = os.path.join(root, "charts", chart)
+        os.makedirs(os.path.join(chart_dir, "templates"), exist_ok=True)
+        ConfigUtils.write_yaml({"apiVersion": "v2", "name": chart, "version": "0.1.0"},
+                               os.path.join(chart_dir, "Chart.yaml"))
+        ConfigUtils.write_yaml({"enabled": True}, os.path.join(chart_dir, "values.yaml"))
+        for i in range(files_per_chart):
+            with open(os.path.join(chart_dir, "templates", f"resource{i}.yaml"), "w") as file:
+                file.write("#" * file_size)
+
+
+@contextlib.contextmanager
+def fixture_workdir(files_per_chart=30):
+    """
+    Run the body inside a temporary directory holding fixture charts.
+    """
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as root:
+        make_fixture_charts(root, files_per_chart)
+        os.chdir(root)
+        try:
+            yield root
+        finally:
+            os.chdir(cwd)
+
+
+def nf_factories():
+    plmn = PLMN("999", "70")
+    nssai_in_plmn = NssaiInPlmn(plmn, [NSSAI()])
+    return {
+        "amf": lambda: AMF("amf", [Guami(plmn, "cafe00")], [TAI(plmn)], [nssai_in_plmn], ["internet"]),
+        "ausf": lambda: AUSF("ausf", [plmn]),
+        "chf": lambda: CHF("chf"),
+        "nrf": lambda: NRF("nrf", plmn),
+        "nssf": lambda: NSSF("nssf", [plmn], [nssai_in_plmn]),
+        "pcf": lambda: PCF("pcf"),
+        "smf": lambda: SMF("smf", [], [plmn], PfcpForSMF(), [], []),
+        "udm": lambda: UDM("udm"),
+        "udr": lambda: UDR("udr"),
+        "upf": lambda: UPF("upf", PfcpForUPF(), [DNN("internet", "10.60.0.0/16")]),
+        "webui": lambda: WebUI("webui"),
+        "mongodb": lambda: MongoDB("mongodb"),
+    }
+
+
+def time_per_call(func, rounds, before_each=None):
+    elapsed = 0.0
+    for _ in range(rounds):
+        if before_each is not None:
+            before_each()
+        start = time.perf_counter()
+        func()
+        elapsed += time.perf_counter() - start
+    return elapsed / rounds
+
+
+def bench_templates(rounds):
+    """
+    Construction time per NF with a cold template cache (parse on every construction,
+    the behaviour before the registry) and with a warm one.
+    """
+    results = {}
+    for nf_type, factory in nf_factories().items():
+        cold = time_per_call(factory, rounds, before_each=templates.clear)
+        factory()
+        warm = time_per_call(factory, rounds)
+        results[nf_type] = {"cold_ms": cold * 1000, "warm_ms": warm * 1000}
+    print(f"{'nf':<10}{'cold (ms)':>12}{'warm (ms)':>12}{'speedup':>10}")
+    for nf_type, result in results.items():
+        print(f"{nf_type:<10}{result['cold_ms']:>12.3f}{result['warm_ms']:>12.3f}"
+              f"{result['cold_ms'] / result['warm_ms']:>9.1f}x")
+    return results
+
+
+def bench_yaml(slices):
+    """
+    Compare the pure Python yaml path with the libyaml one on the umbrella values of every mode.
+    Their output is checked to be byte-identical by tests/test_yaml_dumpers.py.
+    """
+    if YamlLoader is yaml.SafeLoader:
+        print("PyYAML is built without libyaml, nothing to compare")
+        return
+    print(f"{'mode':<8}{'bytes':>10}{'dump py (ms)':>14}{'dump c (ms)':>13}{'load py (ms)':>14}{'load c (ms)':>13}")
+    for mode, factory in MODES.items():
+        values = copy.deepcopy(factory(slices).to_dict())
+        start = time.perf_counter()
+        text_py = ConfigUtils.dump_yaml(values, dumper=PyYamlDumper)
+        dump_py = time.perf_counter() - start
+        start = time.perf_counter()
+        text_c = ConfigUtils.dump_yaml(values, dumper=YamlDumper)
+        dump_c = time.perf_counter() - start
+        start = time.perf_counter()
+        yaml.load(text_py, Loader=yaml.SafeLoader)
+        load_py = time.perf_counter() - start
+        start = time.perf_counter()
+        yaml.load(text_py, Loader=YamlLoader)
+        load_c = time.perf_counter() - start
+        print(f"{mode:<8}{len(text_c):>10}{dump_py * 1000:>14.1f}{dump_c * 1000:>13.1f}"
+              f"{load_py * 1000:>14.1f}{load_c * 1000:>13.1f}")
+
+
+def disk_usage(path):
+    """
+    Bytes allocated for the files under `path`, counting every inode once so hard links are not double counted.
+    """
+    seen = set()
+    total = 0
+    for root, _, file_names in os.walk(path):
+        for file_name in file_names:
+            stat = os.lstat(os.path.join(root, file_name))
+            if (stat.st_dev, stat.st_ino) not in seen:
+                seen.add((stat.st_dev, stat.st_ino))
+                total += stat.st_blocks * 512
+    return total
+
+
+def bench_copy(slices, workers):
+    """
+    Chart materialization of a mode four topology, serially and through the thread pool,
+    with real copies and with files shared with the basic charts.
+    """
+    slice_net = MODES["mode4"](slices)
+    runs = [("serial copy", 1, "copy"), ("pool copy", workers, "copy"),
+            ("pool hardlink", workers, "hardlink"), ("pool auto", workers, "auto")]
+    results = {}
+    with fixture_workdir() as root:
+        charts_usage = disk_usage(os.path.join(root, "charts"))
+        for label, copy_workers, strategy in runs:
+            ConfigUtils.delete_folder(slice_net.path)
+            slice_net.copy_workers = copy_workers
+            slice_net.materialize = strategy
+            start = time.perf_counter()
+            slice_net.copy_charts()
+            elapsed = time.perf_counter() - start
+            results[label] = {"seconds": elapsed, "disk_bytes": disk_usage(root) - charts_usage}
+    charts = len(slice_net.chart_jobs)
+    print(f"{'run':<16}{'workers':>8}{'charts':>8}{'time (ms)':>12}{'disk (KiB)':>12}")
+    for (label, copy_workers, _), result in zip(runs, results.values()):
+        print(f"{label:<16}{copy_workers:>8}{charts:>8}{result['seconds'] * 1000:>12.1f}"
+              f"{result['disk_bytes'] / 1024:>12.0f}")
+    return results
+
+
+def rss_kib(field):
+    """
+    :param field: `VmRSS` for the current resident set size, `VmHWM` for its peak
+    :return: the value in KiB, or None where /proc is not available
+    """
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _values_memory(writer, mode, slices):
+    slice_net = MODES[mode](slices)
+    rss_before = rss_kib("VmRSS")
+    with tempfile.TemporaryDirectory() as root:
+        values_path = os.path.join(root, "values.yaml")
+        tracemalloc.start()
+        start = time.perf_counter()
+        if writer == "tree":
+            ConfigUtils.write_yaml(copy.deepcopy(slice_net.to_dict()), values_path)
+        else:
+            ConfigUtils.write_yaml_sections(slice_net.iter_values(), values_path)
+        elapsed = time.perf_counter() - start
+        _, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        size = os.path.getsize(values_path)
+    return {"seconds": elapsed, "bytes": size, "traced_peak_kib": traced_peak // 1024,
+            "rss_before_kib": rss_before, "peak_rss_kib": rss_kib("VmHWM")}
+
+
+def bench_values(slices, mode):
+    """
+    Memory of writing the umbrella values.yaml: the former whole-tree deep copy against the streaming writer.
+    Every writer runs in a fresh interpreter so that peak RSS is not shared between them.
+    """
+    results = {}
+    for writer in ("tree", "stream"):
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            results[writer] = executor.submit(_values_memory, writer, mode, slices).result()
+    print(f"{'writer':<8}{'bytes':>12}{'time (ms)':>12}{'traced peak (KiB)':>19}"
+          f"{'RSS before (KiB)':>18}{'peak RSS (KiB)':>16}")
+    for writer, result in results.items():
+        print(f"{writer:<8}{result['bytes']:>12}{result['seconds'] * 1000:>12.1f}{result['traced_peak_kib']:>19}"
+              f"{str(result['rss_before_kib']):>18}{str(result['peak_rss_kib']):>16}")
+    return results
+
+
+def bench_placement(gnbs, sites, upfs):
+    """
+    UPF placement on random gNB / site coordinates, latency proportional to the distance, against the former
+    placement (the first `upfs` sites, every gNB on its nearest one).
+    """
+    rng = random.Random(0)
+    gnb_points = [(rng.random(), rng.random()) for _ in range(gnbs)]
+    site_points = [(rng.random(), rng.random()) for _ in range(sites)]
+    latency = [[100 * ((gx - sx) ** 2 + (gy - sy) ** 2) ** 0.5 for sx, sy in site_points] for gx, gy in gnb_points]
+    capacity = [2 * gnbs // upfs + 1] * sites
+    placement = UpfPlacement([f"gnb{i + 1}" for i in range(gnbs)], [f"site{j + 1}" for j in range(sites)],
+                             latency, capacity)
+    start = time.perf_counter()
+    areas = placement.solve(upfs)
+    elapsed = time.perf_counter() - start
+    fixed = [min(row[:upfs]) for row in latency]
+    results = {"seconds": elapsed, "upfs": len(areas), "numpy": placement_numpy is not None,
+               "mean_ms": placement.total_latency() / gnbs, "max_ms": placement.max_latency(),
+               "fixed_mean_ms": sum(fixed) / gnbs, "fixed_max_ms": max(fixed)}
+    print(f"{gnbs} gNBs, {sites} sites, {len(areas)} UPFs placed in {elapsed * 1000:.1f} ms "
+          f"({'NumPy' if results['numpy'] else 'pure Python'})")
+    print(f"{'placement':<12}{'mean (ms)':>12}{'max (ms)':>12}")
+    print(f"{'fixed':<12}{results['fixed_mean_ms']:>12.2f}{results['fixed_max_ms']:>12.2f}")
+    print(f"{'optimized':<12}{results['mean_ms']:>12.2f}{results['max_ms']:>12.2f}")
+    return results
+
+
+def bench_subscribers(count, chunk_size):
+    """
+    Subscriber provisioning files of a 2-slice network, every document built and encoded against the documents of
+    a slice encoded once and filled in per subscriber.
+    """
+    slice_net = SliceNetModeOne(2, ["internet", "mec"])
+    results = {}
+    print(f"{'format':<8}{'encoder':<12}{'seconds':>10}{'subscribers/s':>15}")
+    for output_format in SUBSCRIBER_FORMATS:
+        for encoder in ("documents", "templates"):
+            generator = SubscriberGenerator.from_slice_net(slice_net, count, chunk_size=chunk_size)
+            backend = MemoryBackend()
+            start = time.perf_counter()
+            for part, chunk in enumerate(generator.iter_chunks()):
+                if encoder == "documents":
+                    encoded = {collection: generator.encode(documents, output_format)
+                               for collection, documents in generator.documents(chunk).items()}
+                else:
+                    encoded = generator.encode_chunk(chunk, output_format)
+                for collection, data in encoded.items():
+                    backend.write_bytes(data, f"subscribers/{collection}/part-{part:05d}.{output_format}")
+                # the parts are not kept in memory, as when they are written to the disk
+                backend.files.clear()
+            elapsed = time.perf_counter() - start
+            results[f"{output_format}_{encoder}"] = {"seconds": elapsed, "subscribers_per_second": count / elapsed}
+            print(f"{output_format:<8}{encoder:<12}{elapsed:>10.2f}{count / elapsed:>15.0f}")
+    return results
+
+
+def output_stats(path, backend=None):
+    """
+    :return: (number of files, total bytes) under `path`
+    """
+    if isinstance(backend, MemoryBackend):
+        contents = [backend.read_bytes(os.path.join(path, rel_path)) for rel_path in backend.list_files(path)]
+        return len(contents), sum(len(content) for content in contents)
+    files = 0
+    size = 0
+    for root, _, file_names in os.walk(path):
+        for file_name in file_names:
+            files += 1
+            size += os.path.getsize(os.path.join(root, file_name))
+    return files, size
+
+
+def run_case(mode, size, backend="disk"):
+    """
+    Build and configure one topology twice: once for the wall time, once under tracemalloc for the peak memory.
+    Has to run inside `fixture_workdir`.
+    :param backend: `disk`, or `memory` to generate into a MemoryBackend
+    """
+    start = time.perf_counter()
+    slice_net = MODES[mode](size)
+    if backend == "memory":
+        slice_net.backend = MemoryBackend()
+    build = time.perf_counter() - start
+    slice_net.configure()
+    configure = time.perf_counter() - start - build
+    files, output_bytes = output_stats(slice_net.path, slice_net.backend)
+    slice_net.backend.delete(slice_net.path)
+
+    tracemalloc.start()
+    slice_net = MODES[mode](size)
+    if backend == "memory":
+        slice_net.backend = MemoryBackend()
+    slice_net.configure()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    slice_net.backend.delete(slice_net.path)
+    return {"mode": mode, "size": size, "build_s": build, "configure_s": configure, "wall_s": build + configure,
+            "peak_kib": peak // 1024, "files": files, "bytes": output_bytes}
+
+
+def compare_results(results, baseline, threshold):
+    """
+    :return: list of regression messages, a metric regresses when it exceeds the baseline by more than `threshold`
+    """
+    regressions = []
+    previous = {(result["mode"], result["size"]): result for result in baseline["results"]}
+    for result in results["results"]:
+        base = previous.get((result["mode"], result["size"]))
+        if base is None:
+            continue
+        for metric in ("wall_s", "peak_kib"):
+            if base[metric] and result[metric] > base[metric] * (1 + threshold):
+                regressions.append(f"{result['mode']} size={result['size']} {metric}: "
+                                   f"{base[metric]:.3f} -> {result[metric]:.3f} "
+                                   f"(+{(result[metric] / base[metric] - 1) * 100:.0f}%)")
+    return regressions
+
+
+def bench_suite(sizes, modes, files_per_chart, backend="disk"):
+    """
+    Every mode at every size against fixture charts. For mode three the size is the number of areas.
+    """
+    results = {"meta": {"python": platform.python_version(), "platform": platform.platform(),
+                        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+                        "files_per_chart": files_per_chart, "backend": backend},
+               "results": []}
+    print(f"{'mode':<7}{'size':>6}{'build (s)':>11}{'configure (s)':>15}{'peak (KiB)':>12}{'files':>9}{'bytes':>12}",
+          flush=True)
+    with fixture_workdir(files_per_chart):
+        for mode in modes:
+            for size in sizes:
+                result = run_case(mode, size, backend)
+                results["results"].append(result)
+                print(f"{mode:<7}{size:>6}{result['build_s']:>11.3f}{result['configure_s']:>15.3f}"
+                      f"{result['peak_kib']:>12}{result['files']:>9}{result['bytes']:>12}", flush=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="5GSliceNet benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    template_parser = subparsers.add_parser("templates", help="NF construction time with and without template cache")
+    template_parser.add_argument("--rounds", type=int, default=50)
+    yaml_parser = subparsers.add_parser("yaml", help="pure Python vs libyaml load/dump, with an output parity check")
+    yaml_parser.add_argument("--slices", type=int, default=100)
+    copy_parser = subparsers.add_parser("copy", help="serial vs thread pool chart materialization")
+    copy_parser.add_argument("--slices", type=int, default=200)
+    copy_parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    values_parser = subparsers.add_parser("values", help="peak memory of the umbrella values.yaml writers")
+    values_parser.add_argument("--slices", type=int, default=1000)
+    values_parser.add_argument("--mode", choices=sorted(MODES), default="mode1")
+    placement_parser = subparsers.add_parser("placement", help="latency of the optimized UPF placement")
+    placement_parser.add_argument("--gnbs", type=int, default=1000)
+    placement_parser.add_argument("--sites", type=int, default=100)
+    placement_parser.add_argument("--upfs", type=int, default=20)
+    subscribers_parser = subparsers.add_parser("subscribers", help="bulk subscriber provisioning throughput")
+    subscribers_parser.add_argument("--count", type=int, default=100000)
+    subscribers_parser.add_argument("--chunk-size", type=int, default=10000)
+    suite_parser = subparsers.add_parser("suite", help="all modes at several scales, with baseline comparison")
+    suite_parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000])
+    suite_parser.add_argument("--modes", nargs="+", choices=sorted(MODES), default=sorted(MODES))
+    suite_parser.add_argument("--files-per-chart", type=int, default=5, help="template files of each fixture chart")
+    suite_parser.add_argument("--backend", choices=("disk", "memory"), default="disk",
+                              help="generate to the disk or to an in-memory backend")
+    suite_parser.add_argument("--output", help="write the results to this JSON file")
+    suite_parser.add_argument("--baseline", help="JSON results of a previous run to compare with")
+    suite_parser.add_argument("--threshold", type=float, default=0.2,
+                              help="allowed relative slowdown or memory growth before failing, 0.2 is 20%%")
+    args = parser.parse_args()
+    if args.command == "templates":
+        bench_templates(args.rounds)
+    elif args.command == "yaml":
+        bench_yaml(args.slices)
+    elif args.command == "copy":
+        bench_copy(args.slices, args.workers)
+    elif args.command == "values":
+        bench_values(args.slices, args.mode)
+    elif args.command == "placement":
+        bench_placement(args.gnbs, args.sites, args.upfs)
+    elif args.command == "subscribers":
+        bench_subscribers(args.count, args.chunk_size)
+    elif args.command == "suite":
+        results = bench_suite(args.sizes, args.modes, args.files_per_chart, args.backend)
+        if args.output:
+            with open(args.output, "w") as file:
+                json.dump(results, file, indent=2)
+        if args.baseline:
+            with open(args.baseline) as file:
+                regressions = compare_results(results, json.load(file), args.threshold)
+            for regression in regressions:
+                print(f"REGRESSION {regression}")
+            if regressions:
+                sys.exit(1)
+            print("no regression against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Output backends, where a SliceNet writes the files of a deployment.
+
+`DiskBackend` writes to the local filesystem. `MemoryBackend` keeps every file in a dict of path -> bytes, so a
+topology can be generated and inspected without any disk I/O, e.g. in tests, benchmarks or a service.
+Paths are the ones the SliceNets build from their `path`, the basic charts are always read from disk.
+"""
+import abc
+import errno
+import os
+import threading
+from abc import ABC
+
+import yaml
+
+from network.manifest import hash_bytes, hash_file
+from network.telemetry import logger, telemetry
+from network.utils import ConfigUtils, MATERIALIZE_STRATEGIES, YamlLoader
+
+
+class OutputBackend(ABC):
+    @abc.abstractmethod
+    def write_bytes(self, content, path):
+        pass
+
+    @abc.abstractmethod
+    def read_bytes(self, path):
+        """
+        :raise FileNotFoundError: when there is no file at `path`
+        """
+
+    @abc.abstractmethod
+    def isfile(self, path):
+        pass
+
+    @abc.abstractmethod
+    def delete(self, path):
+        """
+        Remove a file or a whole folder, nothing happens when `path` does not exist.
+        """
+
+    @abc.abstractmethod
+    def remove_file(self, path, root):
+        """
+        Remove a file, and the folders left empty by it up to `root`.
+        """
+
+    @abc.abstractmethod
+    def copy_file(self, src, dest, strategy="copy"):
+        """
+        :param src: file on the local disk
+        :param strategy: one of MATERIALIZE_STRATEGIES
+        """
+
+    @abc.abstractmethod
+    def copy_folder(self, src_folder, dest_folder, strategy="copy"):
+        pass
+
+    def digest(self, path):
+        return hash_bytes(self.read_bytes(path))
+
+    def write_yaml(self, data, path):
+        self.write_bytes(ConfigUtils.dump_yaml(data).encode(), path)
+
+    def write_yaml_sections(self, sections, path):
+        self.write_bytes("".join(ConfigUtils.dump_yaml({key: value}) for key, value in sections).encode(), path)
+
+    def load_yaml(self, path):
+        return yaml.load(self.read_bytes(path), Loader=YamlLoader)
+
+
+class DiskBackend(OutputBackend):
+    """
+    The local filesystem, folders are created as files are written into them.
+    """
+
+    @classmethod
+    def _makedirs(cls, path):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+    def write_bytes(self, content, path):
+        self._makedirs(path)
+        ConfigUtils.write_file(content, path)
+
+    def read_bytes(self, path):
+        with open(path, 'rb') as file:
+            return file.read()
+
+    def isfile(self, path):
+        return os.path.isfile(path)
+
+    def delete(self, path):
+        if os.path.isfile(path):
+            logger.debug("Deleting %s", path)
+            os.remove(path)
+        else:
+            ConfigUtils.delete_folder(path)
+
+    def remove_file(self, path, root):
+        if os.path.isfile(path):
+            os.remove(path)
+        folder = os.path.dirname(path)
+        while os.path.abspath(folder) != os.path.abspath(root) and not os.listdir(folder):
+            os.rmdir(folder)
+            folder = os.path.dirname(folder)
+
+    def copy_file(self, src, dest, strategy="copy"):
+        self._makedirs(dest)
+        ConfigUtils.copy_file(src, dest, strategy)
+
+    def copy_folder(self, src_folder, dest_folder, strategy="copy"):
+        ConfigUtils.copy_folder(src_folder, dest_folder, strategy)
+
+    def digest(self, path):
+        return hash_file(path)
+
+    def write_yaml(self, data, path):
+        self._makedirs(path)
+        ConfigUtils.write_yaml(data, path)
+
+    def write_yaml_sections(self, sections, path):
+        self._makedirs(path)
+        ConfigUtils.write_yaml_sections(sections, path)
+
+    def load_yaml(self, path):
+        return ConfigUtils.load_yaml(path)
+
+
+class MemoryBackend(OutputBackend):
+    """
+    Files kept in `files`, a dict of normalized path -> bytes. The content of a basic chart file is read once and
+    shared by all its copies, the materialize strategy does not matter here.
+    """
+
+    def __init__(self):
+        self.files = {}
+        self._sources = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def _key(cls, path):
+        return os.path.normpath(path).replace(os.sep, "/")
+
+    def write_bytes(self, content, path):
+        content = bytes(content)
+        with self._lock:
+            self.files[self._key(path)] = content
+        telemetry.count("files_written")
+        telemetry.count("bytes_written", len(content))
+
+    def read_bytes(self, path):
+        try:
+            return self.files[self._key(path)]
+        except KeyError:
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), path) from None
+
+    def isfile(self, path):
+        return self._key(path) in self.files
+
+    def delete(self, path):
+        key = self._key(path)
+        prefix = f"{key}/"
+        with self._lock:
+            for file_key in [file_key for file_key in self.files if file_key == key or file_key.startswith(prefix)]:
+                del self.files[file_key]
+
+    def remove_file(self, path, root):
+        with self._lock:
+            self.files.pop(self._key(path), None)
+
+    def _source(self, src):
+        stat = os.stat(src)
+        entry = self._sources.get(src)
+        if entry is None or entry[0] != (stat.st_mtime_ns, stat.st_size):
+            with open(src, 'rb') as file:
+                entry = ((stat.st_mtime_ns, stat.st_size), file.read())
+            self._sources[src] = entry
+        return entry[1]
+
+    def copy_file(self, src, dest, strategy="copy"):
+        if strategy not in MATERIALIZE_STRATEGIES:
+            raise ValueError(f"Unknown materialize strategy '{strategy}', expected one of {MATERIALIZE_STRATEGIES}")
+        content = self._source(src)
+        with self._lock:
+            self.files[self._key(dest)] = content
+        telemetry.count("files_linked")
+
+    def copy_folder(self, src_folder, dest_folder, strategy="copy"):
+        if not os.path.isdir(src_folder):
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), src_folder)
+        for root, _, file_names in os.walk(src_folder):
+            for file_name in file_names:
+                src = os.path.join(root, file_name)
+                self.copy_file(src, os.path.join(dest_folder, os.path.relpath(src, src_folder)), strategy)
+
+    def list_files(self, root=""):
+        """
+        :return: sorted paths of the files under `root`, relative to it
+        """
+        if not root:
+            return sorted(self.files)
+        prefix = f"{self._key(root)}/"
+        return sorted(key[len(prefix):] for key in self.files if key.startswith(prefix))
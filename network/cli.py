@@ -0,0 +1,231 @@
+"""
+Command-line entry point of the generator.
+
+Usage:
+    python -m network.cli batch <spec.yaml> [--workers N] [--verbose]
+                                [--metrics-json FILE] [--metrics-prom FILE]
+
+A batch spec lists the deployments to generate, either explicitly or as a matrix whose cross product is expanded:
+
+    output: generated              # parent folder of the default job paths
+    workers: 4                     # size of the process pool, defaults to the number of CPUs
+    defaults:                      # merged into every job
+      materialize: hardlink
+    jobs:
+      - {mode: 3, slices: 1, area_num: 4, dnn_names: [internet], path: generated/nearby}
+    matrix:
+      mode: [1, 2, 4]
+      slices: [1, 10, 100]
+      dnn_names: [[internet], [internet, mec]]
+
+Job keys:
+
+    mode                1 to 4, see SLICE_NET_MODES
+    slices              number of slices
+    dnn_names           DNN of every slice, repeated to the number of slices when shorter
+    path                output folder, `<output>/<index>_mode<mode>_<slices>slices` by default
+    area_num            mode 3, number of areas, or the maximum number of UPFs with `placement`
+    placement           mode 3, `gnbs`, `sites`, `latency` and optionally `capacity` and `demand`
+                        (network/placement.py)
+    demands             `subscribers`, `sessions_per_second` and `throughput_mbps` of every slice, or a list of one
+                        dict per slice, sizing the `replicaCount` and `resources` of the NFs (network/sizing.py)
+    upf_replicas        modes 1 and 2, UPFs of every slice, or a list of one number per slice
+    dataplane_profile   `throughput` or `latency` preset of the UPFs of every slice, a list of one name or null per
+                        slice, or a dict of S-NSSAI or UPF name -> name (network/dataplane.py)
+    subscribers         `count`, a total or a list of one number per slice, and optionally `format` (`jsonl` or
+                        `bson`), `seed`, `chunk_size`, `start_msin` and `path`, `<path>/subscribers` by default
+                        (network/subscribers.py)
+    ran                 UERANSIM gNB charts and UEs: optionally `gnbs`, `ues` and `seed` (network/ran.py); their
+                        subscribers are written as with `subscribers`, which then needs no `count`
+    seed                seed of the S-NSSAI allocation
+    incremental         only rewrite the files whose content changed
+    materialize         one of MATERIALIZE_STRATEGIES (network/utils.py)
+    values_output       `umbrella` or `subcharts`
+    release_size        slices of each slice-group release
+    copy_workers        threads copying the charts
+    archive             path of the packaged umbrella chart written instead of `path`, `-` for stdout
+"""
+import argparse
+import itertools
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from network.identifiers import NssaiAllocator
+from network.placement import UpfPlacement
+from network.sizing import SliceDemand
+from network.slice_nets import SliceNetModeOne, SliceNetModeTwo, SliceNetModeThree, SliceNetModeFour
+from network.subscribers import SubscriberGenerator
+from network.telemetry import telemetry
+from network.templates import templates
+from network.utils import ConfigUtils
+
+SLICE_NET_MODES = {1: SliceNetModeOne, 2: SliceNetModeTwo, 3: SliceNetModeThree, 4: SliceNetModeFour}
+
+
+def expand_jobs(spec):
+    """
+    :param spec: parsed batch spec
+    :return: list of job dicts, explicit jobs first, then the matrix in cross product order
+    """
+    output = spec.get("output", "generated")
+    defaults = spec.get("defaults", {})
+    jobs = [dict(defaults, **job) for job in spec.get("jobs", [])]
+    matrix = spec.get("matrix")
+    if matrix:
+        keys = list(matrix)
+        for values in itertools.product(*(matrix[key] for key in keys)):
+            jobs.append(dict(defaults, **dict(zip(keys, values))))
+    for index, job in enumerate(jobs):
+        if job.get("mode") not in SLICE_NET_MODES:
+            raise ValueError(f"Job {index}: unknown mode {job.get('mode')}, expected one of {list(SLICE_NET_MODES)}")
+        job.setdefault("slices", 1)
+        job.setdefault("dnn_names", ["internet"])
+        job.setdefault("path", os.path.join(output, f"{index:04d}_mode{job['mode']}_{job['slices']}slices"))
+    return jobs
+
+
+def build_slice_net(job):
+    slices = job["slices"]
+    dnn_names = [name for _, name in zip(range(slices), itertools.cycle(job["dnn_names"]))]
+    allocator = NssaiAllocator(seed=job.get("seed"))
+    if job["mode"] == 3:
+        placement = UpfPlacement.from_dict(job["placement"]) if job.get("placement") else None
+        slice_net = SliceNetModeThree(slices, dnn_names, job.get("area_num", 1), path=job["path"],
+                                      nssai_allocator=allocator, placement=placement)
+    elif job["mode"] in (1, 2):
+        slice_net = SLICE_NET_MODES[job["mode"]](slices, dnn_names, path=job["path"], nssai_allocator=allocator,
+                                                 upf_replicas=job.get("upf_replicas", 1))
+    else:
+        slice_net = SLICE_NET_MODES[job["mode"]](slices, dnn_names, path=job["path"], nssai_allocator=allocator)
+    slice_net.materialize = job.get("materialize", slice_net.materialize)
+    slice_net.values_output = job.get("values_output", slice_net.values_output)
+    slice_net.release_size = job.get("release_size", slice_net.release_size)
+    slice_net.copy_workers = job.get("copy_workers", slice_net.copy_workers)
+    if job.get("demands"):
+        demands = job["demands"]
+        if isinstance(demands, dict):
+            demands = [demands] * len(slice_net.slice_nssais())
+        slice_net.size_resources([SliceDemand.from_dict(demand) for demand in demands])
+    if job.get("dataplane_profile"):
+        slice_net.apply_dataplane_profiles(job["dataplane_profile"])
+    if job.get("ran"):
+        ran = job["ran"]
+        slice_net.create_ran(ran.get("gnbs"), ran.get("ues", 0), ran.get("seed"))
+    return slice_net
+
+
+def write_subscribers(slice_net, job):
+    """
+    Write the subscribers of the `subscribers` key of the job, the ones of the UEs of the RAN when it has no `count`.
+    :return: number of subscribers written
+    """
+    spec = dict(job.get("subscribers") or {})
+    path = spec.pop("path", os.path.join(job["path"], "subscribers"))
+    output_format = spec.pop("format", "jsonl")
+    if "count" not in spec and slice_net.ue_subscribers is not None:
+        generator = slice_net.ue_subscribers
+        generator.chunk_size = spec.get("chunk_size", generator.chunk_size)
+    else:
+        generator = SubscriberGenerator.from_slice_net(slice_net, spec.pop("count"), **spec)
+    return generator.write(path, output_format)
+
+
+def run_job(job):
+    """
+    Generate one deployment.
+    :return: dict with the job, timings in seconds, the telemetry of the job and the error message when it failed
+    """
+    result = {"job": job, "build": 0.0, "configure": 0.0, "error": None}
+    telemetry.reset()
+    start = time.perf_counter()
+    try:
+        slice_net = build_slice_net(job)
+        result["build"] = time.perf_counter() - start
+        slice_net.configure(incremental=job.get("incremental", False), archive=job.get("archive"))
+        result["configure"] = time.perf_counter() - start - result["build"]
+        if slice_net.sizing is not None:
+            result["sizing"] = slice_net.sizing.to_dict()
+        if job.get("subscribers") or slice_net.ue_subscribers is not None:
+            result["subscribers"] = write_subscribers(slice_net, job)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["total"] = time.perf_counter() - start
+    result["telemetry"] = telemetry.to_dict()
+    return result
+
+
+def run_batch(jobs, workers=None):
+    """
+    Fan the jobs out over a process pool. The templates are parsed once in this process,
+    forked workers inherit the parsed copies. The telemetry of the jobs is merged into this process.
+    When a worker dies, its job and the jobs it left unfinished are reported as failed.
+    :return: results in job order
+    """
+    templates.preload()
+    telemetry.reset()
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    results = [None] * len(jobs)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = {executor.submit(run_job, job): index for index, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                results[index] = result = future.result()
+            except BrokenProcessPool as e:
+                # A worker died, e.g. killed for lack of memory: its job and the ones still queued fail.
+                results[index] = result = {"job": jobs[index], "build": 0.0, "configure": 0.0, "total": 0.0,
+                                           "error": f"{type(e).__name__}: {e}", "telemetry": None}
+            if result["telemetry"] is not None:
+                telemetry.merge(result["telemetry"])
+            status = "FAILED " + result["error"] if result["error"] else "ok"
+            print(f"[{index + 1}/{len(jobs)}] mode{result['job']['mode']} slices={result['job']['slices']} "
+                  f"-> {result['job']['path']}: build {result['build']:.2f}s, configure {result['configure']:.2f}s, "
+                  f"total {result['total']:.2f}s {status}", flush=True)
+    return results
+
+
+def print_summary(results, elapsed):
+    failed = [result for result in results if result["error"]]
+    busy = sum(result["total"] for result in results)
+    print(f"{len(results)} job(s), {len(results) - len(failed)} succeeded, {len(failed)} failed "
+          f"in {elapsed:.2f}s wall time ({busy:.2f}s of job time)")
+    for result in failed:
+        print(f"  {result['job']['path']}: {result['error']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m network.cli", description="5GSliceNet deployment generator")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    batch_parser = subparsers.add_parser("batch", help="generate every deployment of a batch spec")
+    batch_parser.add_argument("spec", help="yaml or json batch spec")
+    batch_parser.add_argument("--workers", type=int, help="size of the process pool, overrides the spec")
+    batch_parser.add_argument("--verbose", action="store_true", help="log the steps of the generator")
+    batch_parser.add_argument("--metrics-json", help="export the aggregated telemetry as JSON")
+    batch_parser.add_argument("--metrics-prom", help="export the aggregated telemetry as a Prometheus textfile")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING,
+                        format="%(asctime)s %(process)d %(levelname)s %(name)s: %(message)s")
+
+    spec = ConfigUtils.load_yaml(args.spec)
+    try:
+        jobs = expand_jobs(spec)
+    except ValueError as e:
+        parser.error(str(e))
+    start = time.perf_counter()
+    results = run_batch(jobs, args.workers or spec.get("workers"))
+    print_summary(results, time.perf_counter() - start)
+    if args.metrics_json:
+        telemetry.export_json(args.metrics_json)
+    if args.metrics_prom:
+        telemetry.export_prometheus(args.metrics_prom)
+    return 1 if any(result["error"] for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,10 @@
 import copy
-import os
 
 from network.function import AMF
 from network.identifiers import NssaiInPlmn
+from network.templates import templates
 from network.utils import ConfigUtils
 
-project_root = os.path.dirname(os.path.abspath(__file__))
-
 
 def get_amf_served_guami_list(plmns):
     served_guami_list = []
@@ -39,8 +37,7 @@ def configure_amf(plmns, nssai_lists, supported_tai_list, dnn_list, locality="ar
     :param nrf_uri: NRF的URI地址
     :return:
     """
-    path = os.path.join(project_root, '../templates/free5gc/amf.yaml')
-    values_yaml = ConfigUtils.load_yaml(path)
+    values_yaml = templates.get("amf")
     # 配置容器配置
     # 获得基本参数
     supported_nssai_in_plmn_list = [
@@ -65,7 +62,7 @@ def configure_amf(plmns, nssai_lists, supported_tai_list, dnn_list, locality="ar
 
 
 def configure_nssf(plmns, nssai_lists, locality="area1", name="NSSF", register_ipv4="", binding_ipv4="", nrf_uri=""):
-    value_yaml = ConfigUtils.load_yaml("../templates/free5gc/nssf.yaml")
+    value_yaml = templates.get("nssf")
     supported_nssai_in_plmn_list = [
         NssaiInPlmn(plmn, nssai_list) for plmn, nssai_list in zip(plmns, nssai_lists)
     ]
@@ -99,7 +96,7 @@ def configure_smf_up_infos():
 
 def configure_smf(nssais, dnn_infos_list, plmns, up_nodes, locality="area1", ulcl=False, name="SMF2", sbi_register_ipv4="",
                   sbi_binding_ipv4="", nrf_uri=""):
-    values_yaml = ConfigUtils.load_yaml("../templates/free5gc/smf.yaml")
+    values_yaml = templates.get("smf")
     values_yaml["smf"]["config"] = {
         "smfName": name,
         "sbi": {
@@ -128,7 +125,7 @@ def configure_upf(dnns, locality="area1", pfcp_addr="", pfcp_node_id="", gtpu_if
     :param gtpu_if_list_name: GTPU接口列表名称
     :return:
     """
-    values_yaml = ConfigUtils.load_yaml("../templates/free5gc/upf.yaml")
+    values_yaml = templates.get("upf")
     values_yaml["upf"]["config"] = {
         "pfcp": {
             "addr": pfcp_addr,
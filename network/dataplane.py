@@ -0,0 +1,86 @@
+"""
+Dataplane profiles of the UPF charts, the pod settings the forwarding throughput and latency depend on.
+
+A profile gives the UPF pod the Guaranteed QoS class (integer CPUs with requests equal to limits, so that the
+static CPU manager pins it to exclusive cores and the topology manager can keep them on one NUMA node), hugepages,
+a node selector for the nodes with the `gtp5g` kernel module, pod sysctls and the MTU of the N3 / N6 interfaces.
+The namespaced sysctls outside the kubelet safe set have to be allowed with `--allowed-unsafe-sysctls`.
+"""
+
+
+class DataplaneProfile:
+    # Label of the nodes with the gtp5g kernel module installed
+    GTP5G_NODE_LABEL = "5gslicenet/gtp5g"
+
+    def __init__(self, name, cpus, memory, hugepages=None, hugepage_size="2Mi", n3_mtu=1500, n6_mtu=1500,
+                 sysctls=None, node_selector=None, annotations=None):
+        """
+        :param name: preset name, e.g. `throughput`
+        :param cpus: whole CPUs of the UPF container, requested and limited alike
+        :param memory: memory of the UPF container, e.g. "2Gi"
+        :param hugepages: hugepages of the UPF container, e.g. "1Gi", none when None
+        :param hugepage_size: `2Mi` or `1Gi`
+        :param n3_mtu: MTU of the N3 interface (towards the gNBs)
+        :param n6_mtu: MTU of the N6 interface (towards the data network)
+        :param sysctls: dict of pod sysctl -> value, added to the ones every UPF needs
+        :param node_selector: node labels, the gtp5g label when None
+        :param annotations: pod annotations, e.g. for the CRI-O CPU load balancing
+        """
+        if int(cpus) != cpus or cpus < 1:
+            raise ValueError(f"Profile {name}: the Guaranteed QoS class needs whole CPUs, got {cpus}")
+        self.name = name
+        self.cpus = int(cpus)
+        self.memory = memory
+        self.hugepages = hugepages
+        self.hugepage_size = hugepage_size
+        self.n3_mtu = n3_mtu
+        self.n6_mtu = n6_mtu
+        self.sysctls = {"net.ipv4.ip_forward": "1", "net.ipv4.conf.all.rp_filter": "0"}
+        self.sysctls.update(sysctls or {})
+        self.node_selector = node_selector if node_selector is not None else {self.GTP5G_NODE_LABEL: "true"}
+        self.annotations = annotations or {}
+
+    @classmethod
+    def get(cls, profile):
+        """
+        :param profile: DataplaneProfile or the name of a preset in PROFILES
+        """
+        if isinstance(profile, DataplaneProfile):
+            return profile
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown dataplane profile '{profile}', expected one of {sorted(PROFILES)}")
+        return PROFILES[profile]
+
+    def to_values(self):
+        """
+        :return: a new dict of the settings, merged over the `upf` section of the values
+        """
+        quantities = {"cpu": str(self.cpus), "memory": self.memory}
+        if self.hugepages is not None:
+            quantities[f"hugepages-{self.hugepage_size}"] = self.hugepages
+        values = {
+            "resources": {"requests": dict(quantities), "limits": dict(quantities)},
+            "nodeSelector": dict(self.node_selector),
+            "podSecurityContext": {"sysctls": [{"name": name, "value": str(value)}
+                                               for name, value in self.sysctls.items()]},
+            "n3if": {"mtu": self.n3_mtu},
+            "n6if": {"mtu": self.n6_mtu},
+            "dataplaneProfile": self.name,
+        }
+        if self.annotations:
+            values["podAnnotations"] = dict(self.annotations)
+        return values
+
+
+PROFILES = {
+    # Bulk traffic: more cores, jumbo frames on the transport and data network, room for larger socket buffers.
+    "throughput": DataplaneProfile("throughput", cpus=4, memory="4Gi", hugepages="2Gi", n3_mtu=9000, n6_mtu=9000,
+                                   sysctls={"net.ipv4.tcp_rmem": "4096 87380 16777216",
+                                            "net.ipv4.tcp_wmem": "4096 65536 16777216"}),
+    # Low latency: standard frames, and the cores of the pod kept out of CPU quota and IRQ load balancing (CRI-O).
+    "latency": DataplaneProfile("latency", cpus=2, memory="2Gi", hugepages="1Gi", n3_mtu=1500, n6_mtu=1500,
+                                sysctls={"net.ipv4.tcp_slow_start_after_idle": "0"},
+                                annotations={"cpu-load-balancing.crio.io": "disable",
+                                             "cpu-quota.crio.io": "disable",
+                                             "irq-load-balancing.crio.io": "disable"}),
+}
@@ -1,8 +1,10 @@
 import abc
 import copy
-import os
+import functools
 
 from network.identifiers import Guami, TAI, NssaiInPlmn
+from network.telemetry import telemetry
+from network.templates import templates
 from network.utils import ConfigUtils
 
 
@@ -10,9 +12,24 @@ class Node:
     def __init__(self, name, t_type):
         self.name = name
         self.t_type = t_type
-        project_root = os.path.dirname(os.path.abspath(__file__))
-        self.path = os.path.join(project_root, f"../templates/free5gc/{t_type}.yaml")
-        self.values_yaml = ConfigUtils.load_yaml(self.path)
+        self.path = templates.template_path(t_type)
+        self.values_yaml = templates.get(t_type)
+
+    def __init_subclass__(cls, **kwargs):
+        """
+        Time the whole construction of every NF, including its `configure`.
+        """
+        super().__init_subclass__(**kwargs)
+        if "__init__" not in cls.__dict__:
+            return
+        init = cls.__init__
+
+        @functools.wraps(init)
+        def timed_init(self, *args, **init_kwargs):
+            with telemetry.span("nf_construct", nf=cls.__name__):
+                init(self, *args, **init_kwargs)
+
+        cls.__init__ = timed_init
 
     @abc.abstractmethod
     def configure(self):
@@ -40,7 +57,6 @@ class AMF(Node):
 
     def configure(self):
         self.values_yaml["amf"]["config"]["amfName"] = self.name.upper()
-        print(self.ngap_ip_list)
         self.values_yaml["amf"]["config"]["ngapIpList"] = self.ngap_ip_list
         self.values_yaml["amf"]["config"]["servedGuamiList"] = ConfigUtils.list2dict(self.served_guami_list)
         self.values_yaml["amf"]["config"]["supportTaiList"] = ConfigUtils.list2dict(self.supported_tai_list)
@@ -148,19 +164,28 @@ class PCF(Node):
 
 
 class SMF(Node):
-    def __init__(self, name, snssai_infos, plmns, pfcp, up_nodes, links,
-                 locality="area1", ulcl=False, sbi_register_ipv4="", sbi_binding_ipv4="", nrf_uri=""):
+    def __init__(self, name, snssai_infos, plmns, pfcp, up_nodes=None, links=None,
+                 locality="area1", ulcl=False, sbi_register_ipv4="", sbi_binding_ipv4="", nrf_uri="",
+                 user_plane=None):
+        """
+        :param user_plane: UserPlaneGraph, validated and used for the `upNodes` and `links` sections instead of
+                           `up_nodes` and `links`
+        """
         super().__init__(name, "smf")
+        if user_plane is not None:
+            user_plane.validate()
+            up_nodes, links = user_plane.up_nodes(), user_plane.links()
         self.snssai_infos = snssai_infos
         self.plmns = plmns
         self.pfcp = pfcp
-        self.up_nodes = up_nodes
+        self.up_nodes = up_nodes if up_nodes is not None else []
+        self.user_plane = user_plane
         self.locality = locality
         self.ulcl = ulcl
         self.sbi_register_ipv4 = sbi_register_ipv4
         self.sbi_binding_ipv4 = sbi_binding_ipv4
         self.nrf_uri = nrf_uri
-        self.links = links
+        self.links = links if links is not None else []
         self.configure()
 
     @classmethod
@@ -241,6 +266,44 @@ class WebUI(Node):
         self.values_yaml["webui"]["config"]["billingServer"]["hostIPv4"] = self.billing_server_host
 
 
+class GNB(Node):
+    # SCTP port of the NGAP endpoint of the AMFs
+    NGAP_PORT = 38412
+
+    def __init__(self, name, plmn, tai, nci, nssais, amf_addresses, ue_groups=None):
+        """
+        UERANSIM gNB.
+        :param tai: TAI of the cell, supported by the AMFs
+        :param nci: NR Cell Identity, the gNB id in the upper 32 bits
+        :param nssais: S-NSSAIs the gNB serves
+        :param amf_addresses: N2 host names of the AMFs
+        :param ue_groups: list of UeGroup attached to the gNB
+        """
+        super().__init__(name, "gnb")
+        self.plmn = plmn
+        self.tai = tai
+        self.nci = nci
+        self.nssais = nssais
+        self.amf_addresses = amf_addresses
+        self.ue_groups = ue_groups if ue_groups is not None else []
+        self.configure()
+
+    def configure(self):
+        self.values_yaml["gnb"]["config"]["mcc"] = self.plmn.mcc
+        self.values_yaml["gnb"]["config"]["mnc"] = self.plmn.mnc
+        self.values_yaml["gnb"]["config"]["nci"] = f"0x{self.nci:09x}"
+        self.values_yaml["gnb"]["config"]["tac"] = int(self.tai.tac, 16)
+        self.values_yaml["gnb"]["config"]["amfConfigs"] = [{"address": address, "port": self.NGAP_PORT}
+                                                           for address in self.amf_addresses]
+        self.values_yaml["gnb"]["config"]["slices"] = [{"sst": nssai.sst, "sd": int(nssai.sd, 16)}
+                                                       for nssai in self.nssais]
+        self.values_yaml["gnb"]["ues"]["enabled"] = bool(self.ue_groups)
+        self.values_yaml["gnb"]["ues"]["groups"] = ConfigUtils.list2dict(self.ue_groups)
+
+    def ue_count(self):
+        return sum(group.count for group in self.ue_groups)
+
+
 class MongoDB(Node):
     def __init__(self, name, ):
         super().__init__(name, "mongodb")
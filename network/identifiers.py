@@ -1,27 +1,100 @@
 import abc
 import random
+import weakref
 from abc import ABC
 
 from network.utils import ConfigUtils
 
 
-class NSSAI:
+class Identifier:
+    """
+    Base of the immutable identifier value types.
+
+    The fields of an identifier are slots named in `__slots__`, in constructor order, and cannot be reassigned.
+    Instances are interned: building an identifier equal to a live one returns that very object, so a whole
+    topology shares a single `PLMN("999", "70")`. `to_dict` builds the serialized form once and caches it, the
+    returned dicts are shared between every caller and must be copied before being modified.
+    Subclasses implement `_build_dict`, whose positional arguments are the variants of the serialized form.
+    """
+    __slots__ = ("_dicts", "__weakref__")
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._interned = weakref.WeakValueDictionary()
+
+    @classmethod
+    def _intern(cls, *values):
+        instance = cls._interned.get(values)
+        if instance is None:
+            instance = object.__new__(cls)
+            for field, value in zip(cls.__slots__, values):
+                object.__setattr__(instance, field, value)
+            object.__setattr__(instance, "_dicts", None)
+            instance = cls._interned.setdefault(values, instance)
+        return instance
+
+    def _key(self):
+        return tuple(getattr(self, field) for field in self.__slots__)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self is other or self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __reduce__(self):
+        return type(self)._intern, self._key()
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        fields = ", ".join(f"{field}={getattr(self, field)!r}" for field in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+    def to_dict(self):
+        return self._cached_dict()
+
+    def _cached_dict(self, *variant):
+        dicts = self._dicts
+        if dicts is None:
+            dicts = {}
+            object.__setattr__(self, "_dicts", dicts)
+        serialized = dicts.get(variant)
+        if serialized is None:
+            serialized = dicts[variant] = self._build_dict(*variant)
+        return serialized
+
+    @abc.abstractmethod
+    def _build_dict(self, *variant):
+        pass
+
+
+class NSSAI(Identifier):
     """
     NSSAI Information Format:
     SST: Slice/Service Type (8 bits)
     SD: Slice Differentiator (24 bits)
     """
+    __slots__ = ("sst", "sd")
 
-    def __init__(self, sst=None, sd=None):
-        self.sst = sst
-        self.sd = sd
-        if self.sst is None:
-            self.sst = NSSAI.random_nssai_sst()
-        if self.sd is None:
-            self.sd = NSSAI.random_nssai_sd()
-
-    def __eq__(self, other):
-        return self.sst == other.sst and self.sd == other.sd
+    def __new__(cls, sst=None, sd=None):
+        if sst is None:
+            sst = NSSAI.random_nssai_sst()
+        if sd is None:
+            sd = NSSAI.random_nssai_sd()
+        return cls._intern(sst, sd)
 
     def __str__(self):
         return "sst: " + str(self.sst) + ", sd: " + str(self.sd)
@@ -34,35 +107,121 @@ class NSSAI:
     def random_nssai_sd(cls):
         return ConfigUtils.random_hex(6)
 
-    def to_dict(self):
+    def _build_dict(self):
         return {"sst": self.sst, "sd": self.sd}
 
 
-class PLMN:
+class NssaiSpaceExhaustedError(Exception):
+    pass
+
+
+class NssaiAllocator:
+    """
+    Allocates S-NSSAIs that are unique within the allocator.
+
+    The default space is the one of `NSSAI()`: SST 1~15 and any SD. Tenants can be registered with their own
+    SST values (e.g. STANDARD_SSTS) and SD range, allocations of a tenant stay inside its space.
+    Pass `seed` for a reproducible sequence.
+    """
+    # Standardized SST values, 3GPP TS 23.501 5.15.2.2
+    STANDARD_SSTS = {"eMBB": 1, "URLLC": 2, "MIoT": 3, "V2X": 4, "HMTC": 5}
+    MAX_SD = 0xFFFFFF
+    RANDOM_ATTEMPTS = 16
+
+    def __init__(self, sst_values=range(1, 16), sd_range=(0, MAX_SD), seed=None):
+        self.seed = seed
+        self.random = random.Random(seed) if seed is not None else random.SystemRandom()
+        self.allocated = set()
+        self.tenants = {}
+        self.add_tenant(None, sst_values, sd_range)
+
+    def add_tenant(self, tenant, sst_values=None, sd_range=None):
+        """
+        :param tenant: name of the tenant, None is the default space
+        :param sst_values: SST values the tenant may use, names of STANDARD_SSTS are accepted
+        :param sd_range: inclusive (first, last) range of SD values of the tenant
+        :return: None
+        """
+        default_ssts, default_sd_range = self.tenants.get(None, (None, None))
+        ssts = [self.STANDARD_SSTS.get(sst, sst) for sst in sst_values] if sst_values is not None else default_ssts
+        first_sd, last_sd = sd_range if sd_range is not None else default_sd_range
+        if not ssts or any(not 0 <= sst <= 255 for sst in ssts):
+            raise ValueError(f"Invalid SST values {ssts} for tenant {tenant}")
+        if not 0 <= first_sd <= last_sd <= self.MAX_SD:
+            raise ValueError(f"Invalid SD range ({first_sd}, {last_sd}) for tenant {tenant}")
+        self.tenants[tenant] = (ssts, (first_sd, last_sd))
+
+    def reserve(self, nssai):
+        """
+        Mark an externally chosen S-NSSAI as used.
+        """
+        self.allocated.add((nssai.sst, int(nssai.sd, 16)))
+
+    def capacity(self, tenant=None):
+        ssts, (first_sd, last_sd) = self.tenants[tenant]
+        return len(set(ssts)) * (last_sd - first_sd + 1)
+
+    def allocate(self, tenant=None, sst=None):
+        """
+        :param tenant: tenant whose space the S-NSSAI is drawn from
+        :param sst: force the SST, it has to be one of the tenant's
+        :return: a new NSSAI
+        :raise NssaiSpaceExhaustedError: when every S-NSSAI of the space is taken
+        """
+        ssts, (first_sd, last_sd) = self.tenants[tenant]
+        if sst is not None:
+            sst = self.STANDARD_SSTS.get(sst, sst)
+            if sst not in ssts:
+                raise ValueError(f"SST {sst} is not allowed for tenant {tenant}")
+            ssts = [sst]
+        for _ in range(self.RANDOM_ATTEMPTS):
+            candidate = (self.random.choice(ssts), self.random.randint(first_sd, last_sd))
+            if candidate not in self.allocated:
+                return self._take(candidate)
+        # The space is dense, scan it from a random point instead of drawing blindly.
+        sd_count = last_sd - first_sd + 1
+        ssts = sorted(set(ssts))
+        start = self.random.randrange(len(ssts) * sd_count)
+        for offset in range(len(ssts) * sd_count):
+            index = (start + offset) % (len(ssts) * sd_count)
+            candidate = (ssts[index // sd_count], first_sd + index % sd_count)
+            if candidate not in self.allocated:
+                return self._take(candidate)
+        raise NssaiSpaceExhaustedError(f"No S-NSSAI left for tenant {tenant} "
+                                       f"(SST {ssts}, SD {first_sd:06x}~{last_sd:06x})")
+
+    def allocate_many(self, count, tenant=None, sst=None):
+        return [self.allocate(tenant, sst) for _ in range(count)]
+
+    def _take(self, candidate):
+        self.allocated.add(candidate)
+        sst, sd = candidate
+        return NSSAI(sst, f"{sd:06x}")
+
+
+class PLMN(Identifier):
     """
     PLMN Information Format:
     MCC: Mobile Country Code (3 digits, 12 bits)
     MNC: Mobile Network Code (2 or 3 digits, 12 bits)
     """
+    __slots__ = ("mcc", "mnc")
 
-    def __init__(self, mcc, mnc):
-        self.mcc = mcc
-        self.mnc = mnc
+    def __new__(cls, mcc, mnc):
+        return cls._intern(mcc, mnc)
 
-    def to_dict(self):
+    def _build_dict(self):
         return {"mcc": self.mcc, "mnc": self.mnc}
 
-    def __eq__(self, other):
-        return self.mcc == other.mcc and self.mnc == other.mnc
-
     def __str__(self):
         return "mcc: " + str(self.mcc) + ", mnc: " + str(self.mnc)
 
 
-class NssaiInPlmn:
-    def __init__(self, plmn, nssai_list):
-        self.plmn = plmn
-        self.nssai_list = nssai_list
+class NssaiInPlmn(Identifier):
+    __slots__ = ("plmn", "nssai_list")
+
+    def __new__(cls, plmn, nssai_list):
+        return cls._intern(plmn, tuple(nssai_list))
 
     def to_dict_for_amf(self):
         return self.to_dict()
@@ -71,13 +230,16 @@ class NssaiInPlmn:
         return self.to_dict(key="supportedSnssaiList")
 
     def to_dict(self, key="snssaiList"):
+        return self._cached_dict(key)
+
+    def _build_dict(self, key):
         return {"plmnId": self.plmn.to_dict(), key: [nssai.to_dict() for nssai in self.nssai_list]}
 
     def __str__(self):
         return str(self.to_dict())
 
 
-class TAI:
+class TAI(Identifier):
     """
     TAI Information Format:
     PLMN Information:
@@ -85,102 +247,109 @@ class TAI:
       MNC: Mobile Network Code (2 or 3 digits, 12 bits)
     TAC: Tracking Area Code (16 bits)
     """
+    __slots__ = ("plmn", "tac")
 
-    def __init__(self, plmn, tac=None):
-        self.plmn = plmn
-        self.tac = tac
-        if self.tac is None:
-            self.tac = TAI.random_tac()
+    def __new__(cls, plmn, tac=None):
+        if tac is None:
+            tac = TAI.random_tac()
+        return cls._intern(plmn, tac)
 
     @classmethod
     def random_tac(cls):
         return ConfigUtils.random_hex(6)
 
-    def to_dict(self):
+    def _build_dict(self):
         return {"plmnId": self.plmn.to_dict(), "tac": self.tac}
 
     def __str__(self):
         return "plmnId: " + str(self.plmn) + ", tac: " + str(self.tac)
 
 
-class DNN:
-    def __init__(self, dnn, cidr):
-        self.dnn = dnn
-        self.cidr = cidr
+class DNN(Identifier):
+    __slots__ = ("dnn", "cidr")
 
-    def to_dict(self):
+    def __new__(cls, dnn, cidr):
+        return cls._intern(dnn, cidr)
+
+    def _build_dict(self):
         return {"dnn": self.dnn, "cidr": self.cidr}
 
 
-class DnnInfo:
-    def __init__(self, dnn, dns_ipv4="8.8.8.8", dns_ipv6="2001:4860:4860::8888"):
-        self.dnn = dnn
-        self.dns_ipv4 = dns_ipv4
-        self.dns_ipv6 = dns_ipv6
+class DnnInfo(Identifier):
+    __slots__ = ("dnn", "dns_ipv4", "dns_ipv6")
 
-    def to_dict(self):
-        return {"dnn": self.dnn, "dns": {"ipv4": self.dns_ipv4, "ipv6": self.dns_ipv6}}
+    def __new__(cls, dnn, dns_ipv4="8.8.8.8", dns_ipv6="2001:4860:4860::8888"):
+        return cls._intern(dnn, dns_ipv4, dns_ipv6)
 
-    def __eq__(self, other):
-        return self.dnn == other.dnn and self.dns_ipv4 == other.dns_ipv4 and self.dns_ipv6 == other.dns_ipv6
+    def _build_dict(self):
+        return {"dnn": self.dnn, "dns": {"ipv4": self.dns_ipv4, "ipv6": self.dns_ipv6}}
 
     def __str__(self):
         return str(self.to_dict())
 
 
-class DnnUpfInfo:
-    def __init__(self, dnn, cidr, static_cidr):
-        self.dnn = dnn
-        self.cidr = cidr
-        self.static_cidr = static_cidr
+class DnnUpfInfo(Identifier):
+    __slots__ = ("dnn", "cidr", "static_cidr")
 
-    def __eq__(self, other):
-        return self.dnn == other.dnn and self.cidr == other.cidr and self.static_cidr == other.static_cidr
+    def __new__(cls, dnn, cidr, static_cidr):
+        return cls._intern(dnn, cidr, static_cidr)
 
     def __str__(self):
         return str(self.to_dict(with_cidr=True))
 
     def to_dict(self, with_cidr=False):
+        return self._cached_dict(with_cidr)
+
+    def _build_dict(self, with_cidr):
         if with_cidr:
             return {"dnn": self.dnn, "pools": {"cidr": [self.cidr]}, "staticPools": {"cidr": [self.static_cidr]}}
         return {"dnn": self.dnn}
 
 
-class Interface:
-    def __init__(self, endpoint, network_instances, interface_type="N3"):
-        self.endpoint = endpoint
-        self.network_instances = network_instances
-        self.interface_type = interface_type
+class Interface(Identifier):
+    __slots__ = ("endpoint", "network_instances", "interface_type")
 
-    def to_dict(self):
-        return {"endpoints": self.endpoint, "networkInstances": self.network_instances,
-                "interfaceType": self.interface_type}
+    def __new__(cls, endpoint, network_instances, interface_type="N3"):
+        # Lists are kept as tuples so that the interface stays hashable, `to_dict` gives lists back.
+        if isinstance(endpoint, list):
+            endpoint = tuple(endpoint)
+        if isinstance(network_instances, list):
+            network_instances = tuple(network_instances)
+        return cls._intern(endpoint, network_instances, interface_type)
 
+    def _build_dict(self):
+        endpoint = list(self.endpoint) if isinstance(self.endpoint, tuple) else self.endpoint
+        network_instances = (list(self.network_instances) if isinstance(self.network_instances, tuple)
+                             else self.network_instances)
+        return {"endpoints": endpoint, "networkInstances": network_instances, "interfaceType": self.interface_type}
 
-class SnssaiInfo:
-    def __init__(self, snssai: NSSAI, dnn_infos: list[DnnInfo]):
-        self.snssai = snssai
-        self.dnn_infos = dnn_infos
 
-    def to_dict(self):
+class SnssaiInfo(Identifier):
+    __slots__ = ("snssai", "dnn_infos")
+
+    def __new__(cls, snssai: NSSAI, dnn_infos: list[DnnInfo]):
+        return cls._intern(snssai, tuple(dnn_infos))
+
+    def _build_dict(self):
         return {
             "sNssai": self.snssai.to_dict(),
             "dnnInfos": [dnn_info.to_dict() for dnn_info in self.dnn_infos]
         }
 
 
-class SnssaiUpfInfo:
-    def __init__(self, snssai: NSSAI, dnn_upf_infos: list[DnnUpfInfo]):
-        self.snssai = snssai
-        self.dnn_upf_infos = dnn_upf_infos
+class SnssaiUpfInfo(Identifier):
+    __slots__ = ("snssai", "dnn_upf_infos")
 
-    def __eq__(self, other):
-        return self.snssai == other.snssai and self.dnn_upf_infos == other.dnn_upf_infos
+    def __new__(cls, snssai: NSSAI, dnn_upf_infos: list[DnnUpfInfo]):
+        return cls._intern(snssai, tuple(dnn_upf_infos))
 
     def __str__(self):
         return str(self.to_dict(dnn_with_cidr=True))
 
     def to_dict(self, dnn_with_cidr=False):
+        return self._cached_dict(dnn_with_cidr)
+
+    def _build_dict(self, dnn_with_cidr):
         return {
             "sNssai": self.snssai.to_dict(),
             "dnnUpfInfoList": [dnn_upf_info.to_dict(dnn_with_cidr) for dnn_upf_info in self.dnn_upf_infos]
@@ -252,26 +421,27 @@ class PSAUpfNode(UpfNode):
         }
 
 
-class PfcpForSMF:
-    def __init__(self, node_id="", listen_addr="", external_addr=""):
-        self.node_id = node_id
-        self.listen_addr = listen_addr
-        self.external_addr = external_addr
+class PfcpForSMF(Identifier):
+    __slots__ = ("node_id", "listen_addr", "external_addr")
 
-    def to_dict(self):
+    def __new__(cls, node_id="", listen_addr="", external_addr=""):
+        return cls._intern(node_id, listen_addr, external_addr)
+
+    def _build_dict(self):
         return {"nodeId": self.node_id, "listenAddr": self.listen_addr, "externalAddr": self.external_addr}
 
 
-class PfcpForUPF:
-    def __init__(self, node_id="", addr=""):
-        self.node_id = node_id
-        self.addr = addr
+class PfcpForUPF(Identifier):
+    __slots__ = ("node_id", "addr")
 
-    def to_dict(self):
+    def __new__(cls, node_id="", addr=""):
+        return cls._intern(node_id, addr)
+
+    def _build_dict(self):
         return {"nodeId": self.node_id, "addr": self.addr}
 
 
-class Guami:
+class Guami(Identifier):
     """
     GUAMI Information Format:
     PLMN Information:
@@ -282,27 +452,25 @@ class Guami:
       AMF Set ID: (10 bits)
       AMF Pointer: (6 bits)
     """
+    __slots__ = ("plmn", "amf_id")
 
-    def __init__(self, plmn, amf_id=None):
-        self.plmn = plmn
-        self.amf_id = amf_id
+    def __new__(cls, plmn, amf_id=None):
+        return cls._intern(plmn, amf_id)
 
-    def to_dict(self):
+    def _build_dict(self):
         return {"plmnId": self.plmn.to_dict(), "amfId": self.amf_id}
 
-    def __eq__(self, other):
-        return self.plmn == other.plmn and self.amf_id == other.amf_id
-
     def __str__(self):
         return "plmnId: " + str(self.plmn) + ", amfId: " + str(self.amf_id)
 
 
-class Link:
-    def __init__(self, src, dst):
-        self.src = src
-        self.dst = dst
+class Link(Identifier):
+    __slots__ = ("src", "dst")
 
-    def to_dict(self):
+    def __new__(cls, src, dst):
+        return cls._intern(src, dst)
+
+    def _build_dict(self):
         return {"A": self.src, "B": self.dst}
 
     def __str__(self):
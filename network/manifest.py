@@ -0,0 +1,71 @@
+import hashlib
+import json
+import os
+
+MANIFEST_NAME = ".slicenet-manifest.json"
+
+
+class Manifest:
+    """
+    Content hashes of the files generated into an output path, plus the hash of the spec they were generated from
+    and the materialize strategy of the files copied from the basic charts, None when unknown.
+    """
+
+    def __init__(self, spec_hash="", files=None, materialize=None):
+        self.spec_hash = spec_hash
+        self.files = files if files is not None else {}
+        self.materialize = materialize
+
+    @classmethod
+    def manifest_path(cls, path):
+        return os.path.join(path, MANIFEST_NAME)
+
+    @classmethod
+    def load(cls, path, backend=None):
+        """
+        :param path: output path of a generated deployment
+        :param backend: OutputBackend the deployment was written to, the local disk when None
+        :return: the stored manifest, or an empty one when there is none or it cannot be read
+        """
+        try:
+            if backend is None:
+                with open(cls.manifest_path(path), 'r') as file:
+                    data = json.load(file)
+            else:
+                data = json.loads(backend.read_bytes(cls.manifest_path(path)))
+            return cls(data["spec_hash"], data["files"], data.get("materialize"))
+        except (OSError, ValueError, KeyError):
+            return cls()
+
+    def save(self, path, backend=None):
+        content = json.dumps({"spec_hash": self.spec_hash, "files": self.files, "materialize": self.materialize},
+                             indent=1, sort_keys=True)
+        if backend is None:
+            with open(self.manifest_path(path), 'w') as file:
+                file.write(content)
+        else:
+            backend.write_bytes(content.encode(), self.manifest_path(path))
+
+    def is_complete(self, path, backend=None):
+        isfile = os.path.isfile if backend is None else backend.isfile
+        return all(isfile(os.path.join(path, rel_path)) for rel_path in self.files)
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_spec(spec):
+    """
+    :param spec: json serializable description of everything a generation run depends on
+    :return: sha256 of its canonical json form
+    """
+    return hash_bytes(json.dumps(spec, sort_keys=True, default=str).encode())
@@ -1,29 +1,238 @@
+import heapq
 import ipaddress
+import itertools
+
+
+class PoolExhaustedError(Exception):
+    pass
+
+
+class IPPoolAllocator:
+    """
+    Buddy allocator of IPv4 networks inside a parent supernet.
+
+    Free space is kept as aligned blocks, one min-heap (with lazy deletion) and one set per prefix length.
+    An allocation takes the smallest free block that fits (the lowest one when several fit) and splits it,
+    a release merges the block with its free buddies again, so both are O(log n).
+    """
+
+    def __init__(self, supernet, reserved=()):
+        """
+        :param supernet: parent network, e.g. "10.0.0.0/8"
+        :param reserved: networks or "first-last" address ranges that must never be handed out
+        """
+        self.supernet = ipaddress.IPv4Network(supernet, strict=False)
+        self._free = {prefixlen: set() for prefixlen in range(self.supernet.prefixlen, 33)}
+        self._heaps = {prefixlen: [] for prefixlen in range(self.supernet.prefixlen, 33)}
+        self.allocated = {}
+        self.reserved = {}
+        self._push_free(int(self.supernet.network_address), self.supernet.prefixlen)
+        for reserved_range in reserved:
+            self.reserve(reserved_range)
+
+    @classmethod
+    def _size(cls, prefixlen):
+        return 1 << (32 - prefixlen)
+
+    def _push_free(self, addr, prefixlen):
+        self._free[prefixlen].add(addr)
+        heapq.heappush(self._heaps[prefixlen], addr)
+
+    def _pop_free(self, prefixlen):
+        heap = self._heaps[prefixlen]
+        free = self._free[prefixlen]
+        while heap:
+            addr = heapq.heappop(heap)
+            if addr in free:
+                free.remove(addr)
+                return addr
+        return None
+
+    def _free_ancestor(self, addr, prefixlen):
+        """
+        :return: prefix length of the free block containing (addr, prefixlen), None when there is none
+        """
+        for level in range(prefixlen, self.supernet.prefixlen - 1, -1):
+            if addr & ~(self._size(level) - 1) in self._free[level]:
+                return level
+        return None
+
+    def _is_free(self, addr, prefixlen):
+        if self._free_ancestor(addr, prefixlen) is not None:
+            return True
+        if prefixlen == 32:
+            return False
+        half = self._size(prefixlen + 1)
+        return self._is_free(addr, prefixlen + 1) and self._is_free(addr + half, prefixlen + 1)
+
+    def _claim(self, addr, prefixlen):
+        """
+        Remove the block from the free space, it has to be entirely free.
+        """
+        level = self._free_ancestor(addr, prefixlen)
+        if level is None:
+            half = self._size(prefixlen + 1)
+            self._claim(addr, prefixlen + 1)
+            self._claim(addr + half, prefixlen + 1)
+            return
+        block = addr & ~(self._size(level) - 1)
+        self._free[level].discard(block)
+        while level < prefixlen:
+            level += 1
+            half = self._size(level)
+            if addr >= block + half:
+                self._push_free(block, level)
+                block += half
+            else:
+                self._push_free(block + half, level)
+
+    def _networks(self, network):
+        if isinstance(network, str) and "-" in network:
+            first, last = (ipaddress.IPv4Address(address.strip()) for address in network.split("-"))
+            return list(ipaddress.summarize_address_range(first, last))
+        return [ipaddress.IPv4Network(network, strict=False)]
+
+    def _check_inside(self, network):
+        if not network.subnet_of(self.supernet):
+            raise ValueError(f"{network} is not inside the supernet {self.supernet}")
+
+    def reserve(self, network):
+        """
+        Exclude a network or a "first-last" address range from allocation.
+        :raise ValueError: when it overlaps an allocated or reserved block
+        """
+        networks = self._networks(network)
+        for net in networks:
+            self._check_inside(net)
+            if not self._is_free(int(net.network_address), net.prefixlen):
+                raise ValueError(f"{net} overlaps an allocated or reserved network")
+        for net in networks:
+            self._claim(int(net.network_address), net.prefixlen)
+            self.reserved[int(net.network_address)] = net.prefixlen
+
+    def allocate(self, prefixlen):
+        """
+        :param prefixlen: prefix length of the network to allocate
+        :return: the allocated IPv4Network
+        :raise PoolExhaustedError: when no free block is large enough
+        """
+        prefixlen = int(prefixlen)
+        if not self.supernet.prefixlen <= prefixlen <= 32:
+            raise ValueError(f"Cannot allocate a /{prefixlen} inside {self.supernet}")
+        for level in range(prefixlen, self.supernet.prefixlen - 1, -1):
+            addr = self._pop_free(level)
+            if addr is not None:
+                break
+        else:
+            raise PoolExhaustedError(f"No free /{prefixlen} left in {self.supernet}")
+        while level < prefixlen:
+            level += 1
+            self._push_free(addr + self._size(level), level)
+        self.allocated[addr] = prefixlen
+        return ipaddress.IPv4Network((addr, prefixlen))
+
+    def allocate_network(self, network):
+        """
+        Allocate a given network, e.g. a static pool requested by the operator.
+        :raise ValueError: when it overlaps an allocated or reserved block
+        """
+        net = ipaddress.IPv4Network(network, strict=False)
+        self._check_inside(net)
+        addr = int(net.network_address)
+        if not self._is_free(addr, net.prefixlen):
+            raise ValueError(f"{net} overlaps an allocated or reserved network")
+        self._claim(addr, net.prefixlen)
+        self.allocated[addr] = net.prefixlen
+        return net
+
+    def release(self, network):
+        """
+        Give an allocated network back, merging it with its free buddies.
+        """
+        net = ipaddress.IPv4Network(network, strict=False)
+        addr = int(net.network_address)
+        if self.allocated.get(addr) != net.prefixlen:
+            raise ValueError(f"{net} is not allocated")
+        del self.allocated[addr]
+        prefixlen = net.prefixlen
+        while prefixlen > self.supernet.prefixlen:
+            buddy = addr ^ self._size(prefixlen)
+            if buddy not in self._free[prefixlen]:
+                break
+            self._free[prefixlen].remove(buddy)
+            addr = min(addr, buddy)
+            prefixlen -= 1
+        self._push_free(addr, prefixlen)
+
+    def overlaps(self, network):
+        """
+        :return: whether the network intersects an allocated or reserved block
+        """
+        net = ipaddress.IPv4Network(network, strict=False)
+        if not net.overlaps(self.supernet):
+            return False
+        if not net.subnet_of(self.supernet):
+            return True
+        return not self._is_free(int(net.network_address), net.prefixlen)
+
+    def available(self):
+        """
+        :return: number of free addresses
+        """
+        return sum(len(blocks) * self._size(prefixlen) for prefixlen, blocks in self._free.items())
 
 
 class NetSpliter:
-    def __init__(self, ip_network, mask):
+    """
+    Hands out consecutive UE pools of a fixed mask, starting after `ip_network`, each with a static pool.
+    """
+
+    def __init__(self, ip_network, mask, supernet="0.0.0.0/0", reserved=()):
         self.ip_network = ip_network
         self.mask = mask
         self.network = ipaddress.IPv4Network(f"{self.ip_network}/{self.mask}", strict=False)
+        self.allocator = IPPoolAllocator(supernet, reserved)
+        # Pools are allocated after the initial network, as they always have been.
+        first = self.allocator.supernet.network_address
+        last = self.network.broadcast_address
+        if first <= last:
+            for net in ipaddress.summarize_address_range(first, last):
+                if not self.allocator.overlaps(net):
+                    self.allocator.reserve(net)
+
     def _next_network(self):
-        network_int = int(self.network.network_address)
-        next_network_int = network_int + self.network.num_addresses
-        next_network_address = ipaddress.IPv4Address(next_network_int)
-        self.ip_network = str(next_network_address)
-        self.network = ipaddress.IPv4Network(f"{self.ip_network}/{self.mask}", strict=False)
+        self.network = self.allocator.allocate(self.mask)
+        self.ip_network = str(self.network.network_address)
         return str(self.network)
 
     def _next_static_pool(self, prefixlen_diff=4):
-        subnets = self.network.subnets(prefixlen_diff=prefixlen_diff)
-        next(subnets)
-        static_pool = next(subnets)
-        return str(static_pool)
+        static_pool_size = self.network.num_addresses >> prefixlen_diff
+        static_pool_address = self.network.network_address + static_pool_size
+        return str(ipaddress.IPv4Network((static_pool_address, self.network.prefixlen + prefixlen_diff)))
 
     def split(self):
         return self._next_network(), self._next_static_pool()
 
+    @classmethod
+    def shard(cls, pool, count, prefixlen_diff=4):
+        """
+        Carve a pool returned by `split` into `count` equal sub-pools, e.g. one per UPF serving it.
+        :return: list of (sub-pool, static pool inside it) in address order
+        """
+        network = ipaddress.IPv4Network(pool)
+        bits = (count - 1).bit_length()
+        if count < 1 or network.prefixlen + bits + prefixlen_diff > 32:
+            raise ValueError(f"Cannot shard {pool} into {count} pools")
+        shards = []
+        for sub_pool in itertools.islice(network.subnets(prefixlen_diff=bits), count):
+            static_pool_size = sub_pool.num_addresses >> prefixlen_diff
+            static_pool = ipaddress.IPv4Network((sub_pool.network_address + static_pool_size,
+                                                 sub_pool.prefixlen + prefixlen_diff))
+            shards.append((str(sub_pool), str(static_pool)))
+        return shards
 
-
-
-
+    def release(self, pool):
+        """
+        Give back a pool returned by `split`, it can be handed out again.
+        """
+        self.allocator.release(pool)
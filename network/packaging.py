@@ -0,0 +1,114 @@
+"""
+Packaged charts streamed straight from the generator, as `helm package` would produce them from the output folder.
+
+The archive of a chart holds its files under `<chart name>/`, and every dependency with a `file://` repository
+pointing to another chart of the output under `<chart name>/charts/<folder>/`, recursively. Files are read from
+their basic chart or taken from the rendered content, the output folder is never written.
+Archives are reproducible: every member and the gzip header get the mtime `SOURCE_DATE_EPOCH`, 0 when it is not set,
+so the same chart is packaged byte for byte the same.
+"""
+import contextlib
+import gzip
+import io
+import os
+import sys
+import tarfile
+
+import yaml
+
+from network.telemetry import telemetry
+from network.utils import YamlLoader
+
+
+@contextlib.contextmanager
+def open_target(target):
+    """
+    :param target: path of the archive, "-" for stdout, or a writable binary file object, left open
+    """
+    if target == "-":
+        yield sys.stdout.buffer
+    elif isinstance(target, (str, os.PathLike)):
+        with open(target, 'wb') as file:
+            yield file
+    else:
+        yield target
+
+
+def archive_mtime():
+    """
+    :return: mtime of the archive members, `SOURCE_DATE_EPOCH` or 0
+    """
+    return int(os.environ.get("SOURCE_DATE_EPOCH", 0))
+
+
+def chart_tree(files):
+    """
+    :param files: dict of output path -> content, None for the files copied from a basic chart
+    :return: dict of chart folder -> list of (path inside the chart, output path)
+    """
+    charts = {}
+    for rel_path in files:
+        chart_name, _, inner_path = rel_path.partition("/")
+        if inner_path:
+            charts.setdefault(chart_name, []).append((inner_path, rel_path))
+    return charts
+
+
+def _chart_dependencies(chart_yaml):
+    """
+    :return: folder names of the `file://` dependencies of a chart
+    """
+    folders = []
+    for dependency in (chart_yaml or {}).get("dependencies") or []:
+        repository = dependency.get("repository") or ""
+        if repository.startswith("file://"):
+            folders.append(os.path.basename(os.path.normpath(repository[len("file://"):])))
+    return folders
+
+
+def write_chart_archive(target, chart_name, files, sources):
+    """
+    Stream the gzip'd tar archive of `chart_name` with its local dependencies.
+    :param target: see `open_target`, a non seekable stream is fine
+    :param chart_name: folder of the chart in the output
+    :param files: dict of output path -> content, None for the files copied from a basic chart
+    :param sources: dict of output path -> path of the basic chart file, for the None contents
+    :return: number of files in the archive
+    """
+    charts = chart_tree(files)
+    if chart_name not in charts:
+        raise ValueError(f"No chart '{chart_name}' in the output")
+    mtime = archive_mtime()
+    count = 0
+    with open_target(target) as stream, \
+            gzip.GzipFile(filename="", mode="wb", fileobj=stream, mtime=mtime) as compressed, \
+            tarfile.open(fileobj=compressed, mode="w|") as archive:
+        pending = [(chart_name, f"{chart_name}/", {chart_name})]
+        while pending:
+            folder, prefix, ancestors = pending.pop(0)
+            for inner_path, rel_path in sorted(charts[folder]):
+                info = tarfile.TarInfo(prefix + inner_path)
+                info.mtime = mtime
+                info.mode = 0o644
+                content = files[rel_path]
+                if content is None:
+                    info.size = os.path.getsize(sources[rel_path])
+                    with open(sources[rel_path], 'rb') as file:
+                        archive.addfile(info, file)
+                else:
+                    info.size = len(content)
+                    archive.addfile(info, io.BytesIO(content))
+                count += 1
+            chart_yaml_path = f"{folder}/Chart.yaml"
+            if chart_yaml_path not in files:
+                continue
+            content = files[chart_yaml_path]
+            if content is None:
+                with open(sources[chart_yaml_path], 'rb') as file:
+                    content = file.read()
+            for dependency in _chart_dependencies(yaml.load(content, Loader=YamlLoader)):
+                # Dependencies outside the output, or already packaged above this chart, are left to Helm.
+                if dependency in charts and dependency not in ancestors:
+                    pending.append((dependency, f"{prefix}charts/{dependency}/", ancestors | {dependency}))
+    telemetry.count("files_archived", count)
+    return count
@@ -0,0 +1,220 @@
+"""
+Latency-aware placement of the UPFs of the nearby-UPF mode.
+
+The input is a gNB x candidate site latency matrix, with optionally the demand of every gNB and the capacity of
+every site (same unit, e.g. number of UEs). `UpfPlacement.solve` opens at most `max_upfs` sites and assigns every
+gNB to one of them:
+
+1. sites are opened greedily, each time the one lowering the demand weighted latency the most (k-median), and more
+   sites are opened while their capacity does not cover the total demand;
+2. gNBs are assigned to the nearest open site with enough spare capacity, the gNBs with the largest regret (gap
+   between their nearest and second nearest site) first;
+3. gNBs are moved to a nearer site with spare capacity until no move lowers the latency.
+
+The cost of every candidate site in step 1 is computed with NumPy when it is installed, in pure Python otherwise.
+"""
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from network.telemetry import telemetry
+
+# Latency used in the site costs for the gNB / site pairs that cannot be used, these pairs are never assigned.
+_UNREACHABLE = 1e12
+
+
+class PlacementError(Exception):
+    """
+    Raised with every problem found in a placement input, or when no assignment fits the capacities.
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("Invalid UPF placement:\n  " + "\n  ".join(errors))
+
+
+class UpfPlacement:
+    def __init__(self, gnbs, sites, latency, capacity=None, demand=None):
+        """
+        :param gnbs: gNB names
+        :param sites: candidate site names, used as locality of the area of the UPF placed there
+        :param latency: one row per gNB, one latency per site, None or inf when the gNB cannot use the site
+        :param capacity: maximum total demand served by each site, unlimited when None
+        :param demand: demand of each gNB, 1 for every gNB when None
+        """
+        self.gnbs = list(gnbs)
+        self.sites = list(sites)
+        self.latency = [[math.inf if value is None else float(value) for value in row] for row in latency]
+        self.capacity = [math.inf if value is None else value for value in capacity] if capacity is not None \
+            else [math.inf] * len(self.sites)
+        self.demand = list(demand) if demand is not None else [1] * len(self.gnbs)
+        self.assignment = {}
+        self.areas = []
+        self._check()
+        # NumPy copies of the latency matrix and the demand, built once for `_site_costs`
+        if np is not None:
+            self._latency_array = np.minimum(np.array(self.latency, dtype=float), _UNREACHABLE)
+            self._demand_array = np.array(self.demand, dtype=float)
+
+    @classmethod
+    def from_dict(cls, spec):
+        """
+        :param spec: dict with `gnbs`, `sites`, `latency` and optionally `capacity` and `demand`, as in a batch spec
+        """
+        return cls(spec["gnbs"], spec["sites"], spec["latency"], spec.get("capacity"), spec.get("demand"))
+
+    def _check(self):
+        errors = []
+        if not self.gnbs:
+            errors.append("no gNB")
+        if not self.sites:
+            errors.append("no candidate site")
+        for name, names in (("gNB", self.gnbs), ("site", self.sites)):
+            duplicates = sorted({item for item in names if names.count(item) > 1})
+            if duplicates:
+                errors.append(f"duplicated {name} names: {', '.join(map(str, duplicates))}")
+        if len(self.latency) != len(self.gnbs):
+            errors.append(f"latency has {len(self.latency)} rows, expected one per gNB ({len(self.gnbs)})")
+        for gnb, row in zip(self.gnbs, self.latency):
+            if len(row) != len(self.sites):
+                errors.append(f"latency of {gnb} has {len(row)} values, expected one per site ({len(self.sites)})")
+            elif any(value < 0 or math.isnan(value) for value in row):
+                errors.append(f"latency of {gnb} has negative or NaN values")
+            elif all(math.isinf(value) for value in row):
+                errors.append(f"{gnb} cannot use any site")
+        if len(self.capacity) != len(self.sites):
+            errors.append(f"capacity has {len(self.capacity)} values, expected one per site ({len(self.sites)})")
+        if len(self.demand) != len(self.gnbs):
+            errors.append(f"demand has {len(self.demand)} values, expected one per gNB ({len(self.gnbs)})")
+        if any(value <= 0 for value in self.demand) or any(value < 0 for value in self.capacity):
+            errors.append("demands must be positive and capacities non-negative")
+        if errors:
+            raise PlacementError(errors)
+
+    def _site_costs(self, best, rows):
+        """
+        :param best: latency of every gNB to its nearest open site
+        :param rows: indexes of the gNBs to sum over
+        :return: demand weighted latency of these gNBs, for each site opened in addition to the open ones
+        """
+        if np is not None:
+            rows = np.fromiter(rows, dtype=np.intp)
+            best = np.minimum(np.fromiter((best[row] for row in rows), dtype=float, count=len(rows)), _UNREACHABLE)
+            return (np.minimum(self._latency_array[rows], best[:, None])
+                    * self._demand_array[rows, None]).sum(axis=0).tolist()
+        costs = [0.0] * len(self.sites)
+        for row in rows:
+            nearest, weight = min(best[row], _UNREACHABLE), self.demand[row]
+            for site, value in enumerate(self.latency[row]):
+                costs[site] += weight * min(value, nearest)
+        return costs
+
+    def _open_sites(self, max_upfs):
+        total_demand = sum(self.demand)
+        opened = []
+        best = [math.inf] * len(self.gnbs)
+        current = math.inf
+        costs = self._site_costs(best, range(len(self.gnbs)))
+        while len(opened) < max_upfs:
+            covered = sum(self.capacity[open_site] for open_site in opened)
+            closed = [site for site in range(len(self.sites)) if site not in opened]
+            # Only the sites after which the largest remaining ones can still cover the total demand.
+            slots = max_upfs - len(opened) - 1
+            largest = sorted((self.capacity[site] for site in closed), reverse=True)[:slots + 1]
+            best_rest, best_with = sum(largest[:slots]), sum(largest)
+            candidates = [site for site in closed
+                          if covered + min(best_with, self.capacity[site] + best_rest) >= total_demand]
+            if not candidates:
+                break
+            site = min(candidates, key=lambda candidate: (costs[candidate], candidate))
+            if costs[site] >= current and covered >= total_demand:
+                break
+            opened.append(site)
+            current = costs[site]
+            # Only the gNBs nearer to the new site change the costs, they are updated instead of recomputed.
+            nearer = [row for row in range(len(self.gnbs)) if self.latency[row][site] < best[row]]
+            if nearer:
+                removed = self._site_costs(best, nearer)
+                for row in nearer:
+                    best[row] = self.latency[row][site]
+                costs = [cost - old + new for cost, old, new in zip(costs, removed, self._site_costs(best, nearer))]
+        return sorted(opened)
+
+    def _assign(self, opened):
+        errors = []
+        spare = {site: self.capacity[site] for site in opened}
+        nearest_sites = []
+        for gnb in range(len(self.gnbs)):
+            sites = sorted((site for site in opened if not math.isinf(self.latency[gnb][site])),
+                           key=lambda site: (self.latency[gnb][site], site))
+            if not sites:
+                errors.append(f"{self.gnbs[gnb]} cannot use any of the open sites")
+            nearest_sites.append(sites)
+        if errors:
+            raise PlacementError(errors)
+
+        def regret(gnb):
+            sites = nearest_sites[gnb]
+            second = self.latency[gnb][sites[1]] if len(sites) > 1 else _UNREACHABLE
+            return second - self.latency[gnb][sites[0]], self.demand[gnb]
+
+        assignment = {}
+        for gnb in sorted(range(len(self.gnbs)), key=regret, reverse=True):
+            site = next((site for site in nearest_sites[gnb] if spare[site] >= self.demand[gnb]), None)
+            if site is None:
+                errors.append(f"no open site has capacity left for {self.gnbs[gnb]} (demand {self.demand[gnb]})")
+                continue
+            assignment[gnb] = site
+            spare[site] -= self.demand[gnb]
+        if errors:
+            raise PlacementError(errors)
+
+        moved = True
+        while moved:
+            moved = False
+            for gnb, site in assignment.items():
+                for candidate in nearest_sites[gnb]:
+                    if self.latency[gnb][candidate] >= self.latency[gnb][site]:
+                        break
+                    if spare[candidate] >= self.demand[gnb]:
+                        spare[site] += self.demand[gnb]
+                        spare[candidate] -= self.demand[gnb]
+                        assignment[gnb] = candidate
+                        moved = True
+                        break
+        return assignment
+
+    def solve(self, max_upfs=None):
+        """
+        :param max_upfs: maximum number of UPFs, as many as sites when None
+        :return: list of (site, gNB names) for every site with a UPF, in site order
+        :raise PlacementError: when the demand does not fit the capacities of `max_upfs` sites
+        """
+        max_upfs = len(self.sites) if max_upfs is None else max_upfs
+        with telemetry.span("upf_placement", gnbs=len(self.gnbs), sites=len(self.sites)):
+            if sum(sorted(self.capacity, reverse=True)[:max_upfs]) < sum(self.demand):
+                raise PlacementError([f"the total demand {sum(self.demand)} exceeds the capacity of "
+                                      f"{max_upfs} sites"])
+            assignment = self._assign(self._open_sites(max_upfs))
+        self.assignment = {self.gnbs[gnb]: self.sites[site] for gnb, site in sorted(assignment.items())}
+        self.areas = [(self.sites[site], [self.gnbs[gnb] for gnb in sorted(assignment) if assignment[gnb] == site])
+                      for site in sorted(set(assignment.values()))]
+        return self.areas
+
+    def gnb_latency(self):
+        """
+        :return: dict of gNB name -> latency to the site of its UPF
+        """
+        site_index = {site: index for index, site in enumerate(self.sites)}
+        return {gnb: row[site_index[self.assignment[gnb]]]
+                for gnb, row in zip(self.gnbs, self.latency) if gnb in self.assignment}
+
+    def total_latency(self):
+        latency = self.gnb_latency()
+        return sum(latency[gnb] * demand for gnb, demand in zip(self.gnbs, self.demand) if gnb in latency)
+
+    def max_latency(self):
+        return max(self.gnb_latency().values(), default=0.0)
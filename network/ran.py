@@ -0,0 +1,126 @@
+"""
+Radio access network of a SliceNet for load testing: UERANSIM gNB charts and the UEs they start.
+
+A gNB serves the slices of the SMFs linking it in their user plane, connects to the N2 endpoint of the AMFs of the
+same locality and takes the tracking area of the first of them. The UEs of a slice get consecutive SUPIs from a
+SubscriberGenerator with shared keys and are split between the gNBs serving the slice, one `UeGroup` per gNB and
+slice, so that the subscribers the generator provisions are exactly the UEs started by the gNBs.
+
+Values of a `ueransim-gnb` chart (`templates/free5gc/gnb.yaml`). They follow the UERANSIM configuration files
+rather than the top-level keys of the upstream Helm charts (`mcc`, `mnc`, `sst`, `sd`, `tac`, `amf.hostname`,
+`ues.count`, `ues.initialMSISDN`), which only describe one slice, one AMF and UEs with one shared SUPI prefix:
+
+    config          the gNB configuration file (`gnb.yaml` of UERANSIM) as is: `mcc`, `mnc`, `nci`, `idLength`,
+                    `tac`, `amfConfigs` (one `address` / `port` per AMF), `slices` and `ignoreStreamIds`; the chart
+                    adds the `linkIp` / `ngapIp` / `gtpIp` of the pod
+    ues.enabled     whether the pod starts UEs
+    ues.groups      one `nr-ue -n <count>` per group, its other keys being the UE configuration file (`ue.yaml`):
+                    `supi`, `key`, `op`, `opType`, `amf`, `sessions`, `configured-nssai` and `default-nssai`; the
+                    chart adds the `gnbSearchList` of the pod
+"""
+import re
+
+
+class UeGroup:
+    def __init__(self, supi, count, key, opc, nssai, dnns, amf="8000"):
+        """
+        UERANSIM UEs started with `nr-ue -n count`, the SUPI incremented from `supi` on and the same credentials.
+        :param nssai: S-NSSAI of the UEs, requested and used for their PDU sessions
+        :param dnns: DNNs of the PDU sessions established by every UE
+        :param amf: authentication management field
+        """
+        self.supi = supi
+        self.count = count
+        self.key = key
+        self.opc = opc
+        self.nssai = nssai
+        self.dnns = dnns
+        self.amf = amf
+
+    def to_dict(self):
+        snssai = {"sst": self.nssai.sst, "sd": int(self.nssai.sd, 16)}
+        return {
+            "supi": self.supi,
+            "count": self.count,
+            "key": self.key,
+            "op": self.opc,
+            "opType": "OPC",
+            "amf": self.amf,
+            "sessions": [{"type": "IPv4", "apn": dnn, "slice": dict(snssai)} for dnn in self.dnns],
+            "configured-nssai": [dict(snssai)],
+            "default-nssai": [dict(snssai)],
+        }
+
+
+def gnb_alias(name):
+    """
+    :return: alias of the chart of the gNB named `name` in the SMF links, e.g. `gnb1` for `gNB1`
+    """
+    alias = re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+    return alias if alias.startswith("gnb") else f"gnb-{alias}"
+
+
+def split_count(count, parts):
+    """
+    :return: `count` split evenly into `parts` numbers, the first ones taking the remainder
+    """
+    return [count // parts + (index < count % parts) for index in range(parts)]
+
+
+def distribute_ues(ues, gnb_slices, nssais):
+    """
+    :param ues: UEs of every slice, a list of one number per slice, or a dict of gNB name -> a number for every slice
+                it serves or a list of one number per slice
+    :param gnb_slices: dict of gNB name -> S-NSSAIs it serves
+    :param nssais: S-NSSAIs of the slices
+    :return: dict of gNB name -> list of its number of UEs per slice, in the order of `nssais`
+    """
+    counts = {name: [0] * len(nssais) for name in gnb_slices}
+    errors = []
+    if isinstance(ues, dict):
+        for name, gnb_ues in ues.items():
+            if name not in gnb_slices:
+                errors.append(f"unknown gNB {name}")
+                continue
+            if isinstance(gnb_ues, int):
+                gnb_ues = [gnb_ues if nssai in gnb_slices[name] else 0 for nssai in nssais]
+            if len(gnb_ues) != len(nssais):
+                errors.append(f"{len(gnb_ues)} UE counts of {name} for {len(nssais)} slices")
+                continue
+            for index, (nssai, count) in enumerate(zip(nssais, gnb_ues)):
+                if count and nssai not in gnb_slices[name]:
+                    errors.append(f"{name} does not serve the slice {nssai.sst}-{nssai.sd}")
+                counts[name][index] = count
+    else:
+        if isinstance(ues, int):
+            ues = [ues] * len(nssais)
+        if len(ues) != len(nssais):
+            raise ValueError(f"{len(ues)} UE counts for {len(nssais)} slices")
+        for index, (nssai, count) in enumerate(zip(nssais, ues)):
+            names = [name for name, slices in gnb_slices.items() if nssai in slices]
+            if count and not names:
+                errors.append(f"no gNB serves the slice {nssai.sst}-{nssai.sd}")
+                continue
+            for name, gnb_count in zip(names, split_count(count, len(names))):
+                counts[name][index] = gnb_count
+    if errors:
+        raise ValueError("Invalid UE distribution:\n  " + "\n  ".join(errors))
+    return counts
+
+
+def ue_groups(generator, counts):
+    """
+    :param generator: SubscriberGenerator with shared keys, its subscriber counts the totals of `counts`
+    :param counts: result of `distribute_ues`
+    :return: dict of gNB name -> list of its UeGroup, the SUPI range of every slice taken in gNB order
+    """
+    groups = {name: [] for name in counts}
+    msin = generator.start_msin
+    for index, (nssai, dnns) in enumerate(generator.slices):
+        key, opc = generator.slice_keys(index)
+        for name, gnb_counts in counts.items():
+            if gnb_counts[index]:
+                groups[name].append(UeGroup(generator.supi(msin), gnb_counts[index], key, opc, nssai, dnns,
+                                            generator.amf))
+                msin += gnb_counts[index]
+    return groups
@@ -0,0 +1,196 @@
+"""
+Demand-driven sizing of the NF charts.
+
+Every slice gets a `SliceDemand`: expected subscribers, PDU session establishments per second and user-plane
+throughput. An NF serves the slices it is configured for (the S-NSSAIs of an SMF, of the PLMN support list of an
+AMF or NSSF, of the upNodes sharing the UE pools of a UPF) or every slice for the other NF types; when several NFs
+of a type serve a slice, its demand is split evenly between them. The `CapacityModel` turns the demand of an NF
+into a replica count and the Kubernetes requests / limits of one replica, written as `replicaCount` and
+`resources` next to its `config`.
+"""
+import math
+
+# Demand drivers, in the units of SliceDemand
+DRIVERS = ("subscribers", "sessions_per_second", "throughput_mbps")
+
+
+class SliceDemand:
+    def __init__(self, subscribers=0, sessions_per_second=0.0, throughput_mbps=0.0):
+        """
+        :param subscribers: expected registered UEs
+        :param sessions_per_second: PDU session establishments per second at the busy hour
+        :param throughput_mbps: aggregated user-plane throughput
+        """
+        self.subscribers = subscribers
+        self.sessions_per_second = sessions_per_second
+        self.throughput_mbps = throughput_mbps
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{driver: data[driver] for driver in DRIVERS if driver in data})
+
+    def to_dict(self):
+        return {driver: getattr(self, driver) for driver in DRIVERS}
+
+    def __add__(self, other):
+        return SliceDemand(*(getattr(self, driver) + getattr(other, driver) for driver in DRIVERS))
+
+    def __mul__(self, ratio):
+        return SliceDemand(*(getattr(self, driver) * ratio for driver in DRIVERS))
+
+    def __eq__(self, other):
+        return isinstance(other, SliceDemand) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"SliceDemand({', '.join(f'{key}={value}' for key, value in self.to_dict().items())})"
+
+
+class NfProfile:
+    def __init__(self, cpu, memory, cpu_per=None, memory_per=None, per_replica=None, limit_ratio=2.0):
+        """
+        :param cpu: millicores requested by an idle replica
+        :param memory: MiB requested by an idle replica
+        :param cpu_per: dict of driver -> millicores per unit of demand
+        :param memory_per: dict of driver -> MiB per unit of demand
+        :param per_replica: dict of driver -> demand one replica handles, more replicas are deployed above it
+        :param limit_ratio: limits are the requests times this ratio
+        """
+        self.cpu = cpu
+        self.memory = memory
+        self.cpu_per = cpu_per or {}
+        self.memory_per = memory_per or {}
+        self.per_replica = per_replica or {}
+        self.limit_ratio = limit_ratio
+
+
+class CapacityModel:
+    """
+    Linear capacity model of the free5GC NFs. The default profiles are rough figures for free5GC v3.3 and can be
+    replaced per NF type through `profiles`.
+    """
+    PROFILES = {
+        "amf": NfProfile(100, 128, {"subscribers": 0.01, "sessions_per_second": 2.0}, {"subscribers": 0.004},
+                         {"subscribers": 50000, "sessions_per_second": 500}),
+        "smf": NfProfile(100, 128, {"sessions_per_second": 3.0}, {"subscribers": 0.006},
+                         {"subscribers": 100000, "sessions_per_second": 400}),
+        "upf": NfProfile(200, 256, {"throughput_mbps": 1.5}, {"subscribers": 0.002, "throughput_mbps": 0.25},
+                         {"throughput_mbps": 5000}),
+        "pcf": NfProfile(50, 96, {"sessions_per_second": 1.0}, {"subscribers": 0.002},
+                         {"sessions_per_second": 1000}),
+        "ausf": NfProfile(50, 64, {"sessions_per_second": 0.5}, per_replica={"sessions_per_second": 2000}),
+        "udm": NfProfile(50, 96, {"sessions_per_second": 1.0}, {"subscribers": 0.001},
+                         {"sessions_per_second": 1000}),
+        "udr": NfProfile(50, 96, {"sessions_per_second": 1.5}, {"subscribers": 0.002},
+                         {"sessions_per_second": 1000}),
+        "nrf": NfProfile(50, 64, {"sessions_per_second": 0.5}, per_replica={"sessions_per_second": 4000}),
+        "nssf": NfProfile(20, 64, {"sessions_per_second": 0.2}),
+        "chf": NfProfile(50, 96, {"sessions_per_second": 1.0}, {"subscribers": 0.001},
+                         {"sessions_per_second": 1000}),
+        "webui": NfProfile(50, 128),
+        "mongodb": NfProfile(250, 512, {"sessions_per_second": 1.0}, {"subscribers": 0.01}),
+    }
+
+    def __init__(self, profiles=None):
+        """
+        :param profiles: dict of NF type -> NfProfile, overriding the default ones
+        """
+        self.profiles = dict(self.PROFILES, **(profiles or {}))
+
+    def size(self, t_type, demand):
+        """
+        :param t_type: NF type, e.g. `smf`
+        :param demand: SliceDemand served by the NF
+        :return: (replicas, resources of one replica as in a pod spec), None when the type has no profile
+        """
+        profile = self.profiles.get(t_type)
+        if profile is None:
+            return None
+        replicas = max([1] + [math.ceil(getattr(demand, driver) / capacity)
+                              for driver, capacity in profile.per_replica.items() if capacity > 0])
+        cpu = profile.cpu + sum(getattr(demand, driver) * cost for driver, cost in profile.cpu_per.items()) / replicas
+        memory = profile.memory + sum(getattr(demand, driver) * cost
+                                      for driver, cost in profile.memory_per.items()) / replicas
+        # cpu rounded up to 10 millicores, memory to 16 MiB
+        cpu, memory = 10 * math.ceil(cpu / 10), 16 * math.ceil(memory / 16)
+        limit_cpu = 10 * math.ceil(cpu * profile.limit_ratio / 10)
+        limit_memory = 16 * math.ceil(memory * profile.limit_ratio / 16)
+        return replicas, {"requests": {"cpu": f"{cpu}m", "memory": f"{memory}Mi"},
+                          "limits": {"cpu": f"{limit_cpu}m", "memory": f"{limit_memory}Mi"}}
+
+
+def served_slices(nf, pool_slices):
+    """
+    :param pool_slices: dict of (DNN, UE pool) -> S-NSSAIs of the upNodes serving it in the SMFs, a UPF being
+                        matched to its upNodes through the pools of its dnnList
+    :return: S-NSSAIs the NF is configured for, None when it serves every slice
+    """
+    if nf.t_type == "smf":
+        return [snssai_info.snssai for snssai_info in nf.snssai_infos]
+    if nf.t_type == "upf":
+        return [nssai for dnn in nf.dnns for nssai in pool_slices.get((dnn.dnn, dnn.cidr), [])]
+    if nf.t_type == "amf":
+        return [nssai for supported_plmn in nf.supported_plmns for nssai in supported_plmn.nssai_list]
+    if nf.t_type == "nssf":
+        return [nssai for supported_plmn in nf.nssais_in_plmns for nssai in supported_plmn.nssai_list]
+    return None
+
+
+def _millicores(quantity):
+    return int(quantity[:-1])
+
+
+def _mebibytes(quantity):
+    return int(quantity[:-2])
+
+
+class SizingReport:
+    """
+    Sizing of every NF and the totals per slice, the resources of an NF being shared between its slices in
+    proportion to their subscribers (their sessions per second when no slice has subscribers).
+    """
+
+    def __init__(self):
+        # NF name -> {"type", "replicas", "resources", "demand", "slices"}
+        self.nfs = {}
+        # slice name -> {"demand", "replicas", "cpu_millicores", "memory_mib"}
+        self.slices = {}
+
+    def add_slice(self, slice_name, demand):
+        self.slices[slice_name] = {"demand": demand.to_dict(), "replicas": 0.0, "cpu_millicores": 0.0,
+                                   "memory_mib": 0.0}
+
+    def add_nf(self, nf, replicas, resources, demand, shares):
+        """
+        :param shares: dict of slice name -> share of the NF attributed to the slice
+        """
+        self.nfs[nf.name] = {"type": nf.t_type, "replicas": replicas, "resources": resources,
+                             "demand": demand.to_dict(), "slices": sorted(shares)}
+        for slice_name, share in shares.items():
+            totals = self.slices[slice_name]
+            totals["replicas"] += replicas * share
+            totals["cpu_millicores"] += replicas * _millicores(resources["requests"]["cpu"]) * share
+            totals["memory_mib"] += replicas * _mebibytes(resources["requests"]["memory"]) * share
+
+    def totals(self):
+        return {key: sum(totals[key] for totals in self.slices.values())
+                for key in ("replicas", "cpu_millicores", "memory_mib")}
+
+    def to_dict(self):
+        slices = {slice_name: dict(totals, **{key: round(totals[key], 2)
+                                               for key in ("replicas", "cpu_millicores", "memory_mib")})
+                  for slice_name, totals in self.slices.items()}
+        return {"nfs": self.nfs, "slices": slices,
+                "total": {key: round(value, 2) for key, value in self.totals().items()}}
+
+    def format(self):
+        lines = [f"{'slice':<16}{'subscribers':>12}{'sessions/s':>12}{'Mbps':>10}{'replicas':>10}"
+                 f"{'cpu (m)':>10}{'memory (Mi)':>13}"]
+        for slice_name, totals in self.slices.items():
+            demand = totals["demand"]
+            lines.append(f"{slice_name:<16}{demand['subscribers']:>12}{demand['sessions_per_second']:>12}"
+                         f"{demand['throughput_mbps']:>10}{totals['replicas']:>10.2f}"
+                         f"{totals['cpu_millicores']:>10.0f}{totals['memory_mib']:>13.0f}")
+        total = self.totals()
+        lines.append(f"{'total':<50}{total['replicas']:>10.2f}{total['cpu_millicores']:>10.0f}"
+                     f"{total['memory_mib']:>13.0f}")
+        return "\n".join(lines)
@@ -1,19 +1,34 @@
 import abc
-import copy
+import asyncio
+import os
+import random
 from abc import ABC
 from collections import ChainMap
+from concurrent.futures import ThreadPoolExecutor
 
-from network.function import AUSF, CHF, NRF, NSSF, PCF, SMF, UPF, UDM, UDR, WebUI, MongoDB, AMF
-from network.identifiers import PLMN, Guami, TAI, NSSAI, NssaiInPlmn, PfcpForSMF, DnnInfo, SnssaiInfo, DnnUpfInfo, \
-    SnssaiUpfInfo, Interface, PSAUpfNode, PfcpForUPF, DNN, Link, IUpfNode, GnbNode
+from network.function import AUSF, CHF, NRF, NSSF, PCF, SMF, UPF, UDM, UDR, WebUI, MongoDB, AMF, GNB
+from network.backends import DiskBackend
+from network.dataplane import DataplaneProfile
+from network.identifiers import PLMN, Guami, TAI, NssaiInPlmn, PfcpForSMF, DnnInfo, SnssaiInfo, DnnUpfInfo, \
+    SnssaiUpfInfo, Interface, PSAUpfNode, PfcpForUPF, DNN, Link, IUpfNode, GnbNode, NssaiAllocator, UpfNode
+from network.manifest import Manifest, hash_bytes, hash_file, hash_spec
 from network.network import NetSpliter
-from network.utils import ConfigUtils
+from network.packaging import write_chart_archive
+from network.ran import distribute_ues, gnb_alias, ue_groups
+from network.sizing import CapacityModel, SizingReport, SliceDemand, served_slices
+from network.subscribers import SubscriberGenerator
+from network.telemetry import logger, telemetry
+from network.templates import templates
+from network.userplane import UserPlaneGraph
+from network.utils import ConfigUtils, ChartCopyError, DEFAULT_WORKERS, VALUES_OUTPUTS
 from functools import reduce
 
 
 class SliceNet:
-    def __init__(self, path="5gc"):
+    def __init__(self, path="5gc", backend=None):
         self.path = path
+        # OutputBackend the deployment is written to
+        self.backend = backend if backend is not None else DiskBackend()
         self.values_path = f"{self.path}/free5gc/values.yaml"
         self.amf_list = []
         self.ausf_list = []
@@ -27,22 +42,50 @@ class SliceNet:
         self.udr_list = []
         self.webconsole_list = []
         self.db_list = []
+        self.gnb_list = []
+
+    def nf_list(self):
+        return (self.amf_list + self.ausf_list + self.pcf_list +
+                self.nrf_list + self.nssf_list + self.smf_list +
+                self.upf_list + self.udm_list + self.chf_list +
+                self.udr_list + self.webconsole_list + self.db_list +
+                self.gnb_list)
+
+    def iter_values(self):
+        """
+        Yield the (name, values) section of every NF in the order of the umbrella values.yaml, without copying.
+        The order and the handling of duplicated names are the ones of the former
+        `dict(ChainMap(*[nf.to_dict() for nf in nf_list]))`: keys ordered from the last NF to the first one,
+        the first NF of a name wins.
+        """
+        nfs = {}
+        for nf in self.nf_list():
+            nfs.setdefault(nf.name, nf)
+        names = dict.fromkeys(nf.name for nf in reversed(self.nf_list()))
+        for name in names:
+            nf = nfs[name]
+            yield name, nf.values_yaml[nf.t_type]
 
     def to_dict(self):
-        nf_list = (self.amf_list + self.ausf_list + self.pcf_list +
-                   self.nrf_list + self.nssf_list + self.smf_list +
-                   self.upf_list + self.udm_list + self.chf_list +
-                   self.udr_list + self.webconsole_list + self.db_list)
-        return dict(ChainMap(*[nf.to_dict() for nf in nf_list]))
+        return dict(ChainMap(*[nf.to_dict() for nf in self.nf_list()]))
 
     def save_values_yaml(self):
-        values_yaml = copy.deepcopy(self.to_dict())
-        ConfigUtils.write_yaml(values_yaml, self.values_path)
+        self.backend.write_yaml_sections(self.iter_values(), self.values_path)
 
 
 class CommonSliceNet(SliceNet):
-    def __init__(self, path="5gc"):
-        super().__init__(path)
+    # Cross-release references of the sharded output, formatted with the release name of the control plane.
+    NRF_URI_FORMAT = "http://{release}-nrf:8000"
+    MONGODB_URI_FORMAT = "mongodb://{release}-mongodb/free5gc"
+    # N2 endpoint of an AMF, formatted with the release name of the control plane and the AMF alias
+    AMF_NGAP_FORMAT = "{release}-{amf}-ngap"
+
+    def __init__(self, path="5gc", nssai_allocator=None, backend=None):
+        super().__init__(path, backend)
+        self.nssai_allocator = nssai_allocator if nssai_allocator is not None else NssaiAllocator()
+        # Source of the AMF IDs and TACs, seeded like the allocator so that a rebuilt net renders the same values
+        seed = self.nssai_allocator.seed
+        self.identifier_random = random.Random(f"{seed}-identifiers") if seed is not None else None
         self.values_path = f"{self.path}/free5gc/values.yaml"
         self.chf_list.append(CHF("chf"))
         self.udm_list.append(UDM("udm"))
@@ -50,46 +93,704 @@ class CommonSliceNet(SliceNet):
         self.webconsole_list.append(WebUI("webui"))
         self.db_list.append(MongoDB("mongodb"))
         self.dependencies = []
+        self.chart_jobs = []
+        self.copy_workers = DEFAULT_WORKERS
+        # one of MATERIALIZE_STRATEGIES, `hardlink`/`reflink`/`auto` share the unmodified chart files with `charts/`
+        self.materialize = "copy"
+        # one of VALUES_OUTPUTS
+        self.values_output = "umbrella"
+        # Number of slices of each slice-group release, None deploys everything as the single `free5gc` release.
+        # Otherwise `free5gc` only holds the control plane and each `free5gc-slicesN` chart is a release of its own.
+        self.release_size = None
+        # Helm release name the control-plane chart is installed as
+        self.release_name = "free5gc"
+        # SizingReport of the last `size_resources`
+        self.sizing = None
+        # SubscriberGenerator of the UEs of the last `create_ran`
+        self.ue_subscribers = None
+        # SMF name -> (links, user plane) before the gNBs of `create_ran` were linked
+        self._ran_base = None
         self.net_spliter = NetSpliter("10.60.0.0", "16")
 
-    def configure(self):
-        ConfigUtils.delete_folder(self.path)
-        ConfigUtils.delete_folder(self.values_path)
-        self.copy_charts()
-        self._update_chart_yaml()
-        self.save_values_yaml()
+    def random_hex(self, length=6):
+        """
+        :return: random hex string for an AMF ID or a TAC, reproducible when the allocator has a seed
+        """
+        if self.identifier_random is None:
+            return ConfigUtils.random_hex(length)
+        return f"{self.identifier_random.getrandbits(4 * length):0{length}x}"
 
-    def copy_charts(self):
+    def configure(self, incremental=False, archive=None):
+        """
+        Generate the deployment files into `self.path`.
+        :param incremental: keep the existing output and only rewrite the files whose content changed,
+                            see `configure_incremental`
+        :param archive: stream the packaged chart instead of writing the output folder, see `package`.
+                        A path, "-" for stdout or a writable binary file object, or when the releases are
+                        sharded a dict of release chart folder -> one of those
+        :return: None
+        """
+        self._check_options()
+        mode = type(self).__name__
+        if archive is not None:
+            targets = archive if isinstance(archive, dict) else {"free5gc": archive}
+            if self.release_groups() and len(targets) == 1 and not isinstance(archive, dict):
+                raise ValueError("The releases are sharded, pass a dict of release chart folder -> archive")
+            with telemetry.span("package", mode=mode):
+                for chart_name, target in targets.items():
+                    self.package(target, chart_name)
+            return
+        with telemetry.span("configure", mode=mode, incremental=incremental):
+            if incremental:
+                self.configure_incremental()
+                return
+            with telemetry.span("delete", mode=mode):
+                self.backend.delete(self.path)
+                self.backend.delete(self.values_path)
+            with telemetry.span("copy_charts", mode=mode):
+                self.copy_charts()
+            with telemetry.span("chart_yaml", mode=mode):
+                self._update_chart_yaml()
+            with telemetry.span("values_yaml", mode=mode):
+                self.save_values_yaml()
+
+    def _check_options(self):
+        if self.values_output not in VALUES_OUTPUTS:
+            raise ValueError(f"Unknown values output {self.values_output}, expected one of {VALUES_OUTPUTS}")
+        if self.release_size is not None and self.release_size < 1:
+            raise ValueError(f"Invalid release size {self.release_size}")
+        if self.gnb_list:
+            self._check_ran_releases()
+
+    def _check_ran_releases(self):
+        """
+        The gNBs reach the N2 endpoints of the AMFs in the control-plane release `release_name`, the release names
+        of the slice groups being chosen at install time.
+        :raise ValueError: when `release_size` moves AMFs to the slice-group releases
+        """
+        sharded = {alias for _, aliases in self.release_groups() for alias in aliases}
+        amfs = [amf.name for amf in self.amf_list if amf.t_type == "amf" and amf.name in sharded]
+        if amfs:
+            raise ValueError(f"The RAN cannot reach the AMFs of the slice-group releases ({', '.join(amfs)}), "
+                             f"create it without release_size")
+
+    async def configure_async(self, incremental=False, executor=None):
+        """
+        `configure` for callers running an event loop, the blocking work runs in `executor` and never in the loop.
+        The charts are materialized concurrently while the Chart.yaml and values files are rendered, and every
+        rendered file is written as soon as the chart it belongs to is in place.
+        :param incremental: see `configure`
+        :param executor: concurrent.futures executor for the blocking work, a pool of `copy_workers` threads
+                         private to the call by default
+        :return: None, raises ChartCopyError listing every chart or file that failed
+        """
+        self._check_options()
+        loop = asyncio.get_running_loop()
+        private_executor = executor is None
+        if private_executor:
+            executor = ThreadPoolExecutor(max_workers=max(1, self.copy_workers))
+        mode = type(self).__name__
+        try:
+            with telemetry.span("configure_async", mode=mode, incremental=incremental):
+                if incremental:
+                    await loop.run_in_executor(executor, self.configure_incremental)
+                    return
+                await loop.run_in_executor(executor, self.backend.delete, self.path)
+                await loop.run_in_executor(executor, self.backend.delete, self.values_path)
+                self.collect_charts()
+                copy_futures = {chart_name: executor.submit(self._materialize_chart, src_chart, chart_name, rename)
+                                for src_chart, chart_name, rename in self.chart_jobs}
+                copies = {chart_name: asyncio.wrap_future(future) for chart_name, future in copy_futures.items()}
+                try:
+                    with telemetry.span("render", mode=mode):
+                        rendered = await loop.run_in_executor(executor, self.render_release_files)
+                except BaseException:
+                    await self._abort_copies(copy_futures, copies)
+                    raise
+                writes = {rel_path: self._write_after_copy(executor, copies.get(rel_path.split("/", 1)[0]),
+                                                           content, os.path.join(self.path, rel_path))
+                          for rel_path, content in rendered.items()}
+                names = list(copies) + list(writes)
+                results = await asyncio.gather(*copies.values(), *writes.values(), return_exceptions=True)
+        finally:
+            if private_executor:
+                executor.shutdown(wait=False)
+        failures = [(name, result) for name, result in zip(names, results) if isinstance(result, BaseException)]
+        if failures:
+            raise ChartCopyError(failures)
+
+    @classmethod
+    async def _abort_copies(cls, copy_futures, copies):
+        """
+        Cancel the chart copies that have not started and wait for the running ones, so that nothing is written
+        into the output once `configure_async` raised.
+        :param copy_futures: dict of chart name -> concurrent.futures.Future of its copy
+        :param copies: dict of chart name -> asyncio future wrapping it
+        """
+        for future in copy_futures.values():
+            future.cancel()
+        await asyncio.gather(*copies.values(), return_exceptions=True)
+
+    async def _write_after_copy(self, executor, copy_future, content, dest):
+        if copy_future is not None:
+            await copy_future
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(executor, self.backend.write_bytes, content, dest)
+
+    def render_release_files(self, release_charts=None):
+        """
+        Render the Chart.yaml and values.yaml of the releases, and the values.yaml of the subcharts for the
+        `subcharts` values output. The charts have to be collected already.
+        :param release_charts: result of `release_charts`, computed when None
+        :return: dict of path relative to `self.path` -> file content
+        """
+        if release_charts is None:
+            release_charts = self.release_charts()
+        rendered = {}
+        for chart_name, chart_yaml in release_charts.items():
+            rendered[f"{chart_name}/Chart.yaml"] = ConfigUtils.dump_yaml(chart_yaml).encode()
+        releases, subcharts = self.release_values()
+        for chart_name, sections in releases.items():
+            rendered[f"{chart_name}/values.yaml"] = ConfigUtils.dump_yaml(dict(sections)).encode()
+        for chart_name, values in subcharts.items():
+            rendered[f"{chart_name}/values.yaml"] = ConfigUtils.dump_yaml(values).encode()
+        return rendered
+
+    def configure_incremental(self):
+        """
+        Regenerate `self.path` in place using the manifest of content hashes stored next to the output.
+        Nothing is touched when the spec hash matches the manifest, otherwise only the files whose content
+        differs, or which were copied with another `materialize` strategy, are written and the files that are no
+        longer generated are removed. The AMF IDs and TACs are only reproducible, and an unchanged rebuilt net
+        only left untouched, when the NssaiAllocator has a seed.
+        :return: list of the paths written, relative to `self.path`
+        """
+        mode = type(self).__name__
+        with telemetry.span("spec_hash", mode=mode):
+            self.collect_charts()
+            release_charts = self.release_charts()
+            values_yaml = self.to_dict()
+            sources = self._source_files()
+            spec_hash = hash_spec({
+                "charts": self.chart_jobs,
+                "chart_yaml": release_charts,
+                "values": values_yaml,
+                "sources": {rel_path: (os.path.getsize(src), os.path.getmtime(src))
+                            for rel_path, src in sources.items()},
+                "values_output": self.values_output,
+                "release_name": self.release_name,
+                "materialize": self.materialize,
+            })
+            manifest = Manifest.load(self.path, self.backend)
+        if manifest.spec_hash == spec_hash and manifest.is_complete(self.path, self.backend):
+            logger.info("%s is up to date", self.path)
+            return []
+
+        with telemetry.span("render", mode=mode):
+            rendered = self.render_output(sources, release_charts)
+
+        groups = {}
+        for rel_path, content in rendered.items():
+            groups.setdefault(rel_path.split("/", 1)[0], []).append((rel_path, content))
+        new_manifest = Manifest(spec_hash, materialize=self.materialize)
+        written = []
+        tasks = [(chart_name, self._sync_files, (files, sources, manifest, new_manifest, written))
+                 for chart_name, files in groups.items()]
+        with telemetry.span("sync", mode=mode):
+            ConfigUtils.run_parallel(tasks, self.copy_workers)
+            for rel_path in manifest.files.keys() - new_manifest.files.keys():
+                self._remove_stale_file(rel_path)
+            new_manifest.save(self.path, self.backend)
+        logger.info("%s: %d file(s) written", self.path, len(written))
+        return sorted(written)
+
+    def render_output(self, sources=None, release_charts=None):
+        """
+        Render the whole output without writing anything. The charts have to be collected already.
+        :param sources: result of `_source_files`, computed when None
+        :param release_charts: result of `release_charts`, computed when None
+        :return: dict of path relative to `self.path` -> content, None for the files copied unchanged from
+                 their basic chart
+        """
+        if sources is None:
+            sources = self._source_files()
+        rendered = {rel_path: None for rel_path in sources}
+        for src_chart, chart_name, rename in self.chart_jobs:
+            if rename:
+                sub_chart_yaml = ConfigUtils.load_yaml(f"charts/{src_chart}/Chart.yaml")
+                sub_chart_yaml["name"] = chart_name
+                rendered[f"{chart_name}/Chart.yaml"] = ConfigUtils.dump_yaml(sub_chart_yaml).encode()
+        rendered.update(self.render_release_files(release_charts))
+        return rendered
+
+    def package(self, target, chart_name="free5gc"):
+        """
+        Stream a release chart as a gzip'd tar archive in the layout of `helm package`, its subcharts under
+        `charts/`, without writing the output folder. The unchanged files are read from the basic charts.
+        :param target: path of the archive, "-" for stdout, or a writable binary file object
+        :param chart_name: release chart folder, `free5gc` or a `free5gc-slicesN` group when sharded
+        :return: number of files in the archive
+        """
+        self._check_options()
+        self.collect_charts()
+        sources = self._source_files()
+        return write_chart_archive(target, chart_name, self.render_output(sources), sources)
+
+    def save_values_yaml(self):
+        if self.values_output == "umbrella" and self.release_size is None:
+            super().save_values_yaml()
+            return
+        releases, subcharts = self.release_values()
+        tasks = [(chart_name, self.backend.write_yaml_sections, (sections, f"{self.path}/{chart_name}/values.yaml"))
+                 for chart_name, sections in releases.items()]
+        tasks += [(chart_name, self.backend.write_yaml, (values, f"{self.path}/{chart_name}/values.yaml"))
+                  for chart_name, values in subcharts.items()]
+        ConfigUtils.run_parallel(tasks, self.copy_workers)
+
+    def release_values(self):
+        """
+        Distribute the NF values over the releases, according to `values_output` and `release_size`.
+        When the output is sharded, the empty NRF URIs and MongoDB URLs point to the control-plane release.
+        :return: (dict of release chart folder -> list of its (name, values) sections,
+                  dict of subchart folder -> values)
+        """
+        groups = self.release_groups()
+        if self.values_output == "subcharts":
+            umbrella, subcharts = self.split_values()
+        else:
+            umbrella, subcharts = list(self.iter_values()), {}
+        releases = {"free5gc": []}
+        release_of = {}
+        for chart_name, aliases in groups:
+            releases[chart_name] = []
+            release_of.update(dict.fromkeys(aliases, chart_name))
+        for name, values in umbrella:
+            releases[release_of.get(name, "free5gc")].append((name, self._cross_release_values(values) if groups
+                                                              else values))
+        if groups:
+            subcharts = {chart_name: self._cross_release_values(values) for chart_name, values in subcharts.items()}
+        return releases, subcharts
+
+    def _cross_release_values(self, values):
+        """
+        :return: `values` with the empty NRF URI and MongoDB URL set to the control-plane release, copied if changed
+        """
+        config = values.get("config")
+        if not isinstance(config, dict):
+            return values
+        references = {}
+        if "nrfUri" in config and not config["nrfUri"]:
+            references["nrfUri"] = self.NRF_URI_FORMAT.format(release=self.release_name)
+        mongodb = config.get("mongodb")
+        if isinstance(mongodb, dict) and "url" in mongodb and not mongodb["url"]:
+            references["mongodb"] = dict(mongodb, url=self.MONGODB_URI_FORMAT.format(release=self.release_name))
+        if not references:
+            return values
+        return dict(values, config=dict(config, **references))
+
+    def slice_units(self):
+        """
+        :return: list of the dependency aliases of each slice, the unit a slice-group release is made of.
+                 The NFs not listed belong to the control-plane release.
+        """
+        return []
+
+    def slice_nssais(self):
+        """
+        :return: S-NSSAIs of the slices, in the order of the SMFs serving them
+        """
+        return list(dict.fromkeys(snssai_info.snssai for smf in self.smf_list for snssai_info in smf.snssai_infos))
+
+    def _pool_slices(self):
+        """
+        :return: dict of (DNN, UE pool) -> S-NSSAIs of the SMF upNodes serving it, see `served_slices`
+        """
+        pool_slices = {}
+        for smf in self.smf_list:
+            for up_node in smf.up_nodes:
+                if not isinstance(up_node, UpfNode):
+                    continue
+                for snssai_upf_info in up_node.snssai_upf_infos:
+                    for dnn_upf_info in snssai_upf_info.dnn_upf_infos:
+                        slices = pool_slices.setdefault((dnn_upf_info.dnn, dnn_upf_info.cidr), [])
+                        if snssai_upf_info.snssai not in slices:
+                            slices.append(snssai_upf_info.snssai)
+        return pool_slices
+
+    def apply_dataplane_profiles(self, profiles):
+        """
+        Merge a dataplane profile into the values of every UPF, see `network/dataplane.py`. Its resources replace
+        the ones of `size_resources`.
+        :param profiles: DataplaneProfile or preset name for every slice, a list of them in the order of
+                         `slice_nssais`, or a dict of S-NSSAI or UPF name (its chart alias) -> one of them, a UPF
+                         name taking precedence over the slices it serves. None leaves the UPFs as they are.
+        :return: dict of UPF name -> name of the profile applied
+        """
+        nssais = self.slice_nssais()
+        upfs = [nf for nf in self.unique_nfs() if nf.t_type == "upf"]
+        if isinstance(profiles, (str, DataplaneProfile)):
+            profiles = [profiles] * len(nssais)
+        if not isinstance(profiles, dict):
+            if len(profiles) != len(nssais):
+                raise ValueError(f"{len(profiles)} dataplane profiles for {len(nssais)} slices")
+            profiles = dict(zip(nssais, profiles))
+        upf_names = {upf.name for upf in upfs}
+        unknown = [str(key) for key in profiles if key not in upf_names and key not in nssais]
+        if unknown:
+            raise ValueError(f"Dataplane profiles for unknown slices or UPFs: {', '.join(unknown)}")
+        profiles = {key: DataplaneProfile.get(profile) for key, profile in profiles.items() if profile is not None}
+        pool_slices = self._pool_slices()
+        applied = {}
+        errors = []
+        for upf in upfs:
+            if upf.name in profiles:
+                upf_profiles = {profiles[upf.name].name: profiles[upf.name]}
+            else:
+                upf_profiles = {profiles[nssai].name: profiles[nssai] for nssai in served_slices(upf, pool_slices)
+                                if nssai in profiles}
+            if len(upf_profiles) > 1:
+                errors.append(f"{upf.name} serves slices with the profiles {', '.join(sorted(upf_profiles))}")
+            elif upf_profiles:
+                profile, = upf_profiles.values()
+                upf.values_yaml[upf.t_type] = ConfigUtils.merge_values(upf.values_yaml[upf.t_type],
+                                                                       profile.to_values())
+                applied[upf.name] = profile.name
+        if errors:
+            raise ValueError("Conflicting dataplane profiles:\n  " + "\n  ".join(errors))
+        return applied
+
+    def unique_nfs(self):
+        """
+        :return: the NFs of `nf_list`, one per values section
+        :raise ValueError: when different NFs share a name, only one of them would have a values section
+        """
+        nfs = {}
+        for nf in self.nf_list():
+            if nfs.setdefault(nf.name, nf) is not nf:
+                raise ValueError(f"Several NFs are named {nf.name}, only one of them would be deployed")
+        return list(nfs.values())
+
+    def linked_gnbs(self, smf_links=None):
+        """
+        :param smf_links: dict of SMF name -> its links, the current ones of the SMFs when None
+        :return: dict of the gNB names of the SMF links -> SMFs linking them, in order of appearance
+        """
+        gnbs = {}
+        for smf in self.smf_list:
+            upfs = {up_node.name.upper() for up_node in smf.up_nodes if isinstance(up_node, UpfNode)}
+            for link in (smf.links if smf_links is None else smf_links[smf.name]):
+                for name in (link.src, link.dst):
+                    if name not in upfs and smf not in gnbs.setdefault(name, []):
+                        gnbs[name].append(smf)
+        return gnbs
+
+    def _base_user_planes(self):
+        """
+        :return: dict of SMF name -> (links, UserPlaneGraph or None) of the SMF before the first `create_ran`
+        """
+        if self._ran_base is None:
+            self._ran_base = {smf.name: (list(smf.links), smf.user_plane) for smf in self.smf_list}
+        return self._ran_base
+
+    def _plan_gnb_links(self, names):
+        """
+        Link the gNBs `names` to the UPFs of every SMF the way its first gNB is linked, on copies of the user planes
+        the SMFs had before the first `create_ran`.
+        :return: dict of SMF name -> (links, UserPlaneGraph or None)
+        """
+        planned = {}
+        for smf in self.smf_list:
+            links, user_plane = self._base_user_planes()[smf.name]
+            upfs = {up_node.name.upper() for up_node in smf.up_nodes if isinstance(up_node, UpfNode)}
+            gnbs = [name for link in links for name in (link.src, link.dst) if name not in upfs]
+            new_names = [name for name in names if name not in gnbs] if gnbs else []
+            if new_names:
+                targets = [link.dst for link in links if link.src == gnbs[0]]
+                if user_plane is not None:
+                    user_plane = user_plane.copy()
+                    for name in new_names:
+                        user_plane.add_node(GnbNode(name))
+                        for target in targets:
+                            user_plane.add_link(name, target)
+                    user_plane.validate()
+                    links = user_plane.links()
+                else:
+                    links = links + [Link(name, target) for name in new_names for target in targets]
+            planned[smf.name] = (links, user_plane)
+        return planned
+
+    def create_ran(self, gnbs=None, ues=0, seed=None):
+        """
+        Add UERANSIM gNB charts and the UEs they start for load testing, see `network/ran.py`. Every call replaces
+        the RAN of the previous one, and nothing is changed when it raises.
+        :param gnbs: number of gNBs, `gNB1` to `gNBN` linked in every SMF like its first gNB. None keeps the gNBs the
+                     SMFs link by themselves, e.g. the ones of a placement.
+        :param ues: UEs of every slice, a list of one number per slice in the order of `slice_nssais`, or a dict of
+                    gNB name -> a number for every slice it serves or a list of one number per slice
+        :param seed: seed of the UE keys, random keys when None
+        :return: SubscriberGenerator of the UEs, whose `write` or `insert` provisions them
+        :raise ValueError: when `release_size` moves AMFs to the slice-group releases, see `_check_ran_releases`
+        """
+        self._check_ran_releases()
+        base = self._base_user_planes()
+        if gnbs is not None:
+            if len(self.linked_gnbs({name: links for name, (links, _) in base.items()})) > 1:
+                raise ValueError("The SMFs already link several gNBs, create the RAN with gnbs=None")
+            planned = self._plan_gnb_links([f"gNB{index + 1}" for index in range(gnbs)])
+        else:
+            planned = dict(base)
+        linked = self.linked_gnbs({name: links for name, (links, _) in planned.items()})
+        aliases = {name: gnb_alias(name) for name in linked}
+        if len(set(aliases.values())) != len(aliases):
+            raise ValueError(f"gNB names with the same chart alias: {', '.join(linked)}")
+        amfs = list({amf.name: amf for amf in self.amf_list if amf.t_type == "amf"}.values())
+        nssais = self.slice_nssais()
+        gnb_slices = {name: [snssai_info.snssai for smf in smfs for snssai_info in smf.snssai_infos]
+                      for name, smfs in linked.items()}
+        generator = None
+        groups = {name: [] for name in linked}
+        if ues:
+            counts = distribute_ues(ues, gnb_slices, nssais)
+            totals = [sum(gnb_counts[index] for gnb_counts in counts.values()) for index in range(len(nssais))]
+            generator = SubscriberGenerator.from_slice_net(self, totals, seed=seed, shared_keys=True)
+            groups = ue_groups(generator, counts)
+        gnb_list = []
+        for index, (name, smfs) in enumerate(linked.items()):
+            localities = {smf.locality for smf in smfs}
+            gnb_amfs = [amf for amf in amfs if amf.locality in localities] or amfs
+            gnb_list.append(GNB(aliases[name], self.smf_list[0].plmns[0], gnb_amfs[0].supported_tai_list[0],
+                                (index + 1) << 4, list(dict.fromkeys(gnb_slices[name])),
+                                [self.AMF_NGAP_FORMAT.format(release=self.release_name, amf=amf.name)
+                                 for amf in gnb_amfs], groups[name]))
+        for smf in self.smf_list:
+            links, user_plane = planned[smf.name]
+            if links == smf.links and user_plane is smf.user_plane:
+                continue
+            smf.links, smf.user_plane = list(links), user_plane
+            if user_plane is not None:
+                smf.up_nodes = user_plane.up_nodes()
+            smf.configure()
+        self.gnb_list = gnb_list
+        self.ue_subscribers = generator
+        logger.info("%d gNB(s) with %d UE(s)", len(self.gnb_list), sum(gnb.ue_count() for gnb in self.gnb_list))
+        return generator
+
+    def size_resources(self, demands, model=None):
+        """
+        Set the `replicaCount` and `resources` of every NF from the demand of the slices it serves, see
+        `network/sizing.py`.
+        :param demands: SliceDemand of each slice in the order of `slice_nssais`, or dict of S-NSSAI -> SliceDemand
+        :param model: CapacityModel, the default one when None
+        :return: SizingReport
+        """
+        model = model if model is not None else CapacityModel()
+        nssais = self.slice_nssais()
+        if not isinstance(demands, dict):
+            if len(demands) != len(nssais):
+                raise ValueError(f"{len(demands)} slice demands for {len(nssais)} slices")
+            demands = dict(zip(nssais, demands))
+        pool_slices = self._pool_slices()
+        report = SizingReport()
+        slice_names = {}
+        for nssai, demand in demands.items():
+            slice_names[nssai] = f"{nssai.sst}-{nssai.sd}"
+            report.add_slice(slice_names[nssai], demand)
+        nfs = self.unique_nfs()
+        served = {}
+        # (NF type, S-NSSAI) -> number of NFs of the type sharing the demand of the slice
+        sharing = {}
+        for nf in nfs:
+            slices = served_slices(nf, pool_slices)
+            served[nf.name] = [nssai for nssai in (demands if slices is None else dict.fromkeys(slices))
+                               if nssai in demands]
+            for nssai in served[nf.name]:
+                sharing[nf.t_type, nssai] = sharing.get((nf.t_type, nssai), 0) + 1
+        with telemetry.span("size_resources", mode=type(self).__name__):
+            for nf in nfs:
+                parts = {nssai: demands[nssai] * (1 / sharing[nf.t_type, nssai]) for nssai in served[nf.name]}
+                demand = sum(parts.values(), SliceDemand())
+                sizing = model.size(nf.t_type, demand)
+                if sizing is None:
+                    continue
+                replicas, resources = sizing
+                nf.values_yaml[nf.t_type]["replicaCount"] = replicas
+                nf.values_yaml[nf.t_type]["resources"] = resources
+                weights = {nssai: part.subscribers for nssai, part in parts.items()}
+                if not any(weights.values()):
+                    weights = {nssai: part.sessions_per_second or 1 for nssai, part in parts.items()}
+                total = sum(weights.values())
+                report.add_nf(nf, replicas, resources, demand,
+                              {slice_names[nssai]: weight / total for nssai, weight in weights.items()})
+        self.sizing = report
+        return report
+
+    def release_groups(self):
+        """
+        :return: list of (chart folder, dependency aliases) of the slice-group releases, `release_size` units each
+        """
+        if self.release_size is None:
+            return []
+        units = self.slice_units()
+        groups = []
+        for start in range(0, len(units), self.release_size):
+            aliases = [alias for unit in units[start:start + self.release_size] for alias in unit]
+            groups.append((f"free5gc-slices{len(groups) + 1}", aliases))
+        return groups
+
+    def split_values(self):
+        """
+        Split the NF values for the `subcharts` values output. The charts have to be collected already.
+        An NF section goes to the subchart of the dependency aliased as the NF, merged over the values.yaml of the
+        basic chart, and the umbrella only keeps its `enabled` switch for the dependency condition.
+        The sections of NFs without a subchart of their own stay in the umbrella.
+        :return: (list of the umbrella (name, values) sections, dict of subchart folder -> values)
+        """
+        sources = {chart_name: src_chart for src_chart, chart_name, _ in self.chart_jobs}
+        charts = {}
+        for chart_yaml in self.release_charts().values():
+            for dependency in chart_yaml["dependencies"]:
+                charts.setdefault(dependency.get("alias", dependency["name"]), dependency["name"])
+        defaults = {}
+        umbrella = []
+        subcharts = {}
+        for name, values in self.iter_values():
+            chart_name = charts.get(name)
+            if chart_name not in sources or chart_name in subcharts:
+                umbrella.append((name, values))
+                continue
+            src_chart = sources[chart_name]
+            if src_chart not in defaults:
+                values_path = f"charts/{src_chart}/values.yaml"
+                defaults[src_chart] = (ConfigUtils.load_yaml(values_path) or {}) if os.path.isfile(values_path) else {}
+            subcharts[chart_name] = ConfigUtils.merge_values(defaults[src_chart], values)
+            if "enabled" in values:
+                umbrella.append((name, {"enabled": values["enabled"]}))
+        return umbrella, subcharts
+
+    def _source_files(self):
+        """
+        :return: output path relative to `self.path` -> path of the basic chart file it is copied from
+        """
+        sources = {}
+        for src_chart, chart_name, _ in self.chart_jobs:
+            src_folder = f"charts/{src_chart}"
+            for root, _, file_names in os.walk(src_folder):
+                for file_name in file_names:
+                    src = os.path.join(root, file_name)
+                    rel_path = os.path.relpath(src, src_folder).replace(os.sep, "/")
+                    sources[f"{chart_name}/{rel_path}"] = src
+        return sources
+
+    def _sync_files(self, files, sources, manifest, new_manifest, written):
+        for rel_path, content in files:
+            digest = hash_file(sources[rel_path]) if content is None else hash_bytes(content)
+            new_manifest.files[rel_path] = digest
+            dest = os.path.join(self.path, rel_path)
+            old_digest = manifest.files.get(rel_path)
+            if old_digest is None and self.backend.isfile(dest):
+                old_digest = self.backend.digest(dest)
+            # A copied file is materialized again when the strategy changed, e.g. from `copy` to `hardlink`.
+            relink = content is None and manifest.materialize not in (None, self.materialize)
+            if old_digest == digest and self.backend.isfile(dest) and not relink:
+                continue
+            if content is None:
+                self.backend.copy_file(sources[rel_path], dest, self.materialize)
+            else:
+                self.backend.write_bytes(content, dest)
+            written.append(rel_path)
+
+    def _remove_stale_file(self, rel_path):
+        self.backend.remove_file(os.path.join(self.path, rel_path), self.path)
+
+    def collect_charts(self):
+        """
+        Collect the charts of the topology into `chart_jobs`.
+        """
+        self.chart_jobs = []
         self.copy_common()
         self.copy_specific_charts()
+        for gnb in self.gnb_list:
+            self.copy_chart("ueransim-gnb", f"ueransim-{gnb.name}", rename=True)
+
+    def copy_charts(self):
+        """
+        Collect the charts of the topology and materialize them through a thread pool of `copy_workers` threads.
+        """
+        self.collect_charts()
+        tasks = [(chart_name, self._materialize_chart, (src_chart, chart_name, rename))
+                 for src_chart, chart_name, rename in self.chart_jobs]
+        ConfigUtils.run_parallel(tasks, self.copy_workers)
+
+    def copy_chart(self, src_chart, chart_name=None, rename=False):
+        """
+        Schedule the copy of `charts/src_chart` to `self.path/chart_name`.
+        :param src_chart: folder name of the basic chart
+        :param chart_name: folder name in the output, defaults to `src_chart`
+        :param rename: whether the name in the copied Chart.yaml should be changed as `chart_name`
+        :return: None
+        """
+        self.chart_jobs.append((src_chart, chart_name or src_chart, rename))
+
+    def _materialize_chart(self, src_chart, chart_name, rename):
+        self.backend.copy_folder(f"charts/{src_chart}", f"{self.path}/{chart_name}", self.materialize)
+        if rename:
+            self.chg_sub_chart_name(chart_name)
 
     @abc.abstractmethod
     def copy_specific_charts(self):
         pass
 
-    def _update_chart_yaml(self):
-        chart_template_path = f"{self.path}/../templates/free5gc/chart.yaml"
-        chart_path = f"{self.path}/free5gc/Chart.yaml"
-        chart_yaml = ConfigUtils.load_yaml(chart_template_path)
+    def chart_yaml(self):
+        """
+        :return: the umbrella Chart.yaml with the dependencies of the topology
+        """
+        return self.release_charts()["free5gc"]
+
+    def release_charts(self):
+        """
+        :return: dict of release chart folder -> Chart.yaml, the `free5gc` umbrella first. The slice-group charts
+                 depend on the subcharts of their slices, the umbrella on every other one.
+        """
+        chart_yaml = templates.get("chart")
+        self.dependencies = []
         self.update_dependency()
-        chart_yaml["dependencies"].extend(self.dependencies)
-        ConfigUtils.write_yaml(chart_yaml, chart_path)
+        self.dependencies.extend(ConfigUtils.tpl_dependency(f"ueransim-{gnb.name}", gnb.name)
+                                 for gnb in self.gnb_list)
+        groups = self.release_groups()
+        grouped = {alias for _, aliases in groups for alias in aliases}
+        chart_yaml["dependencies"].extend(dependency for dependency in self.dependencies
+                                          if dependency["alias"] not in grouped)
+        charts = {"free5gc": chart_yaml}
+        dependencies = {dependency["alias"]: dependency for dependency in self.dependencies}
+        for index, (chart_name, aliases) in enumerate(groups):
+            group_chart_yaml = templates.get("chart")
+            group_chart_yaml["name"] = chart_name
+            group_chart_yaml["description"] = f"Slice group {index + 1} of the Free5GC deployment.\n"
+            group_chart_yaml["dependencies"] = [dependency for dependency in group_chart_yaml["dependencies"]
+                                                if dependency["name"] == "common"]
+            group_chart_yaml["dependencies"].extend(dependencies[alias] for alias in aliases)
+            charts[chart_name] = group_chart_yaml
+        return charts
+
+    def _update_chart_yaml(self):
+        for chart_name, chart_yaml in self.release_charts().items():
+            self.backend.write_yaml(chart_yaml, f"{self.path}/{chart_name}/Chart.yaml")
 
     @abc.abstractmethod
     def update_dependency(self):
         pass
 
     def copy_common(self):
-        ConfigUtils.copy_folder("charts/common", f"{self.path}/common")
-        ConfigUtils.copy_folder("charts/free5gc", f"{self.path}/free5gc")
-        ConfigUtils.copy_folder("charts/free5gc-webui", f"{self.path}/free5gc-webui")
-        ConfigUtils.copy_folder("charts/mongodb", f"{self.path}/mongodb")
-        ConfigUtils.copy_folder("charts/free5gc-chf", f"{self.path}/free5gc-chf")
-        ConfigUtils.copy_folder("charts/free5gc-ausf", f"{self.path}/free5gc-ausf")
-        ConfigUtils.copy_folder("charts/free5gc-nrf", f"{self.path}/free5gc-nrf")
-        ConfigUtils.copy_folder("charts/free5gc-nssf", f"{self.path}/free5gc-nssf")
-        ConfigUtils.copy_folder("charts/free5gc-udm", f"{self.path}/free5gc-udm")
-        ConfigUtils.copy_folder("charts/free5gc-udr", f"{self.path}/free5gc-udr")
+        self.copy_chart("common")
+        self.copy_chart("free5gc")
+        self.copy_chart("free5gc-webui")
+        self.copy_chart("mongodb")
+        self.copy_chart("free5gc-chf")
+        self.copy_chart("free5gc-ausf")
+        self.copy_chart("free5gc-nrf")
+        self.copy_chart("free5gc-nssf")
+        self.copy_chart("free5gc-udm")
+        self.copy_chart("free5gc-udr")
 
     def chg_sub_chart_name(self, chart_name):
         """
@@ -98,23 +799,31 @@ class CommonSliceNet(SliceNet):
         :return: None
         """
         chart_path = f"{self.path}/{chart_name}/Chart.yaml"
-        chart_yaml = ConfigUtils.load_yaml(chart_path)
+        chart_yaml = self.backend.load_yaml(chart_path)
         # ConfigUtils.delete_folder(chart_path)
         chart_yaml["name"] = chart_name
-        ConfigUtils.write_yaml(chart_yaml, chart_path)
+        self.backend.write_yaml(chart_yaml, chart_path)
 
 
 class NormalSliceNet(CommonSliceNet, ABC):
-    def __init__(self, slices_num, dnn_names, path="5gc"):
-        super().__init__(path)
-        amf_id = AMF.random_amf_id()
+    def __init__(self, slices_num, dnn_names, path="5gc", nssai_allocator=None, backend=None, upf_replicas=1):
+        """
+        :param upf_replicas: number of UPFs of each slice, or a list of one number per slice. The UE pool of a slice
+                             with several UPFs is sharded between them, and its SMF links every one of them.
+        """
+        super().__init__(path, nssai_allocator, backend)
+        self.upf_replicas = list(upf_replicas) if isinstance(upf_replicas, (list, tuple)) \
+            else [upf_replicas] * slices_num
+        if len(self.upf_replicas) != slices_num or min(self.upf_replicas, default=1) < 1:
+            raise ValueError(f"Invalid UPF replicas {upf_replicas} for {slices_num} slices")
+        amf_id = self.random_hex()
         plmn = PLMN("999", "70")
         self.supported_plmns = [plmn]
         guami = Guami(plmn, amf_id)
         served_guami_list = [guami]
-        tai = TAI(plmn)
+        tai = TAI(plmn, self.random_hex())
         support_tai_list = [tai]
-        self.nssais = [NSSAI() for _ in range(slices_num)]
+        self.nssais = self.nssai_allocator.allocate_many(slices_num)
         nssai_in_plmn = NssaiInPlmn(plmn, self.nssais)
         support_plmn_list = [nssai_in_plmn]
         supported_dnn_list = dnn_names
@@ -129,61 +838,83 @@ class NormalSliceNet(CommonSliceNet, ABC):
     def create_upf(self, i, pool):
         pfcp = PfcpForUPF()
         dnn = DNN(self.dnn_names[i], pool)
-        upf = UPF(self.dnn_names[i], pfcp, [dnn])
+        upf = UPF(self.upf_aliases(i)[0], pfcp, [dnn])
         return upf
 
+    def upf_aliases(self, i):
+        """
+        :return: UPF names of slice i, also the aliases of their charts
+        """
+        if self.upf_replicas[i] == 1:
+            return [f"upf{i + 1}"]
+        return [f"upf{i + 1}-{replica + 1}" for replica in range(self.upf_replicas[i])]
+
+    def create_user_plane(self, i, pool, static_pool):
+        """
+        :return: (up nodes for the SMF, UPFs) of slice i. A single UPF serves the whole pool as before, replicas
+                 each serve a shard of it and get their name as PFCP node id.
+        """
+        aliases = self.upf_aliases(i)
+        shards = NetSpliter.shard(pool, len(aliases)) if len(aliases) > 1 else [(pool, static_pool)]
+        up_nodes, upfs = [], []
+        for alias, (sub_pool, static_sub_pool) in zip(aliases, shards):
+            snssai_upf_info = SnssaiUpfInfo(self.nssais[i], [DnnUpfInfo(self.dnn_names[i], sub_pool,
+                                                                        static_sub_pool)])
+            interfaces = [Interface("", self.dnn_names[i])]
+            if len(aliases) == 1:
+                up_nodes.append(PSAUpfNode(alias, [snssai_upf_info], interfaces))
+                upfs.append(self.create_upf(i, pool))
+                continue
+            up_nodes.append(PSAUpfNode(alias, [snssai_upf_info], interfaces, node_id=alias))
+            upfs.append(UPF(alias, PfcpForUPF(alias), [DNN(self.dnn_names[i], sub_pool)]))
+        return up_nodes, upfs
+
 
 class SliceNetModeOne(NormalSliceNet):
-    def __init__(self, slices_num, dnn_names, path="5gc_mode1"):
-        super().__init__(slices_num, dnn_names, path)
+    def __init__(self, slices_num, dnn_names, path="5gc_mode1", nssai_allocator=None, backend=None, upf_replicas=1):
+        super().__init__(slices_num, dnn_names, path, nssai_allocator, backend, upf_replicas)
         # TODO: 配置切片与垂直行业网络对应
         for i in range(self.slices_num):
             pool, static_pool = self.net_spliter.split()
-            smf = self._create_smf(i, pool, static_pool)
+            up_nodes, upfs = self.create_user_plane(i, pool, static_pool)
+            smf = self._create_smf(i, up_nodes)
             self.smf_list.append(smf)
-            upf = self.create_upf(i, pool)
-            self.upf_list.append(upf)
+            self.upf_list.extend(upfs)
 
-    def _create_smf(self, i, pool, static_pool):
+    def _create_smf(self, i, up_nodes):
         dnn_info = DnnInfo(self.dnn_names[i], "8.8.8.8", "2001:4860:4860::8888")
         dnn_infos = [dnn_info]
         nssai_info = SnssaiInfo(self.nssais[i], dnn_infos)
         nssai_infos = [nssai_info]
-        dnn_upf_info = DnnUpfInfo(self.dnn_names[i], pool, static_pool)
-        dnn_upf_infos = [dnn_upf_info]
-        snssai_upf_info = SnssaiUpfInfo(self.nssais[i], dnn_upf_infos)
-        snssai_upf_infos = [snssai_upf_info]
-        interface = Interface("", self.dnn_names[i])
-        interfaces = [interface]
-        up_node = PSAUpfNode(f"upf{i + 1}", snssai_upf_infos, interfaces)
         # gnb = GnbNode("gNB1")
-        up_nodes = [up_node]
-        link = Link("gNB1", up_node.name.upper())
-        links = [link]
+        links = [Link("gNB1", up_node.name.upper()) for up_node in up_nodes]
         pfcp = PfcpForSMF()
         smf = SMF(f"smf{i + 1}", nssai_infos, self.supported_plmns, pfcp, up_nodes, links)
         return smf
 
     def copy_specific_charts(self):
-        ConfigUtils.copy_folder("charts/free5gc-amf", f"{self.path}/free5gc-amf")
-        ConfigUtils.copy_folder("charts/free5gc-pcf", f"{self.path}/free5gc-pcf")
+        self.copy_chart("free5gc-amf")
+        self.copy_chart("free5gc-pcf")
         for i in range(self.slices_num):
-            ConfigUtils.copy_folder(f"charts/free5gc-smf-ulcl", f"{self.path}/free5gc-smf{i + 1}")
-            ConfigUtils.copy_folder(f"charts/free5gc-upf", f"{self.path}/free5gc-upf{i + 1}")
-            self.chg_sub_chart_name(f"free5gc-smf{i + 1}")
-            self.chg_sub_chart_name(f"free5gc-upf{i + 1}")
+            self.copy_chart("free5gc-smf-ulcl", f"free5gc-smf{i + 1}", rename=True)
+            for alias in self.upf_aliases(i):
+                self.copy_chart("free5gc-upf", f"free5gc-{alias}", rename=True)
+
+    def slice_units(self):
+        return [[f"smf{i + 1}"] + self.upf_aliases(i) for i in range(self.slices_num)]
 
     def update_dependency(self):
         self.dependencies.append(ConfigUtils.tpl_dependency("free5gc-amf", "amf"))
         self.dependencies.append(ConfigUtils.tpl_dependency("free5gc-pcf", "pcf"))
         for i in range(self.slices_num):
             self.dependencies.append(ConfigUtils.tpl_dependency(f"free5gc-smf{i + 1}", f"smf{i + 1}"))
-            self.dependencies.append(ConfigUtils.tpl_dependency(f"free5gc-upf{i + 1}", f"upf{i + 1}"))
+            for alias in self.upf_aliases(i):
+                self.dependencies.append(ConfigUtils.tpl_dependency(f"free5gc-{alias}", alias))
 
 
 class SliceNetModeTwo(NormalSliceNet):
-    def __init__(self, slices_num, dnn_names, path="5gc_mode2"):
-        super().__init__(slices_num, dnn_names, path)
+    def __init__(self, slices_num, dnn_names, path="5gc_mode2", nssai_allocator=None, backend=None, upf_replicas=1):
+        super().__init__(slices_num, dnn_names, path, nssai_allocator, backend, upf_replicas)
 
         nssai_infos = []
         up_nodes = []
@@ -194,48 +925,53 @@ class SliceNetModeTwo(NormalSliceNet):
             nssai_info = SnssaiInfo(self.nssais[i], dnn_infos)
             nssai_infos.append(nssai_info)
             pool, static_pool = self.net_spliter.split()
-            dnn_upf_info = DnnUpfInfo(dnn_names[i], pool, static_pool)
-            dnn_upf_infos = [dnn_upf_info]
-            snssai_upf_info = SnssaiUpfInfo(self.nssais[i], dnn_upf_infos)
-            snssai_upf_infos = [snssai_upf_info]
-            interface = Interface("", dnn_names[i])
-            interfaces = [interface]
-            up_node = PSAUpfNode(f"upf{i + 1}", snssai_upf_infos, interfaces)
-            up_nodes.append(up_node)
-            links.append(Link(f"gNB1", up_node.name.upper()))
-            upf = self.create_upf(i, pool)
-            self.upf_list.append(upf)
+            slice_up_nodes, upfs = self.create_user_plane(i, pool, static_pool)
+            for up_node in slice_up_nodes:
+                up_nodes.append(up_node)
+                links.append(Link(f"gNB1", up_node.name.upper()))
+            self.upf_list.extend(upfs)
         pfcp = PfcpForSMF()
         self.smf_list.append(SMF(f"smf1", nssai_infos, self.supported_plmns, pfcp, up_nodes, links))
 
     def copy_specific_charts(self):
-        ConfigUtils.copy_folder("charts/free5gc-amf", f"{self.path}/free5gc-amf")
-        ConfigUtils.copy_folder("charts/free5gc-pcf", f"{self.path}/free5gc-pcf")
-        ConfigUtils.copy_folder("charts/free5gc-smf-ulcl", f"{self.path}/free5gc-smf1")
+        self.copy_chart("free5gc-amf")
+        self.copy_chart("free5gc-pcf")
+        self.copy_chart("free5gc-smf-ulcl", "free5gc-smf1", rename=True)
         for i in range(self.slices_num):
-            ConfigUtils.copy_folder(f"charts/free5gc-upf", f"{self.path}/free5gc-upf{i + 1}")
-            self.chg_sub_chart_name(f"free5gc-upf{i + 1}")
+            for alias in self.upf_aliases(i):
+                self.copy_chart("free5gc-upf", f"free5gc-{alias}", rename=True)
+
+    def slice_units(self):
+        # The SMF serves every slice, the user plane can only be split from the control plane as a whole.
+        return [["smf1"] + [alias for i in range(self.slices_num) for alias in self.upf_aliases(i)]]
 
     def update_dependency(self):
         self.dependencies.append(ConfigUtils.tpl_dependency("free5gc-amf", "amf"))
         self.dependencies.append(ConfigUtils.tpl_dependency("free5gc-pcf", "pcf"))
         self.dependencies.append(ConfigUtils.tpl_dependency(f"free5gc-smf1", f"smf1"))
-        self.chg_sub_chart_name(f"free5gc-smf1")
         for i in range(self.slices_num):
-            self.dependencies.append(ConfigUtils.tpl_dependency(f"free5gc-upf{i + 1}", f"upf{i + 1}"))
+            for alias in self.upf_aliases(i):
+                self.dependencies.append(ConfigUtils.tpl_dependency(f"free5gc-{alias}", alias))
 
 
 class SliceNetModeThree(CommonSliceNet):
     """
     Select nearby UPF according to the connected gNodeB
+
+    With a `placement` (UpfPlacement), at most `area_num` UPFs are placed on its candidate sites so as to minimize the
+    gNB -> UPF latency: there is one area per site with a UPF, its locality is the site name and its SMF links the
+    gNBs assigned to the site to its UPF.
     """
-    def __init__(self, slices_num, dnn_names, area_num, path="5gc_mode3"):
-        super().__init__(path)
-        self.area_num = area_num
+    def __init__(self, slices_num, dnn_names, area_num, path="5gc_mode3", nssai_allocator=None, backend=None,
+                 placement=None):
+        super().__init__(path, nssai_allocator, backend)
+        areas = placement.solve(area_num) if placement is not None else None
+        self.placement = placement
+        self.area_num = len(areas) if areas is not None else area_num
         plmn = PLMN("999", "70")
         supported_plmns = [plmn]
 
-        nssais = [NSSAI() for _ in range(slices_num)]
+        nssais = self.nssai_allocator.allocate_many(slices_num)
         nssai_in_plmn = NssaiInPlmn(plmn, nssais)
         support_plmn_list = [nssai_in_plmn]
         supported_dnn_list = dnn_names
@@ -245,11 +981,11 @@ class SliceNetModeThree(CommonSliceNet):
         self.nssf_list.append(NSSF("nssf", supported_plmns, support_plmn_list))
 
         for i in range(self.area_num):
-            locality = f"area{i + 1}"
-            amf_id = AMF.random_amf_id()
+            locality = areas[i][0] if areas is not None else f"area{i + 1}"
+            amf_id = self.random_hex()
             guami = Guami(plmn, amf_id)
             served_guami_list = [guami]
-            tai = TAI(plmn)
+            tai = TAI(plmn, self.random_hex())
             support_tai_list = [tai]
             amf = AMF(f"amf{i + 1}", served_guami_list, support_tai_list,
                       support_plmn_list, supported_dnn_list, locality=locality)
@@ -268,10 +1004,11 @@ class SliceNetModeThree(CommonSliceNet):
             interface = Interface("", dnn_names[0])
             interfaces = [interface]
             up_node = PSAUpfNode(f"upf{i + 1}", snssai_upf_infos, interfaces)
-            up_nodes = [up_node]
-            link = Link("gNB1", up_node.name.upper())
-            links = [link]
-            smf = SMF(f"smf{i + 1}", nssai_infos, supported_plmns, pfcp, up_nodes, links, locality=locality)
+            user_plane = UserPlaneGraph()
+            user_plane.add_node(up_node)
+            for gnb_name in areas[i][1] if areas is not None else ["gNB1"]:
+                user_plane.add_link(user_plane.add_node(GnbNode(gnb_name)), up_node)
+            smf = SMF(f"smf{i + 1}", nssai_infos, supported_plmns, pfcp, locality=locality, user_plane=user_plane)
             self.smf_list.append(smf)
             pfcp = PfcpForUPF()
             dnn = DNN(dnn_names[0], pool)
@@ -280,10 +1017,13 @@ class SliceNetModeThree(CommonSliceNet):
 
     def copy_specific_charts(self):
         for i in range(self.area_num):
-            ConfigUtils.copy_folder("charts/free5gc-amf", f"{self.path}/free5gc-amf{i + 1}")
-            ConfigUtils.copy_folder("charts/free5gc-pcf", f"{self.path}/free5gc-pcf{i + 1}")
-            ConfigUtils.copy_folder("charts/free5gc-smf-ulcl", f"{self.path}/free5gc-smf{i + 1}")
-            ConfigUtils.copy_folder(f"charts/free5gc-upf", f"{self.path}/free5gc-upf{i + 1}")
+            self.copy_chart("free5gc-amf", f"free5gc-amf{i + 1}", rename=True)
+            self.copy_chart("free5gc-pcf", f"free5gc-pcf{i + 1}", rename=True)
+            self.copy_chart("free5gc-smf-ulcl", f"free5gc-smf{i + 1}", rename=True)
+            self.copy_chart("free5gc-upf", f"free5gc-upf{i + 1}", rename=True)
+
+    def slice_units(self):
+        return [[f"amf{i + 1}", f"pcf{i + 1}", f"smf{i + 1}", f"upf{i + 1}"] for i in range(self.area_num)]
 
     def update_dependency(self):
         for i in range(self.area_num):
@@ -291,29 +1031,26 @@ class SliceNetModeThree(CommonSliceNet):
             self.dependencies.append(ConfigUtils.tpl_dependency(f"free5gc-pcf{i + 1}", f"pcf{i + 1}"))
             self.dependencies.append(ConfigUtils.tpl_dependency(f"free5gc-smf{i + 1}", f"smf{i + 1}"))
             self.dependencies.append(ConfigUtils.tpl_dependency(f"free5gc-upf{i + 1}", f"upf{i + 1}"))
-            self.chg_sub_chart_name(f"free5gc-upf{i + 1}")
-            self.chg_sub_chart_name(f"free5gc-smf{i + 1}")
-            self.chg_sub_chart_name(f"free5gc-amf{i + 1}")
-            self.chg_sub_chart_name(f"free5gc-pcf{i + 1}")
 
 
 class SliceNetModeFour(CommonSliceNet):
 
-    def __init__(self, slices_num, dnn_names, path="5gc_mode4"):
-        super().__init__(path)
-        amf_id = AMF.random_amf_id()
+    def __init__(self, slices_num, dnn_names, path="5gc_mode4", nssai_allocator=None, backend=None):
+        super().__init__(path, nssai_allocator, backend)
+        amf_id = self.random_hex()
         plmn = PLMN("999", "70")
         supported_plmns = [plmn]
         guami = Guami(plmn, amf_id)
         served_guami_list = [guami]
-        tai = TAI(plmn)
+        tai = TAI(plmn, self.random_hex())
         support_tai_list = [tai]
-        nssais = [NSSAI() for _ in range(slices_num)]
+        nssais = self.nssai_allocator.allocate_many(slices_num)
         nssai_in_plmn = NssaiInPlmn(plmn, nssais)
         support_plmn_list = [nssai_in_plmn]
         supported_dnn_list = dnn_names
         self.slices_num = slices_num
         self.amf_list.append(AMF("amf", served_guami_list, support_tai_list, support_plmn_list, supported_dnn_list))
+        self.pcf_list.append(PCF("pcf"))
         self.amf_list.append(AUSF("ausf", supported_plmns))
         self.nrf_list.append(NRF("nrf", plmn))
         self.nssf_list.append(NSSF("nssf", supported_plmns, support_plmn_list))
@@ -337,26 +1074,30 @@ class SliceNetModeFour(CommonSliceNet):
             interface3 = Interface("", dnn_names[i], "N9")
             interfaces2 = [interface3]
             psa_up_node = PSAUpfNode(f"psaupf{i+1}", snssai_upf_infos, interfaces2)
-            up_nodes = [iup_node, psa_up_node]
-            link1 = Link("gNB1", iup_node.name.upper())
-            link2 = Link(iup_node.name.upper(), psa_up_node.name.upper())
-            links = [link1, link2]
-            smf = SMF(f"smf{i + 1}", nssai_infos, supported_plmns, pfcp, up_nodes, links, ulcl=True)
+            user_plane = UserPlaneGraph()
+            gnb = user_plane.add_node(GnbNode("gNB1"))
+            user_plane.add_node(iup_node)
+            user_plane.add_node(psa_up_node)
+            user_plane.chain(gnb, iup_node, psa_up_node)
+            smf = SMF(f"smf{i + 1}", nssai_infos, supported_plmns, pfcp, ulcl=True, user_plane=user_plane)
             self.smf_list.append(smf)
             pfcp = PfcpForUPF()
             dnn = DNN(dnn_names[i], pool)
-            i_upf = UPF(f"upf{i + 1}", pfcp, [dnn])
-            psa_upf = UPF(f"upf{i + 1}", pfcp, [dnn])
+            i_upf = UPF(f"iupf{i + 1}", pfcp, [dnn])
+            psa_upf = UPF(f"psaupf{i + 1}", pfcp, [dnn])
             self.upf_list.append(i_upf)
             self.upf_list.append(psa_upf)
 
     def copy_specific_charts(self):
-        ConfigUtils.copy_folder("charts/free5gc-amf", f"{self.path}/free5gc-amf")
-        ConfigUtils.copy_folder("charts/free5gc-pcf", f"{self.path}/free5gc-pcf")
+        self.copy_chart("free5gc-amf")
+        self.copy_chart("free5gc-pcf")
         for i in range(self.slices_num):
-            ConfigUtils.copy_folder(f"charts/free5gc-smf-ulcl", f"{self.path}/free5gc-smf{i + 1}")
-            ConfigUtils.copy_folder(f"charts/free5gc-upf", f"{self.path}/free5gc-iupf{i + 1}")
-            ConfigUtils.copy_folder(f"charts/free5gc-upf", f"{self.path}/free5gc-psaupf{i + 1}")
+            self.copy_chart("free5gc-smf-ulcl", f"free5gc-smf{i + 1}", rename=True)
+            self.copy_chart("free5gc-upf", f"free5gc-iupf{i + 1}", rename=True)
+            self.copy_chart("free5gc-upf", f"free5gc-psaupf{i + 1}", rename=True)
+
+    def slice_units(self):
+        return [[f"smf{i + 1}", f"iupf{i + 1}", f"psaupf{i + 1}"] for i in range(self.slices_num)]
 
     def update_dependency(self):
         self.dependencies.append(ConfigUtils.tpl_dependency(f"free5gc-amf", f"amf"))
@@ -365,7 +1106,4 @@ class SliceNetModeFour(CommonSliceNet):
             self.dependencies.append(ConfigUtils.tpl_dependency(f"free5gc-smf{i + 1}", f"smf{i + 1}"))
             self.dependencies.append(ConfigUtils.tpl_dependency(f"free5gc-iupf{i + 1}", f"iupf{i + 1}"))
             self.dependencies.append(ConfigUtils.tpl_dependency(f"free5gc-psaupf{i + 1}", f"psaupf{i + 1}"))
-            self.chg_sub_chart_name(f"free5gc-iupf{i + 1}")
-            self.chg_sub_chart_name(f"free5gc-psaupf{i + 1}")
-            self.chg_sub_chart_name(f"free5gc-smf{i + 1}")
 
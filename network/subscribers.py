@@ -0,0 +1,316 @@
+"""
+Bulk subscriber provisioning of the free5GC MongoDB.
+
+`SubscriberGenerator` creates the documents the webconsole would store for every UE: authentication subscription
+(K, OPc, SQN, AMF), access and mobility data, session management data, SMF selection data and the AM / SM policy
+data, for the S-NSSAIs and DNNs of the slices of a SliceNet. The subscribers of a slice get a contiguous SUPI range.
+
+Subscribers are generated chunk by chunk, the identifiers and keys of a whole chunk at once from a single random
+byte string, so that millions of them are provisioned in bounded memory. A chunk is written as one JSON-lines or
+BSON file per collection (`<collection>/part-00000.jsonl`, for `mongoimport` / `mongorestore`), or inserted with
+`insert_many` into any pymongo compatible database.
+"""
+import json
+import os
+import re
+import random
+import secrets
+import struct
+
+from network.backends import DiskBackend
+from network.telemetry import logger, telemetry
+
+AUTHENTICATION_SUBSCRIPTION = "subscriptionData.authenticationData.authenticationSubscription"
+AM_DATA = "subscriptionData.provisionedData.amData"
+SM_DATA = "subscriptionData.provisionedData.smData"
+SMF_SELECTION_DATA = "subscriptionData.provisionedData.smfSelectionSubscriptionData"
+AM_POLICY_DATA = "policyData.ues.amData"
+SM_POLICY_DATA = "policyData.ues.smData"
+COLLECTIONS = (AUTHENTICATION_SUBSCRIPTION, AM_DATA, SM_DATA, SMF_SELECTION_DATA, AM_POLICY_DATA, SM_POLICY_DATA)
+
+SUBSCRIBER_FORMATS = ("jsonl", "bson")
+
+# Placeholders of the per-subscriber values in the encoded documents of a slice, as long as the values themselves
+# so that the BSON lengths stay right: a SUPI always has 15 digits, K and OPc 32 hex digits.
+_SUPI_PLACEHOLDER = "imsi-" + "S" * 15
+_KEY_PLACEHOLDER = "K" * 32
+_OPC_PLACEHOLDER = "O" * 32
+_PLACEHOLDERS = re.compile(b"(" + b"|".join(placeholder.encode() for placeholder in (
+    _SUPI_PLACEHOLDER, _KEY_PLACEHOLDER, _OPC_PLACEHOLDER)) + b")")
+_JSON_ENCODER = json.JSONEncoder(separators=(",", ":"))
+
+
+def encode_bson(document):
+    """
+    Minimal BSON encoder for the subscriber documents: dict, list, str, bool, int, float and None values.
+    :return: the encoded document
+    """
+    body = bytearray()
+    for key, value in document.items():
+        name = key.encode() + b"\x00"
+        if isinstance(value, bool):
+            body += b"\x08" + name + (b"\x01" if value else b"\x00")
+        elif isinstance(value, int):
+            if -2 ** 31 <= value < 2 ** 31:
+                body += b"\x10" + name + struct.pack("<i", value)
+            else:
+                body += b"\x12" + name + struct.pack("<q", value)
+        elif isinstance(value, float):
+            body += b"\x01" + name + struct.pack("<d", value)
+        elif isinstance(value, str):
+            data = value.encode()
+            body += b"\x02" + name + struct.pack("<i", len(data) + 1) + data + b"\x00"
+        elif isinstance(value, dict):
+            body += b"\x03" + name + encode_bson(value)
+        elif isinstance(value, (list, tuple)):
+            body += b"\x04" + name + encode_bson({str(index): item for index, item in enumerate(value)})
+        elif value is None:
+            body += b"\x0a" + name
+        else:
+            raise TypeError(f"Cannot encode {type(value).__name__} value of '{key}' as BSON")
+    return struct.pack("<i", len(body) + 5) + bytes(body) + b"\x00"
+
+
+def snssai_key(nssai):
+    """
+    :return: the S-NSSAI as a key of the SMF selection and SM policy data, e.g. `01010203`
+    """
+    return f"{nssai.sst:02x}{nssai.sd}"
+
+
+class SubscriberGenerator:
+    def __init__(self, plmn, slices, counts, start_msin=1, seed=None, chunk_size=10000, sqn="000000000023",
+                 amf="8000", ue_ambr=("1 Gbps", "2 Gbps"), session_ambr=("1000 Mbps", "1000 Mbps"), qos_5qi=9,
+                 shared_keys=False):
+        """
+        :param plmn: PLMN of the SUPIs
+        :param slices: list of (S-NSSAI, list of DNN names), see `slices_of`
+        :param counts: number of subscribers of each slice, or a total split evenly between the slices
+        :param start_msin: MSIN of the first subscriber
+        :param seed: seed of the keys, random keys when None. The keys of a seed also depend on `chunk_size`.
+        :param chunk_size: subscribers generated and written at once
+        :param sqn: initial sequence number of the authentication subscription
+        :param amf: authentication management field
+        :param ue_ambr: (uplink, downlink) subscribed UE AMBR
+        :param session_ambr: (uplink, downlink) session AMBR of every DNN
+        :param qos_5qi: 5QI of the default QoS flow
+        :param shared_keys: give the subscribers of a slice the same K and OPc, see `slice_keys`. UERANSIM starts
+                            a range of UEs (`nr-ue -n`) with the credentials of the first one.
+        """
+        if not slices:
+            raise ValueError("No slice to provision subscribers for")
+        if isinstance(counts, int):
+            counts = [counts // len(slices) + (index < counts % len(slices)) for index in range(len(slices))]
+        if len(counts) != len(slices):
+            raise ValueError(f"{len(counts)} subscriber counts for {len(slices)} slices")
+        self.plmn = plmn
+        self.slices = slices
+        self.counts = list(counts)
+        self.start_msin = start_msin
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.sqn = sqn
+        self.amf = amf
+        self.ue_ambr = ue_ambr
+        self.session_ambr = session_ambr
+        self.qos_5qi = qos_5qi
+        self.shared_keys = shared_keys
+        # slice index -> (K, OPc) shared by its subscribers
+        self._slice_keys = {}
+        self.msin_digits = 15 - len(plmn.mcc) - len(plmn.mnc)
+        # (slice index, format) -> {collection: template}
+        self._templates = {}
+        if start_msin + sum(self.counts) > 10 ** self.msin_digits:
+            raise ValueError(f"{sum(self.counts)} subscribers from MSIN {start_msin} overflow "
+                             f"{self.msin_digits} digits")
+
+    @classmethod
+    def slices_of(cls, slice_net):
+        """
+        :return: PLMN and list of (S-NSSAI, DNN names) of the slices the SMFs of `slice_net` serve
+        """
+        dnns = {}
+        for smf in slice_net.smf_list:
+            for snssai_info in smf.snssai_infos:
+                names = dnns.setdefault(snssai_info.snssai, [])
+                names.extend(dnn_info.dnn for dnn_info in snssai_info.dnn_infos if dnn_info.dnn not in names)
+        return slice_net.smf_list[0].plmns[0], list(dnns.items())
+
+    @classmethod
+    def from_slice_net(cls, slice_net, counts, **kwargs):
+        plmn, slices = cls.slices_of(slice_net)
+        return cls(plmn, slices, counts, **kwargs)
+
+    def ranges(self):
+        """
+        :return: list of (S-NSSAI, DNN names, first SUPI, number of subscribers) of every slice
+        """
+        result = []
+        msin = self.start_msin
+        for (nssai, dnns), count in zip(self.slices, self.counts):
+            result.append((nssai, dnns, self.supi(msin), count))
+            msin += count
+        return result
+
+    def supi(self, msin):
+        return f"imsi-{self.plmn.mcc}{self.plmn.mnc}{msin:0{self.msin_digits}d}"
+
+    def slice_keys(self, slice_index):
+        """
+        :return: (K, OPc) of the subscribers of a slice with `shared_keys`, the same for every call
+        """
+        if slice_index not in self._slice_keys:
+            if self.seed is None:
+                keys = secrets.token_hex(32)
+            else:
+                keys = random.Random(f"{self.seed}-{slice_index}").randbytes(32).hex()
+            self._slice_keys[slice_index] = keys[:32], keys[32:]
+        return self._slice_keys[slice_index]
+
+    def iter_chunks(self):
+        """
+        Yield the subscribers chunk by chunk, as lists of (SUPI, slice index, K, OPc).
+        """
+        msin = self.start_msin
+        for slice_index, count in enumerate(self.counts):
+            for start in range(0, count, self.chunk_size):
+                size = min(self.chunk_size, count - start)
+                if self.shared_keys:
+                    keys = "".join(self.slice_keys(slice_index)) * size
+                elif self.seed is None:
+                    keys = secrets.token_hex(32 * size)
+                else:
+                    keys = random.Random(f"{self.seed}-{slice_index}-{start}").randbytes(32 * size).hex()
+                prefix = f"imsi-{self.plmn.mcc}{self.plmn.mnc}"
+                first = msin + start
+                yield [(f"{prefix}{first + index:0{self.msin_digits}d}", slice_index,
+                        keys[64 * index:64 * index + 32], keys[64 * index + 32:64 * index + 64])
+                       for index in range(size)]
+            msin += count
+
+    def documents(self, chunk):
+        """
+        :param chunk: subscribers yielded by `iter_chunks`
+        :return: dict of collection -> documents of the chunk
+        """
+        serving_plmn = f"{self.plmn.mcc}{self.plmn.mnc}"
+        documents = {collection: [] for collection in COLLECTIONS}
+        slice_documents = {}
+        for supi, slice_index, key, opc in chunk:
+            if slice_index not in slice_documents:
+                slice_documents[slice_index] = self._slice_documents(slice_index)
+            am_data, sm_data, smf_selection, sm_policy = slice_documents[slice_index]
+            documents[AUTHENTICATION_SUBSCRIPTION].append({
+                "ueId": supi,
+                "authenticationMethod": "5G_AKA",
+                "permanentKey": {"permanentKeyValue": key, "encryptionKey": 0, "encryptionAlgorithm": 0},
+                "sequenceNumber": self.sqn,
+                "authenticationManagementField": self.amf,
+                "milenage": {"op": {"opValue": "", "encryptionKey": 0, "encryptionAlgorithm": 0}},
+                "opc": {"opcValue": opc, "encryptionKey": 0, "encryptionAlgorithm": 0},
+            })
+            documents[AM_DATA].append(dict(am_data, ueId=supi, servingPlmnId=serving_plmn))
+            documents[SM_DATA].append(dict(sm_data, ueId=supi, servingPlmnId=serving_plmn))
+            documents[SMF_SELECTION_DATA].append(dict(smf_selection, ueId=supi, servingPlmnId=serving_plmn))
+            documents[AM_POLICY_DATA].append({"ueId": supi, "subscCats": ["free5gc"]})
+            documents[SM_POLICY_DATA].append(dict(sm_policy, ueId=supi))
+        return documents
+
+    def _slice_documents(self, slice_index):
+        """
+        :return: the parts of the AM, SM, SMF selection and SM policy documents shared by the subscribers of a slice
+        """
+        nssai, dnns = self.slices[slice_index]
+        snssai = {"sst": nssai.sst, "sd": nssai.sd}
+        uplink, downlink = self.ue_ambr
+        am_data = {
+            "gpsis": [],
+            "subscribedUeAmbr": {"uplink": uplink, "downlink": downlink},
+            "nssai": {"defaultSingleNssais": [snssai], "singleNssais": [snssai]},
+        }
+        uplink, downlink = self.session_ambr
+        dnn_configurations = {dnn: {
+            "pduSessionTypes": {"defaultSessionType": "IPV4", "allowedSessionTypes": ["IPV4"]},
+            "sscModes": {"defaultSscMode": "SSC_MODE_1", "allowedSscModes": ["SSC_MODE_2", "SSC_MODE_3"]},
+            "5gQosProfile": {"5qi": self.qos_5qi, "arp": {"priorityLevel": 8, "preemptCap": "", "preemptVuln": ""},
+                             "priorityLevel": 8},
+            "sessionAmbr": {"uplink": uplink, "downlink": downlink},
+        } for dnn in dnns}
+        sm_data = {"singleNssai": snssai, "dnnConfigurations": dnn_configurations}
+        smf_selection = {"subscribedSnssaiInfos": {snssai_key(nssai): {"dnnInfos": [{"dnn": dnn} for dnn in dnns]}}}
+        sm_policy = {"smPolicySnssaiData": {snssai_key(nssai): {
+            "snssai": snssai, "smPolicyDnnData": {dnn: {"dnn": dnn} for dnn in dnns}}}}
+        return am_data, sm_data, smf_selection, sm_policy
+
+    @classmethod
+    def encode(cls, documents, output_format):
+        if output_format == "jsonl":
+            return "".join(_JSON_ENCODER.encode(document) + "\n" for document in documents).encode()
+        if output_format == "bson":
+            return b"".join(encode_bson(document) for document in documents)
+        raise ValueError(f"Unknown subscriber format {output_format}, expected one of {SUBSCRIBER_FORMATS}")
+
+    def encode_chunk(self, chunk, output_format):
+        """
+        Encode the documents of a chunk without building them: the documents of a slice are encoded once with
+        placeholders, then only the SUPI, K and OPc of every subscriber are filled in.
+        :return: dict of collection -> encoded documents of the chunk
+        """
+        encoded = {collection: [] for collection in COLLECTIONS}
+        for supi, slice_index, key, opc in chunk:
+            templates = self._templates.get((slice_index, output_format))
+            if templates is None:
+                templates = self._templates[slice_index, output_format] = self._slice_templates(slice_index,
+                                                                                               output_format)
+            values = {b"supi": supi.encode(), b"key": key.encode(), b"opc": opc.encode()}
+            for collection, template in templates.items():
+                encoded[collection].append(template % values)
+        return {collection: b"".join(parts) for collection, parts in encoded.items()}
+
+    def _slice_templates(self, slice_index, output_format):
+        """
+        :return: dict of collection -> bytes %-format of the encoded document of a subscriber of the slice
+        """
+        placeholders = {_SUPI_PLACEHOLDER.encode(): b"%(supi)b", _KEY_PLACEHOLDER.encode(): b"%(key)b",
+                        _OPC_PLACEHOLDER.encode(): b"%(opc)b"}
+        documents = self.documents([(_SUPI_PLACEHOLDER, slice_index, _KEY_PLACEHOLDER, _OPC_PLACEHOLDER)])
+        templates = {}
+        for collection, documents in documents.items():
+            parts = _PLACEHOLDERS.split(self.encode(documents, output_format))
+            templates[collection] = b"".join(placeholders[part] if index % 2 else part.replace(b"%", b"%%")
+                                             for index, part in enumerate(parts))
+        return templates
+
+    def write(self, path, output_format="jsonl", backend=None):
+        """
+        Write one file per chunk and collection under `path`.
+        :param backend: OutputBackend, the local disk when None
+        :return: number of subscribers written
+        """
+        if output_format not in SUBSCRIBER_FORMATS:
+            raise ValueError(f"Unknown subscriber format {output_format}, expected one of {SUBSCRIBER_FORMATS}")
+        backend = backend if backend is not None else DiskBackend()
+        total = 0
+        with telemetry.span("subscribers", format=output_format):
+            for part, chunk in enumerate(self.iter_chunks()):
+                for collection, data in self.encode_chunk(chunk, output_format).items():
+                    backend.write_bytes(data, os.path.join(path, collection, f"part-{part:05d}.{output_format}"))
+                total += len(chunk)
+                telemetry.count("subscribers_generated", len(chunk))
+        logger.info("%s: %d subscriber(s) written", path, total)
+        return total
+
+    def insert(self, database):
+        """
+        Bulk insert the subscribers, one `insert_many` per chunk and collection.
+        :param database: pymongo compatible database, `database[collection].insert_many(documents)`
+        :return: number of subscribers inserted
+        """
+        total = 0
+        with telemetry.span("subscribers", format="insert"):
+            for chunk in self.iter_chunks():
+                for collection, documents in self.documents(chunk).items():
+                    database[collection].insert_many(documents, ordered=False)
+                total += len(chunk)
+                telemetry.count("subscribers_generated", len(chunk))
+        return total
@@ -0,0 +1,120 @@
+"""
+Timing and counters of the generator.
+
+Stages and NF constructions are wrapped in named spans, aggregated per (name, labels) so memory stays bounded
+whatever the topology size, and the generator counts the files, bytes and templates it handles.
+Extra sinks can subscribe to every event, and the aggregates can be exported as JSON or as a Prometheus textfile.
+Log messages go to the `slicenet` logger, which stays quiet unless the application configures logging.
+"""
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger("slicenet")
+
+
+class Telemetry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listeners = []
+        self.spans = {}
+        self.counters = {}
+
+    def subscribe(self, listener):
+        """
+        :param listener: called as listener(kind, name, labels, value) for every finished span (kind "span",
+                         value in seconds) and every counter increment (kind "counter")
+        :return: None
+        """
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        self._listeners.remove(listener)
+
+    def _notify(self, kind, name, labels, value):
+        for listener in self._listeners:
+            listener(kind, name, labels, value)
+
+    @contextlib.contextmanager
+    def span(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_span(name, time.perf_counter() - start, **labels)
+
+    def record_span(self, name, seconds, count=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            total_count, total, maximum = self.spans.get(key, (0, 0.0, 0.0))
+            self.spans[key] = (total_count + count, total + seconds, max(maximum, seconds))
+        self._notify("span", name, labels, seconds)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+        self._notify("counter", name, {}, value)
+
+    def reset(self):
+        with self._lock:
+            self.spans.clear()
+            self.counters.clear()
+
+    def to_dict(self):
+        with self._lock:
+            spans = [{"name": name, "labels": dict(labels), "count": count, "seconds_total": total,
+                      "seconds_max": maximum}
+                     for (name, labels), (count, total, maximum) in sorted(self.spans.items())]
+            return {"spans": spans, "counters": dict(sorted(self.counters.items()))}
+
+    def merge(self, data):
+        """
+        Add the aggregates exported by `to_dict`, e.g. from a worker process.
+        """
+        with self._lock:
+            for span in data["spans"]:
+                key = (span["name"], tuple(sorted(span["labels"].items())))
+                count, total, maximum = self.spans.get(key, (0, 0.0, 0.0))
+                self.spans[key] = (count + span["count"], total + span["seconds_total"],
+                                   max(maximum, span["seconds_max"]))
+            for name, value in data["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def export_json(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+    def export_prometheus(self, path, prefix="slicenet"):
+        """
+        Write the aggregates in the Prometheus text format, for the node exporter textfile collector.
+        The file is written aside and renamed, so the collector never reads a partial file.
+        """
+        data = self.to_dict()
+        lines = [f"# HELP {prefix}_span_seconds_total Total time spent in a generator span.",
+                 f"# TYPE {prefix}_span_seconds_total counter"]
+        lines += [f"{prefix}_span_seconds_total{_labels(span)} {span['seconds_total']:.6f}" for span in data["spans"]]
+        lines += [f"# HELP {prefix}_span_count_total Number of times a generator span ran.",
+                  f"# TYPE {prefix}_span_count_total counter"]
+        lines += [f"{prefix}_span_count_total{_labels(span)} {span['count']}" for span in data["spans"]]
+        lines += [f"# HELP {prefix}_span_seconds_max Longest run of a generator span.",
+                  f"# TYPE {prefix}_span_seconds_max gauge"]
+        lines += [f"{prefix}_span_seconds_max{_labels(span)} {span['seconds_max']:.6f}" for span in data["spans"]]
+        for name, value in data["counters"].items():
+            lines += [f"# TYPE {prefix}_{name}_total counter", f"{prefix}_{name}_total {value}"]
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as file:
+            file.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+
+
+def _labels(span):
+    labels = {"span": span["name"], **span["labels"]}
+    escaped = (str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+               for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+
+telemetry = Telemetry()
@@ -0,0 +1,88 @@
+import os
+import pickle
+import threading
+
+from network.telemetry import telemetry
+from network.utils import ConfigUtils
+
+project_root = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_DIR = os.path.normpath(os.path.join(project_root, "../templates/free5gc"))
+
+
+class TemplateRegistry:
+    """
+    Process-wide cache of the parsed NF templates in `templates/free5gc`.
+
+    Every template is parsed once and kept as a pickled blob, `get` hands out a
+    fresh copy by unpickling it, which is much cheaper than re-parsing the YAML.
+    An entry is reloaded when the modification time of its file changes.
+    """
+
+    def __init__(self, template_dir=TEMPLATE_DIR):
+        self.template_dir = template_dir
+        self._cache = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def template_path(self, t_type):
+        return os.path.join(self.template_dir, f"{t_type}.yaml")
+
+    def get(self, t_type):
+        """
+        :param t_type: template name, e.g. `amf` or `chart`
+        :return: a private copy of the parsed template
+        """
+        return pickle.loads(self._blob(t_type))
+
+    def _blob(self, t_type):
+        path = self.template_path(t_type)
+        mtime = os.stat(path).st_mtime_ns
+        entry = self._cache.get(t_type)
+        if entry is not None and entry[0] == mtime:
+            return entry[1]
+        with self._lock:
+            entry = self._cache.get(t_type)
+            if entry is None or entry[0] != mtime:
+                data = ConfigUtils.load_yaml(path)
+                self.loads += 1
+                telemetry.count("templates_loaded")
+                entry = (mtime, pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+                self._cache[t_type] = entry
+        return entry[1]
+
+    def preload(self):
+        for t_type in self.template_types():
+            self._blob(t_type)
+
+    def template_types(self):
+        return sorted(file_name[:-len(".yaml")] for file_name in os.listdir(self.template_dir)
+                      if file_name.endswith(".yaml"))
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def save_bundle(self, bundle_path):
+        """
+        Precompile every template of `template_dir` into a single pickle bundle.
+        :param bundle_path: path of the bundle file
+        :return: None
+        """
+        self.preload()
+        with open(bundle_path, 'wb') as file:
+            pickle.dump(dict(self._cache), file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def load_bundle(self, bundle_path):
+        """
+        Fill the cache from a bundle written by `save_bundle`. Entries whose
+        template file has changed since the bundle was built are reloaded lazily.
+        :param bundle_path: path of the bundle file
+        :return: None
+        """
+        with open(bundle_path, 'rb') as file:
+            bundle = pickle.load(file)
+        with self._lock:
+            self._cache.update(bundle)
+
+
+templates = TemplateRegistry()
@@ -0,0 +1,371 @@
+"""
+Loader of the declarative topology format of `network.json`:
+
+    {
+      "slices": {"s1": ["smf00001", "amf00001", "upf00001", ...], ...},
+      "network_functions": [{"name": "smf00001", "type": "smf", "interfaces": ["N_0", "N4_1"]}, ...]
+    }
+
+An interface is `<reference point>_<network>`, two NFs with the same interface are attached to the same network:
+an SMF controls the UPFs it shares an N4 network with, UPFs on an N3 network are reached from the gNodeB and
+UPFs sharing an N9 network are linked together. `upfb` is a branching (intermediate) UPF, `upf` an anchor UPF.
+"""
+import json
+from collections import namedtuple
+
+from network.function import AMF, AUSF, NRF, NSSF, PCF, SMF, UDM, UDR, UPF
+from network.identifiers import PLMN, Guami, TAI, NssaiInPlmn, PfcpForSMF, PfcpForUPF, DnnInfo, SnssaiInfo, \
+    DnnUpfInfo, SnssaiUpfInfo, Interface, PSAUpfNode, IUpfNode, DNN, Link
+from network.slice_nets import CommonSliceNet
+from network.utils import ConfigUtils
+
+NfSpec = namedtuple("NfSpec", ["name", "type", "interfaces"])
+
+# basic chart of every NF type, the types of the umbrella chart's own dependencies are deployed under their type
+NF_CHARTS = {
+    "amf": "free5gc-amf", "ausf": "free5gc-ausf", "nrf": "free5gc-nrf", "nssf": "free5gc-nssf",
+    "pcf": "free5gc-pcf", "smf": "free5gc-smf-ulcl", "udm": "free5gc-udm", "udr": "free5gc-udr",
+    "upf": "free5gc-upf", "upfb": "free5gc-upf",
+}
+UMBRELLA_TYPES = ("ausf", "nrf", "nssf", "udm", "udr")
+UPF_TYPES = ("upf", "upfb")
+# Deployed in the control-plane release when the output is sharded, whatever the slices they serve
+CONTROL_PLANE_TYPES = ("ausf", "chf", "mongodb", "nrf", "nssf", "udm", "udr", "webui")
+REFERENCE_POINTS = ("N", "N2", "N3", "N4", "N6", "N9")
+
+
+class TopologyError(Exception):
+    """
+    Raised with every problem found in a topology spec, `errors` lists them.
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("Invalid topology spec:\n  " + "\n  ".join(errors))
+
+
+class _JsonStream:
+    """
+    Incremental reader of a JSON document, only the value being read is kept in memory.
+    """
+
+    WHITESPACE = " \t\r\n"
+
+    def __init__(self, file, chunk_size=1 << 16):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self, size=None):
+        chunk = self.file.read(size or self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in self.WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise TopologyError([f"Malformed JSON: expected '{char}', found '{found or 'end of file'}'"])
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # a number at the end of the buffer may continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self.eof:
+                    raise TopologyError([f"Malformed JSON: {e}"])
+            # Every retry decodes the value from its start again, reading as much as is buffered keeps the number
+            # of retries logarithmic and the decoding linear in the size of the value.
+            self._fill(max(self.chunk_size, len(self.buffer) - self.pos))
+
+    def _items(self, opening, closing):
+        self.expect(opening)
+        if self.peek() == closing:
+            self.pos += 1
+            return
+        while True:
+            yield
+            separator = self.peek()
+            self.pos += 1
+            if separator == closing:
+                return
+            if separator != ",":
+                raise TopologyError([f"Malformed JSON: expected ',' or '{closing}', found '{separator}'"])
+
+    def iter_object(self):
+        """
+        Yield the keys of an object, the caller has to consume each value before asking for the next key.
+        """
+        for _ in self._items("{", "}"):
+            key = self.value()
+            self.expect(":")
+            yield key
+
+    def iter_array(self):
+        """
+        Yield once per element of an array, the caller has to consume the element.
+        """
+        yield from self._items("[", "]")
+
+
+def iter_spec(path, stream=False):
+    """
+    :param path: path of the topology spec
+    :param stream: parse the file incrementally instead of loading it at once
+    :return: generator of ("slice", name, nf names) and ("nf", nf dict) events in file order
+    """
+    with open(path, 'r') as file:
+        if not stream:
+            try:
+                data = json.load(file)
+            except json.JSONDecodeError as e:
+                raise TopologyError([f"Malformed JSON: {e}"])
+            for name, nf_names in data.get("slices", {}).items():
+                yield "slice", name, nf_names
+            for nf in data.get("network_functions", []):
+                yield "nf", nf
+            return
+        reader = _JsonStream(file)
+        for key in reader.iter_object():
+            if key == "slices":
+                for name in reader.iter_object():
+                    yield "slice", name, reader.value()
+            elif key == "network_functions":
+                for _ in reader.iter_array():
+                    yield "nf", reader.value()
+            else:
+                reader.value()
+
+
+def parse_interface(interface):
+    """
+    :param interface: e.g. "N4_1"
+    :return: ("N4", "1")
+    """
+    reference_point, _, network = interface.partition("_")
+    if reference_point not in REFERENCE_POINTS or not network:
+        raise ValueError(f"invalid interface '{interface}'")
+    return reference_point, network
+
+
+def load_topology(path, dnn_names=None, stream=False, out_path="5gc_topology", nssai_allocator=None, backend=None):
+    """
+    Build a SliceNet from a topology spec. NF names are indexed while the spec is read,
+    then every slice reference is checked against the index in a single pass.
+    :param path: path of the topology spec
+    :param dnn_names: slice name -> DNN, slices default to "internet"
+    :param stream: parse the file incrementally, for very large specs
+    :param out_path: output path of the generated charts
+    :param nssai_allocator: allocator of the slices' S-NSSAIs
+    :param backend: OutputBackend the charts are written to, the local disk by default
+    :return: TopologySliceNet
+    :raise TopologyError: listing every invalid NF and dangling reference
+    """
+    nf_specs = {}
+    slices = {}
+    errors = []
+    for event in iter_spec(path, stream):
+        if event[0] == "slice":
+            _, name, nf_names = event
+            if name in slices:
+                errors.append(f"slice '{name}' is defined twice")
+            slices[name] = nf_names
+            continue
+        nf = event[1]
+        if not isinstance(nf, dict):
+            errors.append(f"network function is not an object: {nf}")
+            continue
+        name, nf_type = nf.get("name"), nf.get("type")
+        if not name:
+            errors.append(f"network function without name: {nf}")
+            continue
+        if name in nf_specs:
+            errors.append(f"network function '{name}' is defined twice")
+        if nf_type not in NF_CHARTS:
+            errors.append(f"network function '{name}' has unknown type '{nf_type}'")
+        try:
+            interfaces = tuple(parse_interface(interface) for interface in nf.get("interfaces", []))
+        except ValueError as e:
+            errors.append(f"network function '{name}': {e}")
+            interfaces = ()
+        nf_specs[name] = NfSpec(name, nf_type, interfaces)
+    for slice_name, nf_names in slices.items():
+        for nf_name in nf_names:
+            if nf_name not in nf_specs:
+                errors.append(f"slice '{slice_name}' references unknown network function '{nf_name}'")
+    if errors:
+        raise TopologyError(errors)
+    return TopologySliceNet(nf_specs, slices, dnn_names, out_path, nssai_allocator, backend)
+
+
+class TopologySliceNet(CommonSliceNet):
+    """
+    SliceNet described by a topology spec, an NF listed in several slices is a single instance serving all of them.
+    """
+
+    def __init__(self, nf_specs, slices, dnn_names=None, path="5gc_topology", nssai_allocator=None,
+                 backend=None):
+        super().__init__(path, nssai_allocator, backend)
+        self.nf_specs = nf_specs
+        self.slices = slices
+        dnn_names = dnn_names or {}
+        self.dnn_names = {slice_name: dnn_names.get(slice_name, "internet") for slice_name in slices}
+        self.nssais = dict(zip(slices, self.nssai_allocator.allocate_many(len(slices))))
+        self.plmn = PLMN("999", "70")
+        self.supported_plmns = [self.plmn]
+        self.memberships = {name: [] for name in nf_specs}
+        for slice_name, nf_names in slices.items():
+            for nf_name in dict.fromkeys(nf_names):
+                self.memberships[nf_name].append(slice_name)
+        # spec name -> Node, and the subcharts as (basic chart, chart name, alias)
+        self.nfs = {}
+        self.sub_charts = []
+        self.umbrella_types = set()
+        self.pools = {}
+        # N4 network -> UPFs attached to it, in spec order
+        self.n4_upfs = {}
+
+        for spec in nf_specs.values():
+            if spec.type in UPF_TYPES:
+                self._add_upf(spec)
+                for network in self._networks(spec, "N4"):
+                    self.n4_upfs.setdefault(network, []).append(spec)
+        for spec in nf_specs.values():
+            if spec.type not in UPF_TYPES:
+                self._add_nf(spec)
+
+    def _networks(self, spec, reference_point):
+        return {network for point, network in spec.interfaces if point == reference_point}
+
+    def _slice_nssais(self, name):
+        return [self.nssais[slice_name] for slice_name in self.memberships[name]]
+
+    def _node_name(self, spec):
+        """
+        The first NF of a type the umbrella chart already depends on is deployed under its alias,
+        every other NF gets its own subchart named after it.
+        """
+        if spec.type in UMBRELLA_TYPES and spec.type not in self.umbrella_types:
+            self.umbrella_types.add(spec.type)
+            return spec.type
+        self.sub_charts.append((NF_CHARTS[spec.type], f"free5gc-{spec.name}", spec.name))
+        return spec.name
+
+    def _add_nf(self, spec):
+        name = self._node_name(spec)
+        nssai_in_plmns = [NssaiInPlmn(self.plmn, self._slice_nssais(spec.name))]
+        if spec.type == "amf":
+            dnns = [self.dnn_names[slice_name] for slice_name in self.memberships[spec.name]]
+            nf = AMF(name, [Guami(self.plmn, self.random_hex())], [TAI(self.plmn, self.random_hex())], nssai_in_plmns,
+                     dnns)
+            self.amf_list.append(nf)
+        elif spec.type == "ausf":
+            nf = AUSF(name, self.supported_plmns)
+            self.ausf_list.append(nf)
+        elif spec.type == "nrf":
+            nf = NRF(name, self.plmn)
+            self.nrf_list.append(nf)
+        elif spec.type == "nssf":
+            nf = NSSF(name, self.supported_plmns, nssai_in_plmns)
+            self.nssf_list.append(nf)
+        elif spec.type == "pcf":
+            nf = PCF(name)
+            self.pcf_list.append(nf)
+        elif spec.type == "smf":
+            nf = self._create_smf(spec, name)
+            self.smf_list.append(nf)
+        elif spec.type == "udm":
+            # the common UDM/UDR of CommonSliceNet take the place of the first ones of the spec
+            if name == "udm":
+                nf = self.udm_list[0]
+            else:
+                nf = UDM(name)
+                self.udm_list.append(nf)
+        else:
+            if name == "udr":
+                nf = self.udr_list[0]
+            else:
+                nf = UDR(name)
+                self.udr_list.append(nf)
+        self.nfs[spec.name] = nf
+
+    def _add_upf(self, spec):
+        name = self._node_name(spec)
+        dnns = []
+        for slice_name in self.memberships[spec.name]:
+            pool, static_pool = self.net_spliter.split()
+            self.pools[(slice_name, spec.name)] = (pool, static_pool)
+            dnns.append(DNN(self.dnn_names[slice_name], pool))
+        nf = UPF(name, PfcpForUPF(), dnns)
+        self.upf_list.append(nf)
+        self.nfs[spec.name] = nf
+
+    def _create_smf(self, spec, name):
+        slice_names = self.memberships[spec.name]
+        snssai_infos = [SnssaiInfo(self.nssais[slice_name], [DnnInfo(self.dnn_names[slice_name])])
+                        for slice_name in slice_names]
+        candidates = {}
+        for network in self._networks(spec, "N4"):
+            candidates.update(dict.fromkeys(self.n4_upfs.get(network, [])))
+        up_specs = [up_spec for up_spec in candidates if set(self.memberships[up_spec.name]) & set(slice_names)]
+        up_nodes = []
+        links = []
+        for up_spec in up_specs:
+            shared_slices = [slice_name for slice_name in self.memberships[up_spec.name] if slice_name in slice_names]
+            snssai_upf_infos = [SnssaiUpfInfo(self.nssais[slice_name],
+                                              [DnnUpfInfo(self.dnn_names[slice_name],
+                                                          *self.pools[(slice_name, up_spec.name)])])
+                                for slice_name in shared_slices]
+            dnn = self.dnn_names[shared_slices[0]]
+            interfaces = [Interface("", dnn, point) for point in ("N3", "N9") if self._networks(up_spec, point)]
+            up_name = self.nfs[up_spec.name].name
+            node_class = IUpfNode if up_spec.type == "upfb" else PSAUpfNode
+            up_nodes.append(node_class(up_name, snssai_upf_infos, interfaces))
+            if self._networks(up_spec, "N3"):
+                links.append(Link("gNB1", up_name.upper()))
+        for i, up_spec in enumerate(up_specs):
+            for peer in up_specs[i + 1:]:
+                if self._networks(up_spec, "N9") & self._networks(peer, "N9"):
+                    links.append(Link(self.nfs[up_spec.name].name.upper(), self.nfs[peer.name].name.upper()))
+        ulcl = any(up_spec.type == "upfb" for up_spec in up_specs)
+        return SMF(name, snssai_infos, self.supported_plmns, PfcpForSMF(), up_nodes, links, ulcl=ulcl)
+
+    def copy_specific_charts(self):
+        for src_chart, chart_name, _ in self.sub_charts:
+            self.copy_chart(src_chart, chart_name, rename=True)
+
+    def slice_units(self):
+        """
+        An NF serving a single slice is deployed with it, one serving several slices with the control plane.
+        """
+        units = {slice_name: [] for slice_name in self.slices}
+        for _, _, alias in self.sub_charts:
+            slice_names = self.memberships[alias]
+            if len(slice_names) == 1 and self.nf_specs[alias].type not in CONTROL_PLANE_TYPES:
+                units[slice_names[0]].append(alias)
+        return list(units.values())
+
+    def update_dependency(self):
+        for _, chart_name, alias in self.sub_charts:
+            self.dependencies.append(ConfigUtils.tpl_dependency(chart_name, alias))
@@ -0,0 +1,215 @@
+"""
+User-plane graph of an SMF: access nodes (gNBs), I-UPFs and PSA-UPFs joined by links.
+
+Links are directed from the access network towards the data networks, so that chains and trees of I-UPFs
+(ULCL / branching points) with several PSA-UPFs can be described. The graph keeps adjacency indexes in both
+directions, every check of `validate` runs in O(V + E), and the `upNodes` / `links` sections of the SMF are
+emitted from it.
+"""
+from network.identifiers import GnbNode, UpfNode, IUpfNode, PSAUpfNode, Link
+
+
+class UserPlaneError(Exception):
+    """
+    Raised with every problem found in a user-plane graph, `errors` lists them.
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("Invalid user-plane graph:\n  " + "\n  ".join(errors))
+
+
+class UserPlaneGraph:
+    def __init__(self):
+        # key -> node, in insertion order. gNBs are keyed by their name, UPFs by their upper name.
+        self.nodes = {}
+        self.successors = {}
+        self.predecessors = {}
+        self._links = []
+
+    @classmethod
+    def key(cls, node):
+        """
+        :param node: GnbNode, UpfNode or the key itself
+        :return: the name the node has in the `links` section
+        """
+        if isinstance(node, GnbNode):
+            return node.name
+        if isinstance(node, UpfNode):
+            return node.name.upper()
+        return node
+
+    def add_node(self, node):
+        """
+        :return: key of the node
+        """
+        key = self.key(node)
+        if key in self.nodes:
+            raise ValueError(f"Duplicated user-plane node {key}")
+        self.nodes[key] = node
+        self.successors.setdefault(key, [])
+        self.predecessors.setdefault(key, [])
+        return key
+
+    def add_link(self, src, dst):
+        """
+        Link two nodes, `src` being the one closer to the access network. Links to nodes that are not added
+        (yet) are accepted and reported by `validate`.
+        """
+        src, dst = self.key(src), self.key(dst)
+        self._links.append((src, dst))
+        self.successors.setdefault(src, []).append(dst)
+        self.predecessors.setdefault(dst, []).append(src)
+
+    def copy(self):
+        """
+        :return: a new graph with the same nodes and links, the nodes themselves being shared
+        """
+        graph = UserPlaneGraph()
+        for node in self.nodes.values():
+            graph.add_node(node)
+        for src, dst in self._links:
+            graph.add_link(src, dst)
+        return graph
+
+    def chain(self, *nodes):
+        """
+        Link the nodes one after the other, e.g. chain(gnb, iupf, psa_upf).
+        """
+        for src, dst in zip(nodes, nodes[1:]):
+            self.add_link(src, dst)
+
+    def gnbs(self):
+        return [key for key, node in self.nodes.items() if isinstance(node, GnbNode)]
+
+    def up_nodes(self):
+        return [node for node in self.nodes.values() if isinstance(node, UpfNode)]
+
+    def links(self):
+        return [Link(src, dst) for src, dst in self._links]
+
+    def branching_points(self):
+        """
+        :return: keys of the UPFs forwarding to several UPFs
+        """
+        return [key for key, node in self.nodes.items()
+                if isinstance(node, UpfNode) and len(self.successors[key]) > 1]
+
+    @classmethod
+    def serves(cls, node, dnn):
+        return dnn is None or any(dnn_upf_info.dnn == dnn for snssai_upf_info in node.snssai_upf_infos
+                                  for dnn_upf_info in snssai_upf_info.dnn_upf_infos)
+
+    def validate(self):
+        """
+        Check that every link joins known nodes, that no gNB is reached through a link, that the graph has
+        no cycle, and that every UPF is reachable from a gNB and leads to a PSA-UPF.
+        :return: None
+        :raise UserPlaneError: listing every problem
+        """
+        errors = []
+        seen_links = set()
+        for src, dst in self._links:
+            for end in (src, dst):
+                if end not in self.nodes:
+                    errors.append(f"link {src} - {dst} references unknown node {end}")
+            if src == dst:
+                errors.append(f"link {src} - {dst} loops on itself")
+            if (src, dst) in seen_links:
+                errors.append(f"link {src} - {dst} is duplicated")
+            seen_links.add((src, dst))
+            if isinstance(self.nodes.get(dst), GnbNode):
+                errors.append(f"link {src} - {dst} enters gNB {dst}, gNBs only start paths")
+        gnbs = self.gnbs()
+        if not gnbs:
+            errors.append("no gNB")
+        errors.extend(self._cycles())
+
+        reachable = set(gnbs)
+        pending = list(gnbs)
+        while pending:
+            for successor in self.successors[pending.pop()]:
+                if successor in self.nodes and successor not in reachable:
+                    reachable.add(successor)
+                    pending.append(successor)
+        # Nodes from which a PSA-UPF can be reached, walking the links backwards from every PSA-UPF.
+        leads_to_psa = {key for key, node in self.nodes.items() if isinstance(node, PSAUpfNode)}
+        pending = list(leads_to_psa)
+        while pending:
+            for predecessor in self.predecessors[pending.pop()]:
+                if predecessor in self.nodes and predecessor not in leads_to_psa:
+                    leads_to_psa.add(predecessor)
+                    pending.append(predecessor)
+        for key, node in self.nodes.items():
+            if isinstance(node, GnbNode):
+                if key not in leads_to_psa:
+                    errors.append(f"gNB {key} reaches no PSA-UPF")
+                continue
+            if key not in reachable:
+                errors.append(f"{node.t_type} {key} is not reachable from any gNB")
+            if isinstance(node, IUpfNode) and key not in leads_to_psa:
+                errors.append(f"I-UPF {key} leads to no PSA-UPF")
+        if errors:
+            raise UserPlaneError(errors)
+
+    def _cycles(self):
+        """
+        Iterative depth-first search, every back edge closes a cycle.
+        :return: one error per cycle found
+        """
+        errors = []
+        state = {}
+        for root in self.nodes:
+            if root in state:
+                continue
+            state[root] = "open"
+            path = [root]
+            stack = [iter(self.successors[root])]
+            while stack:
+                successor = next(stack[-1], None)
+                if successor is None:
+                    state[path.pop()] = "done"
+                    stack.pop()
+                elif successor not in self.nodes:
+                    continue
+                elif state.get(successor) == "open":
+                    cycle = path[path.index(successor):] + [successor]
+                    errors.append("cycle " + " -> ".join(cycle))
+                elif successor not in state:
+                    state[successor] = "open"
+                    path.append(successor)
+                    stack.append(iter(self.successors[successor]))
+        return errors
+
+    def paths(self, gnb, dnn=None):
+        """
+        :param gnb: GnbNode or its name
+        :param dnn: only the PSA-UPFs serving this DNN, any when None
+        :return: every path from the gNB to a PSA-UPF, as lists of node keys
+        """
+        gnb = self.key(gnb)
+        paths = []
+        path = [gnb]
+        on_path = {gnb}
+        stack = [iter(self.successors.get(gnb, []))]
+        while stack:
+            successor = next(stack[-1], None)
+            if successor is None:
+                stack.pop()
+                on_path.discard(path.pop())
+                continue
+            node = self.nodes.get(successor)
+            if node is None or successor in on_path:
+                continue
+            if isinstance(node, PSAUpfNode) and self.serves(node, dnn):
+                paths.append(path + [successor])
+            path.append(successor)
+            on_path.add(successor)
+            stack.append(iter(self.successors[successor]))
+        return paths
+
+    def all_paths(self, dnn=None):
+        """
+        :return: dict of gNB name -> its paths to the PSA-UPFs serving `dnn`
+        """
+        return {gnb: self.paths(gnb, dnn) for gnb in self.gnbs()}
@@ -1,39 +1,208 @@
+import errno
+import functools
 import os.path
 import secrets
 import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 import yaml
 
+from network.telemetry import logger, telemetry
+
+try:
+    from yaml import CSafeLoader as YamlLoader, CSafeDumper as _SafeDumper
+except ImportError:
+    from yaml import SafeLoader as YamlLoader, SafeDumper as _SafeDumper
+
+
+class _NoAliasDumper:
+    # Identifiers share their cached dicts between NFs, every occurrence is written in full instead of as an alias.
+    def ignore_aliases(self, data):
+        return True
+
+
+class YamlDumper(_NoAliasDumper, _SafeDumper):
+    pass
+
+
+class PyYamlDumper(_NoAliasDumper, yaml.SafeDumper):
+    pass
+
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+# How chart files are materialized in the output: real copies, hard links, copy-on-write clones,
+# or `auto` which tries a clone, then a hard link, then a copy.
+MATERIALIZE_STRATEGIES = ("copy", "hardlink", "reflink", "auto")
+FICLONE = 0x40049409
+# Where the NF values are written: all in the umbrella `free5gc/values.yaml`, or each NF section in the
+# values.yaml of its own subchart, the umbrella keeping the other sections and the `enabled` switches.
+VALUES_OUTPUTS = ("umbrella", "subcharts")
+
+
+class ChartCopyError(Exception):
+    """
+    Raised once all chart jobs have finished if any of them failed.
+    `failures` holds (job name, exception) pairs in submission order.
+    """
+
+    def __init__(self, failures):
+        self.failures = failures
+        message = "; ".join(f"{name}: {error}" for name, error in failures)
+        super().__init__(f"{len(failures)} chart job(s) failed: {message}")
+
 
 class ConfigUtils:
+    # devices of the basic charts on which copy-on-write clones failed, not tried again
+    _no_reflink_devices = set()
+
     @classmethod
     def list2dict(cls, config_list):
         return [item.to_dict() for item in config_list]
 
     @classmethod
-    def load_yaml(cls, file_path):
+    def merge_values(cls, defaults, values):
+        """
+        Merge `values` over `defaults` the way Helm coalesces chart values: maps are merged recursively,
+        any other value replaces the default one and a null value removes the key.
+        :return: a new dict, the untouched sub-trees of `defaults` are shared with it
+        """
+        merged = dict(defaults)
+        for key, value in values.items():
+            if value is None:
+                merged.pop(key, None)
+            elif isinstance(value, dict) and isinstance(merged.get(key), dict):
+                merged[key] = cls.merge_values(merged[key], value)
+            else:
+                merged[key] = value
+        return merged
+
+    @classmethod
+    def load_yaml(cls, file_path, loader=YamlLoader):
+        """
+        Load a yaml file, using the libyaml based loader when PyYAML was built with it.
+        """
         with open(file_path, 'r') as file:
-            data = yaml.safe_load(file)
+            data = yaml.load(file, Loader=loader)
         return data
 
     @classmethod
-    def write_yaml(cls, data, file_path):
-        # Dumper.ignore_aliases = lambda self, data: True
-        with open(file_path, 'w') as file:
-            yaml.dump(data, file, default_flow_style=False, sort_keys=False)
+    def dump_yaml(cls, data, stream=None, dumper=YamlDumper):
+        """
+        Serialize `data` keeping the insertion order of the keys. Returns the yaml text when `stream` is None.
+        """
+        return yaml.dump(data, stream, Dumper=dumper, default_flow_style=False, sort_keys=False)
+
+    @classmethod
+    def write_yaml(cls, data, file_path, dumper=YamlDumper):
+        # Written to a new file and renamed, so a hard-linked chart file is replaced instead of modified.
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, 'w') as file:
+            cls.dump_yaml(data, file, dumper=dumper)
+        os.replace(tmp_path, file_path)
+        cls._count_written(file_path)
+
+    @classmethod
+    def write_yaml_sections(cls, sections, file_path, dumper=YamlDumper):
+        """
+        Stream a top-level mapping to `file_path` one section at a time.
+        :param sections: iterable of (key, value) pairs, consumed lazily
+        :return: None
+        """
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, 'w') as file:
+            for key, value in sections:
+                cls.dump_yaml({key: value}, file, dumper=dumper)
+        os.replace(tmp_path, file_path)
+        cls._count_written(file_path)
+
+    @classmethod
+    def write_file(cls, content, file_path):
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, 'wb') as file:
+            file.write(content)
+        os.replace(tmp_path, file_path)
+        telemetry.count("files_written")
+        telemetry.count("bytes_written", len(content))
+
+    @classmethod
+    def _count_written(cls, file_path):
+        telemetry.count("files_written")
+        telemetry.count("bytes_written", os.path.getsize(file_path))
 
     @classmethod
     def random_hex(cls, length):
-        hex_string = ''.join(secrets.choice('0123456789abcdef') for _ in range(length))
-        return hex_string
+        return secrets.token_hex((length + 1) // 2)[:length]
 
     @classmethod
-    def copy_folder(cls, src_folder, dest_folder):
+    def copy_folder(cls, src_folder, dest_folder, strategy="copy"):
+        shutil.copytree(src_folder, dest_folder, copy_function=functools.partial(cls.copy_file, strategy=strategy))
+        logger.debug("Folder '%s' successfully copied to '%s'.", src_folder, dest_folder)
+
+    @classmethod
+    def copy_file(cls, src, dest, strategy="copy"):
+        """
+        Materialize `src` at `dest` with one of MATERIALIZE_STRATEGIES. Clones and hard links fall back
+        to a plain copy when the filesystem does not support them or `dest` is on another device.
+        An existing `dest` is unlinked first, so a file shared through a hard link is never written through.
+        """
+        if strategy not in MATERIALIZE_STRATEGIES:
+            raise ValueError(f"Unknown materialize strategy '{strategy}', expected one of {MATERIALIZE_STRATEGIES}")
+        if os.path.lexists(dest):
+            os.remove(dest)
+        if strategy in ("reflink", "auto") and cls._reflink(src, dest):
+            telemetry.count("files_linked")
+            return dest
+        if strategy in ("hardlink", "auto"):
+            try:
+                os.link(src, dest)
+                telemetry.count("files_linked")
+                return dest
+            except OSError:
+                pass
+        shutil.copy2(src, dest)
+        cls._count_written(dest)
+        return dest
+
+    @classmethod
+    def _reflink(cls, src, dest):
+        if fcntl is None:
+            return False
+        src_device = os.stat(src).st_dev
+        if src_device in cls._no_reflink_devices:
+            return False
         try:
-            shutil.copytree(src_folder, dest_folder)
-            print(f"Folder '{src_folder}' successfully copied to '{dest_folder}'.")
-        except Exception as e:
-            print(f"Error copying folder: {e}")
+            with open(src, 'rb') as src_file, open(dest, 'wb') as dest_file:
+                fcntl.ioctl(dest_file.fileno(), FICLONE, src_file.fileno())
+        except OSError as e:
+            if e.errno in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL):
+                cls._no_reflink_devices.add(src_device)
+            if os.path.exists(dest):
+                os.remove(dest)
+            return False
+        shutil.copystat(src, dest)
+        return True
+
+    @classmethod
+    def run_parallel(cls, tasks, workers=DEFAULT_WORKERS):
+        """
+        Run the tasks through a bounded thread pool and wait for all of them.
+        :param tasks: list of (name, func, args) tuples
+        :param workers: maximum number of threads, 1 runs the tasks serially
+        :return: None, raises ChartCopyError listing every failed task in submission order
+        """
+        failures = []
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = [(name, executor.submit(func, *args)) for name, func, args in tasks]
+            for name, future in futures:
+                error = future.exception()
+                if error is not None:
+                    failures.append((name, error))
+        if failures:
+            raise ChartCopyError(failures)
 
     @classmethod
     def tpl_dependency(cls, chart_name, alias):
@@ -54,6 +223,6 @@ class ConfigUtils:
 
     @classmethod
     def delete_folder(cls, path):
-        print(path)
+        logger.debug("Deleting %s", path)
         if os.path.exists(path):
             shutil.rmtree(path)
@@ -2,7 +2,7 @@ import copy
 import os
 
 from network.configuration import *
-from network.identifiers import NSSAI, PLMN
+from network.identifiers import NSSAI, PLMN, NssaiAllocator
 from network.network import NetSpliter
 from network.parameters import *
 from network.utils import *
@@ -135,15 +135,7 @@ def update_values_yaml(values_yaml_path, slice_types, plmns):
         plmn_list.append(plmn)
         plmn_json_list.append(plmn.to_dict())
     values_yaml = load_yaml(values_yaml_path)
-    nssais = []
-    for seq, slice_type in enumerate(slice_types):
-        while True:
-            sst = random_nssai_sst()
-            sd = random_nssai_sd()
-            nssai = NSSAI(sst, sd)
-            if nssai not in nssais:
-                nssais.append(nssai)
-                break
+    nssais = NssaiAllocator().allocate_many(len(slice_types))
     # 2.1 设置amf配置
     nssais_list = []
     for nssai in nssais:
@@ -0,0 +1,60 @@
+import os
+import shutil
+
+import pytest
+
+from benchmark import fixture_workdir
+from network.backends import MemoryBackend
+from network.identifiers import NssaiAllocator
+from network.slice_nets import SliceNetModeOne
+
+
+def build(backend=None):
+    return SliceNetModeOne(2, ["internet", "mec"], path="out", nssai_allocator=NssaiAllocator(seed=1),
+                           backend=backend)
+
+
+def test_memory_backend_round_trip():
+    backend = MemoryBackend()
+    backend.write_bytes(b"a", "out/x/a.txt")
+    backend.write_yaml({"b": [1, 2]}, "out/x/../b.yaml")
+    backend.write_yaml_sections([("c", 1), ("d", {"e": None})], "out/y/c.yaml")
+    assert backend.list_files("out") == ["b.yaml", "x/a.txt", "y/c.yaml"]
+    assert backend.read_bytes("out/x/a.txt") == b"a"
+    assert backend.load_yaml("out/b.yaml") == {"b": [1, 2]}
+    assert backend.load_yaml("out/y/c.yaml") == {"c": 1, "d": {"e": None}}
+    assert backend.isfile("./out/x/a.txt") and not backend.isfile("out/x")
+    backend.remove_file("out/x/a.txt", "out")
+    backend.delete("out/y")
+    assert backend.list_files("out") == ["b.yaml"]
+    with pytest.raises(FileNotFoundError):
+        backend.read_bytes("out/x/a.txt")
+
+
+def test_memory_output_matches_the_disk_output():
+    with fixture_workdir(files_per_chart=2):
+        build().configure()
+        disk = {}
+        for root, _, file_names in os.walk("out"):
+            for file_name in file_names:
+                file_path = os.path.join(root, file_name)
+                with open(file_path, 'rb') as file:
+                    disk[os.path.relpath(file_path, "out")] = file.read()
+        shutil.rmtree("out")
+        backend = MemoryBackend()
+        build(backend).configure()
+        assert not os.path.exists("out")
+    assert {rel_path: backend.read_bytes(f"out/{rel_path}") for rel_path in backend.list_files("out")} == disk
+
+
+def test_incremental_generation_in_memory():
+    backend = MemoryBackend()
+    with fixture_workdir(files_per_chart=2):
+        build(backend).configure()
+        values = backend.read_bytes("out/free5gc/values.yaml")
+        build(backend).configure(incremental=True)
+        assert backend.read_bytes("out/free5gc/values.yaml") is values
+        assert ".slicenet-manifest.json" in backend.list_files("out")
+        backend.remove_file("out/free5gc/Chart.yaml", "out")
+        build(backend).configure(incremental=True)
+    assert backend.load_yaml("out/free5gc/Chart.yaml")["dependencies"]
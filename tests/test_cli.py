@@ -0,0 +1,30 @@
+import multiprocessing
+import os
+
+import pytest
+
+from network import cli
+
+
+def run_or_crash(job):
+    """
+    Stand-in for `run_job` whose worker process dies on the jobs marked `crash`.
+    """
+    if job.get("crash"):
+        os._exit(1)
+    return {"job": job, "build": 0.0, "configure": 0.0, "total": 0.0, "error": None,
+            "telemetry": cli.telemetry.to_dict()}
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="the workers have to be forked")
+def test_dead_worker_does_not_abort_the_batch(monkeypatch, capsys):
+    monkeypatch.setattr(cli, "run_job", run_or_crash)
+    monkeypatch.setattr(cli.templates, "preload", lambda: None)
+    jobs = [{"mode": 1, "slices": 1, "path": f"out{index}"} for index in range(3)]
+    jobs[1]["crash"] = True
+    results = cli.run_batch(jobs, workers=1)
+    assert results[0]["error"] is None
+    assert results[1]["error"].startswith("BrokenProcessPool")
+    assert [result["job"] for result in results] == jobs
+    cli.print_summary(results, 1.0)
+    assert "3 job(s)" in capsys.readouterr().out
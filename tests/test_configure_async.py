@@ -0,0 +1,47 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from benchmark import fixture_workdir
+from network.backends import MemoryBackend
+from network.identifiers import NssaiAllocator
+from network.slice_nets import SliceNetModeOne
+
+
+def build(backend):
+    return SliceNetModeOne(3, ["internet"] * 3, path="out", nssai_allocator=NssaiAllocator(seed=1), backend=backend)
+
+
+def test_async_output_matches_configure():
+    with fixture_workdir(files_per_chart=2):
+        expected, backend = MemoryBackend(), MemoryBackend()
+        build(expected).configure()
+        asyncio.run(build(backend).configure_async())
+    assert backend.files == expected.files
+
+
+def test_failed_render_waits_for_the_started_copies(monkeypatch):
+    slice_net = build(MemoryBackend())
+    slice_net.copy_workers = 2
+    lock = threading.Lock()
+    started, finished = [], []
+
+    def materialize_chart(src_chart, chart_name, rename):
+        with lock:
+            started.append(chart_name)
+        time.sleep(0.2 if chart_name == slice_net.chart_jobs[-1][1] else 0.001)
+        with lock:
+            finished.append(chart_name)
+
+    def render_release_files():
+        time.sleep(0.01)
+        raise RuntimeError("render failed")
+
+    monkeypatch.setattr(slice_net, "_materialize_chart", materialize_chart)
+    monkeypatch.setattr(slice_net, "render_release_files", render_release_files)
+    with pytest.raises(RuntimeError, match="render failed"):
+        asyncio.run(slice_net.configure_async())
+    # the render runs behind the copies in the pool, every copy has started and none may still be running
+    assert sorted(started) == sorted(finished) == sorted(chart_name for _, chart_name, _ in slice_net.chart_jobs)
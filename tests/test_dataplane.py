@@ -0,0 +1,48 @@
+import pytest
+import yaml
+
+from network.slice_nets import SliceNetModeOne, SliceNetModeFour
+
+
+def rendered_upf_sections(slice_net, values_output):
+    """
+    :return: dict of UPF chart alias -> its values as rendered in the output
+    """
+    slice_net.values_output = values_output
+    slice_net.collect_charts()
+    rendered = {rel_path: yaml.safe_load(content) for rel_path, content in slice_net.render_release_files().items()}
+    aliases = [upf.name for upf in slice_net.upf_list]
+    if values_output == "umbrella":
+        return {alias: rendered["free5gc/values.yaml"][alias] for alias in aliases}
+    return {alias: rendered[f"free5gc-{alias}/values.yaml"] for alias in aliases}
+
+
+@pytest.mark.parametrize("values_output", ["umbrella", "subcharts"])
+def test_profile_is_rendered_for_every_upf_of_the_slices(values_output):
+    slice_net = SliceNetModeOne(2, ["internet", "internet"])
+    assert slice_net.apply_dataplane_profiles("throughput") == {"upf1": "throughput", "upf2": "throughput"}
+    for values in rendered_upf_sections(slice_net, values_output).values():
+        assert values["dataplaneProfile"] == "throughput"
+        assert values["resources"]["limits"]["cpu"] == "4"
+
+
+@pytest.mark.parametrize("values_output", ["umbrella", "subcharts"])
+def test_mode_four_profiles_reach_the_iupf_and_psaupf_charts(values_output):
+    slice_net = SliceNetModeFour(2, ["internet", "internet"])
+    slice_net.apply_dataplane_profiles(["latency", None])
+    sections = rendered_upf_sections(slice_net, values_output)
+    assert sections["iupf1"]["dataplaneProfile"] == "latency"
+    assert sections["psaupf1"]["dataplaneProfile"] == "latency"
+    assert "dataplaneProfile" not in sections["iupf2"]
+    assert "dataplaneProfile" not in sections["psaupf2"]
+
+
+def test_profiles_by_upf_name():
+    slice_net = SliceNetModeOne(2, ["internet", "internet"])
+    assert slice_net.apply_dataplane_profiles({"upf2": "latency"}) == {"upf2": "latency"}
+
+
+def test_unknown_profile_key_is_rejected():
+    slice_net = SliceNetModeOne(2, ["internet", "internet"])
+    with pytest.raises(ValueError, match="internet"):
+        slice_net.apply_dataplane_profiles({"internet": "throughput"})
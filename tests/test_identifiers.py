@@ -0,0 +1,109 @@
+import copy
+import io
+import pickle
+
+import pytest
+
+from benchmark import fixture_workdir
+from network.backends import MemoryBackend
+from network.identifiers import NSSAI, PLMN, DnnInfo, Guami, Identifier, NssaiAllocator, NssaiSpaceExhaustedError, \
+    SnssaiInfo
+from network.sizing import SliceDemand
+from network.slice_nets import SliceNetModeOne, SliceNetModeTwo, SliceNetModeThree, SliceNetModeFour
+
+NETS = {
+    "mode1": lambda: SliceNetModeOne(2, ["internet", "mec"], backend=MemoryBackend()),
+    "mode2": lambda: SliceNetModeTwo(2, ["internet", "mec"], backend=MemoryBackend()),
+    "mode3": lambda: SliceNetModeThree(1, ["internet"], 2, backend=MemoryBackend()),
+    "mode4": lambda: SliceNetModeFour(2, ["internet", "mec"], backend=MemoryBackend()),
+}
+
+
+def test_allocator_fills_its_space_without_collisions():
+    allocator = NssaiAllocator(sst_values=[1, 2], sd_range=(0, 7), seed=3)
+    allocated = allocator.allocate_many(allocator.capacity())
+    assert len(set(allocated)) == 16
+    assert {(nssai.sst, int(nssai.sd, 16)) for nssai in allocated} == {(sst, sd) for sst in (1, 2) for sd in range(8)}
+    with pytest.raises(NssaiSpaceExhaustedError):
+        allocator.allocate()
+
+
+def test_allocator_skips_reserved_nssais():
+    allocator = NssaiAllocator(sst_values=[1], sd_range=(0, 3), seed=1)
+    allocator.reserve(NSSAI(1, "000002"))
+    assert sorted(nssai.sd for nssai in allocator.allocate_many(3)) == ["000000", "000001", "000003"]
+    with pytest.raises(NssaiSpaceExhaustedError):
+        allocator.allocate()
+
+
+def test_tenants_stay_in_their_space():
+    allocator = NssaiAllocator(seed=1)
+    allocator.add_tenant("factory", ["URLLC"], (0x100, 0x101))
+    assert {(nssai.sst, nssai.sd) for nssai in allocator.allocate_many(2, tenant="factory")} == \
+        {(2, "000100"), (2, "000101")}
+    with pytest.raises(NssaiSpaceExhaustedError):
+        allocator.allocate(tenant="factory")
+    with pytest.raises(ValueError):
+        allocator.allocate(tenant="factory", sst=1)
+    assert allocator.allocate().sst in range(1, 16)
+
+
+def test_seeded_allocators_repeat_their_sequence():
+    assert NssaiAllocator(seed=7).allocate_many(5) == NssaiAllocator(seed=7).allocate_many(5)
+
+
+def test_equal_identifiers_are_interned():
+    plmn = PLMN("999", "70")
+    assert PLMN("999", "70") is plmn
+    assert Guami(plmn, "cafe00") is Guami(PLMN("999", "70"), "cafe00")
+    assert SnssaiInfo(NSSAI(1, "000001"), [DnnInfo("internet")]) is \
+        SnssaiInfo(NSSAI(1, "000001"), (DnnInfo("internet"),))
+    assert NSSAI(1, "000001") != NSSAI(1, "000002")
+    assert NSSAI(1, "000001") != PLMN(1, "000001")
+    assert hash(NSSAI(1, "000001")) == hash(NSSAI(1, "000001"))
+    assert len({NSSAI(1, "000001"), NSSAI(1, "000001"), NSSAI(2, "000001")}) == 2
+    assert copy.deepcopy(plmn) is plmn and pickle.loads(pickle.dumps(plmn)) is plmn
+
+
+def test_identifiers_are_immutable():
+    nssai = NSSAI(1, "000001")
+    with pytest.raises(AttributeError):
+        nssai.sst = 2
+    with pytest.raises(AttributeError):
+        del nssai.sd
+    with pytest.raises(AttributeError):
+        nssai.extra = 1
+    assert nssai.sst == 1
+
+
+def cached_dicts():
+    """
+    :return: dict of (identifier, variant) -> deep copy of the dict cached by `to_dict`
+    """
+    classes, snapshot = [Identifier], {}
+    while classes:
+        cls = classes.pop()
+        classes.extend(cls.__subclasses__())
+        for instance in list(getattr(cls, "_interned", {}).values()):
+            for variant, serialized in (instance._dicts or {}).items():
+                snapshot[(instance, variant)] = copy.deepcopy(serialized)
+    return snapshot
+
+
+@pytest.mark.parametrize("mode", sorted(NETS))
+def test_generation_never_mutates_the_cached_dicts(mode):
+    with fixture_workdir(files_per_chart=1):
+        slice_net = NETS[mode]()
+        slice_net.to_dict()
+        before = cached_dicts()
+        slice_net.size_resources([SliceDemand(1000, 50, 200)] * len(slice_net.slice_nssais()))
+        slice_net.apply_dataplane_profiles("throughput")
+        for values_output, release_size in (("umbrella", None), ("subcharts", None), ("umbrella", 1)):
+            slice_net.values_output, slice_net.release_size = values_output, release_size
+            slice_net.configure()
+        slice_net.release_size = None
+        slice_net.create_ran(gnbs=None, ues=10)
+        slice_net.configure(incremental=True)
+        slice_net.package(io.BytesIO())
+        after = cached_dicts()
+    assert {key: after[key] for key in before} == before
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from benchmark import fixture_workdir
+from network.identifiers import NssaiAllocator
+from network.manifest import MANIFEST_NAME
+from network.slice_nets import SliceNetModeOne
+
+
+@pytest.fixture
+def workdir():
+    with fixture_workdir(files_per_chart=3) as root:
+        yield root
+
+
+def build(dnn_names=("internet", "internet"), materialize="copy"):
+    slice_net = SliceNetModeOne(2, list(dnn_names), path="out", nssai_allocator=NssaiAllocator(seed=1))
+    slice_net.values_output = "subcharts"
+    slice_net.materialize = materialize
+    return slice_net
+
+
+def file_stats(path="out"):
+    """
+    :return: dict of file path relative to `path` -> (mtime, inode)
+    """
+    stats = {}
+    for root, _, file_names in os.walk(path):
+        for file_name in file_names:
+            file_path = os.path.join(root, file_name)
+            stat = os.stat(file_path)
+            stats[os.path.relpath(file_path, path).replace(os.sep, "/")] = (stat.st_mtime_ns, stat.st_ino)
+    return stats
+
+
+def changed(before, after):
+    return sorted(rel_path for rel_path in before.keys() | after.keys() if before.get(rel_path) != after.get(rel_path))
+
+
+def test_unchanged_rebuilt_net_is_not_rewritten(workdir):
+    build().configure()
+    build().configure()
+    before = file_stats()
+    build().configure(incremental=True)
+    after = file_stats()
+    assert changed(before, after) == [MANIFEST_NAME]
+    build().configure(incremental=True)
+    assert changed(after, file_stats()) == []
+
+
+def test_changed_slice_only_rewrites_its_files(workdir):
+    build().configure()
+    build().configure(incremental=True)
+    before = file_stats()
+    build(["internet", "mec"]).configure(incremental=True)
+    assert changed(before, file_stats()) == [MANIFEST_NAME, "free5gc-amf/values.yaml", "free5gc-smf2/values.yaml",
+                                             "free5gc-upf2/values.yaml"]
+
+
+def test_materialize_change_relinks_the_copied_files(workdir):
+    build().configure(incremental=True)
+    copied = "free5gc-upf1/templates/resource0.yaml"
+    source = "charts/free5gc-upf/templates/resource0.yaml"
+    assert not os.path.samefile(os.path.join("out", copied), source)
+    before = file_stats()
+    build(materialize="hardlink").configure(incremental=True)
+    after = file_stats()
+    assert copied in changed(before, after)
+    assert "free5gc-upf1/values.yaml" not in changed(before, after)
+    assert os.path.samefile(os.path.join("out", copied), source)
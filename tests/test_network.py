@@ -0,0 +1,91 @@
+import ipaddress
+
+import pytest
+
+from network.network import IPPoolAllocator, NetSpliter, PoolExhaustedError
+
+
+def baseline_splits(ip_network, mask, count):
+    """
+    :return: the `split()` sequence of the former NetSpliter, which stepped from network to network
+    """
+    network = ipaddress.IPv4Network(f"{ip_network}/{mask}", strict=False)
+    splits = []
+    for _ in range(count):
+        network = ipaddress.IPv4Network((int(network.network_address) + network.num_addresses, network.prefixlen))
+        subnets = network.subnets(prefixlen_diff=4)
+        next(subnets)
+        splits.append((str(network), str(next(subnets))))
+    return splits
+
+
+@pytest.mark.parametrize("ip_network, mask", [("10.60.0.0", "16"), ("10.60.0.0", "24"), ("172.16.5.7", "20")])
+def test_split_sequence_matches_the_baseline(ip_network, mask):
+    net_spliter = NetSpliter(ip_network, mask)
+    assert [net_spliter.split() for _ in range(40)] == baseline_splits(ip_network, mask, 40)
+
+
+def test_released_pool_is_handed_out_again():
+    net_spliter = NetSpliter("10.60.0.0", "16")
+    first, _ = net_spliter.split()
+    net_spliter.split()
+    net_spliter.release(first)
+    assert net_spliter.split()[0] == first
+
+
+def test_reserve_rejects_overlaps():
+    allocator = IPPoolAllocator("10.0.0.0/16", reserved=["10.0.1.0/24"])
+    with pytest.raises(ValueError, match="overlaps"):
+        allocator.reserve("10.0.0.0/23")
+    with pytest.raises(ValueError, match="overlaps"):
+        allocator.reserve("10.0.1.128/25")
+    with pytest.raises(ValueError, match="not inside"):
+        allocator.reserve("10.1.0.0/24")
+    allocator.reserve("10.0.0.0/24")
+    assert allocator.overlaps("10.0.0.0/23")
+    assert not allocator.overlaps("10.0.2.0/23")
+
+
+def test_reserve_first_last_range():
+    allocator = IPPoolAllocator("10.0.0.0/24", reserved=["10.0.0.1-10.0.0.6"])
+    assert sorted(ipaddress.IPv4Network((addr, prefixlen)) for addr, prefixlen in allocator.reserved.items()) == \
+        [ipaddress.IPv4Network(net) for net in ("10.0.0.1/32", "10.0.0.2/31", "10.0.0.4/31", "10.0.0.6/32")]
+    assert allocator.available() == 256 - 6
+    assert allocator.allocate(32) == ipaddress.IPv4Network("10.0.0.0/32")
+    assert allocator.allocate(32) == ipaddress.IPv4Network("10.0.0.7/32")
+    with pytest.raises(ValueError, match="overlaps"):
+        allocator.reserve("10.0.0.5-10.0.0.9")
+
+
+def test_allocate_network_conflicts():
+    allocator = IPPoolAllocator("10.0.0.0/16")
+    assert allocator.allocate_network("10.0.4.0/22") == ipaddress.IPv4Network("10.0.4.0/22")
+    for network in ("10.0.4.0/22", "10.0.5.0/24", "10.0.0.0/21"):
+        with pytest.raises(ValueError, match="overlaps"):
+            allocator.allocate_network(network)
+    with pytest.raises(ValueError, match="not inside"):
+        allocator.allocate_network("10.1.0.0/24")
+    assert allocator.allocate(22) == ipaddress.IPv4Network("10.0.0.0/22")
+    assert allocator.allocate(22) == ipaddress.IPv4Network("10.0.8.0/22")
+
+
+def test_release_merges_the_buddies_back():
+    allocator = IPPoolAllocator("10.0.0.0/16", reserved=["10.0.255.0/24"])
+    available = allocator.available()
+    networks = [allocator.allocate(prefixlen) for prefixlen in (24, 20, 30, 24, 18)]
+    assert allocator.available() == available - sum(net.num_addresses for net in networks)
+    for network in reversed(networks):
+        allocator.release(network)
+    assert allocator.available() == available
+    assert allocator.allocate(17) == ipaddress.IPv4Network("10.0.0.0/17")
+    with pytest.raises(ValueError, match="not allocated"):
+        allocator.release("10.0.0.0/18")
+
+
+def test_exhausted_pool():
+    allocator = IPPoolAllocator("10.0.0.0/30")
+    assert [str(allocator.allocate(31)) for _ in range(2)] == ["10.0.0.0/31", "10.0.0.2/31"]
+    with pytest.raises(PoolExhaustedError):
+        allocator.allocate(32)
+    with pytest.raises(ValueError):
+        allocator.allocate(29)
@@ -0,0 +1,61 @@
+import io
+import tarfile
+
+import pytest
+
+from benchmark import fixture_workdir
+from network.identifiers import NssaiAllocator
+from network.slice_nets import SliceNetModeOne
+
+
+@pytest.fixture
+def workdir():
+    with fixture_workdir(files_per_chart=1) as root:
+        yield root
+
+
+def build():
+    return SliceNetModeOne(3, ["internet"] * 3, path="out", nssai_allocator=NssaiAllocator(seed=1))
+
+
+def members(archive):
+    with tarfile.open(fileobj=io.BytesIO(archive.getvalue()), mode="r:gz") as tar:
+        return {member.name: member for member in tar.getmembers()}
+
+
+def test_single_release_layout(workdir):
+    archive = io.BytesIO()
+    build().configure(archive=archive)
+    names = members(archive)
+    assert "free5gc/Chart.yaml" in names and "free5gc/values.yaml" in names
+    assert "free5gc/charts/free5gc-upf3/templates/resource0.yaml" in names
+    assert "free5gc/charts/free5gc-upf3/Chart.yaml" in names
+    assert {name.split("/")[0] for name in names} == {"free5gc"}
+    assert not any(name.startswith("free5gc/charts/free5gc/") for name in names)
+
+
+def test_sharded_releases_layout(workdir):
+    slice_net = build()
+    slice_net.release_size = 2
+    with pytest.raises(ValueError, match="dict of release chart folder"):
+        slice_net.configure(archive=io.BytesIO())
+    archives = {"free5gc": io.BytesIO(), "free5gc-slices1": io.BytesIO(), "free5gc-slices2": io.BytesIO()}
+    slice_net.configure(archive=archives)
+    control_plane = members(archives["free5gc"])
+    assert "free5gc/charts/free5gc-amf/Chart.yaml" in control_plane
+    assert not any("upf" in name for name in control_plane)
+    assert {name.split("/")[2] for name in members(archives["free5gc-slices2"]) if name.count("/") > 2} == \
+        {"common", "free5gc-smf3", "free5gc-upf3"}
+    assert "free5gc-slices1/values.yaml" in members(archives["free5gc-slices1"])
+
+
+def test_archives_are_reproducible(workdir, monkeypatch):
+    first, second = io.BytesIO(), io.BytesIO()
+    build().configure(archive=first)
+    build().configure(archive=second)
+    assert first.getvalue() == second.getvalue()
+    assert {member.mtime for member in members(first).values()} == {0}
+    monkeypatch.setenv("SOURCE_DATE_EPOCH", "1700000000")
+    third = io.BytesIO()
+    build().configure(archive=third)
+    assert {member.mtime for member in members(third).values()} == {1700000000}
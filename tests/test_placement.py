@@ -0,0 +1,30 @@
+import random
+
+import pytest
+
+from network import placement
+from network.placement import UpfPlacement
+
+
+def random_placement(gnbs=200, sites=30):
+    rng = random.Random(1)
+    gnb_points = [(rng.random(), rng.random()) for _ in range(gnbs)]
+    site_points = [(rng.random(), rng.random()) for _ in range(sites)]
+    latency = [[100 * ((gx - sx) ** 2 + (gy - sy) ** 2) ** 0.5 for sx, sy in site_points] for gx, gy in gnb_points]
+    return UpfPlacement([f"gnb{i + 1}" for i in range(gnbs)], [f"site{j + 1}" for j in range(sites)], latency,
+                        [2 * gnbs // 8 + 1] * sites)
+
+
+@pytest.mark.skipif(placement.np is None, reason="NumPy is not installed")
+def test_numpy_and_pure_python_placements_agree(monkeypatch):
+    with_numpy = random_placement().solve(8)
+    monkeypatch.setattr(placement, "np", None)
+    assert random_placement().solve(8) == with_numpy
+
+
+def test_placement_respects_capacity():
+    result = random_placement()
+    areas = result.solve(8)
+    assert len(areas) <= 8
+    assert all(len(gnbs) <= 2 * 200 // 8 + 1 for _, gnbs in areas)
+    assert sorted(gnb for _, gnbs in areas for gnb in gnbs) == sorted(result.gnbs)
@@ -0,0 +1,63 @@
+import pytest
+
+from network.slice_nets import SliceNetModeOne, SliceNetModeThree, SliceNetModeFour
+
+
+def smf_links(slice_net):
+    return {smf.name: list(smf.links) for smf in slice_net.smf_list}
+
+
+def test_create_ran_can_be_called_again():
+    slice_net = SliceNetModeFour(2, ["internet", "mec"])
+    slice_net.create_ran(gnbs=3, ues=4)
+    links = smf_links(slice_net)
+    slice_net.create_ran(gnbs=3, ues=4)
+    assert smf_links(slice_net) == links
+    slice_net.create_ran(gnbs=2)
+    assert [gnb.name for gnb in slice_net.gnb_list] == ["gnb1", "gnb2"]
+    assert "gNB3" not in {link.src for links in smf_links(slice_net).values() for link in links}
+    assert slice_net.smf_list[0].user_plane.gnbs() == ["gNB1", "gNB2"]
+
+
+def test_failed_create_ran_leaves_the_net_unchanged():
+    slice_net = SliceNetModeOne(2, ["internet", "mec"])
+    slice_net.create_ran(gnbs=2, ues=4)
+    links, gnbs = smf_links(slice_net), slice_net.gnb_list
+    with pytest.raises(ValueError):
+        slice_net.create_ran(gnbs=3, ues={"gNB9": 1})
+    assert smf_links(slice_net) == links
+    assert slice_net.gnb_list is gnbs
+
+
+def test_ues_match_the_provisioned_subscribers():
+    slice_net = SliceNetModeOne(2, ["internet", "mec"])
+    generator = slice_net.create_ran(gnbs=2, ues=[3, 2], seed=1)
+    subscribers = {supi: (key, opc) for chunk in generator.iter_chunks() for supi, _, key, opc in chunk}
+    ues = {}
+    for gnb in slice_net.gnb_list:
+        for group in gnb.ue_groups:
+            first = int(group.supi[len("imsi-"):])
+            for msin in range(first, first + group.count):
+                ues[f"imsi-{msin:015d}"] = (group.key, group.opc)
+    assert ues == subscribers
+
+
+def test_ran_with_sharded_amfs_is_rejected():
+    slice_net = SliceNetModeThree(1, ["internet"], 2)
+    slice_net.release_size = 1
+    with pytest.raises(ValueError, match="amf1, amf2"):
+        slice_net.create_ran(gnbs=None, ues=2)
+    assert slice_net.gnb_list == []
+
+    slice_net.release_size = None
+    slice_net.create_ran(gnbs=None, ues=2)
+    slice_net.release_size = 1
+    with pytest.raises(ValueError, match="slice-group releases"):
+        slice_net.configure()
+
+
+def test_ran_reaches_the_shared_amf_of_sharded_slices():
+    slice_net = SliceNetModeOne(2, ["internet", "mec"])
+    slice_net.release_size = 1
+    slice_net.create_ran(gnbs=1, ues=2)
+    assert [gnb.amf_addresses for gnb in slice_net.gnb_list] == [["free5gc-amf-ngap"]]
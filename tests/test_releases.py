@@ -0,0 +1,49 @@
+import yaml
+
+from network.slice_nets import SliceNetModeOne, SliceNetModeThree
+
+
+def rendered_values(slice_net):
+    """
+    :return: dict of rendered values.yaml path -> its values
+    """
+    slice_net.collect_charts()
+    return {rel_path: yaml.safe_load(content) for rel_path, content in slice_net.render_release_files().items()
+            if rel_path.endswith("/values.yaml")}
+
+
+def test_unsharded_references_stay_empty():
+    slice_net = SliceNetModeOne(2, ["internet", "internet"])
+    values = rendered_values(slice_net)["free5gc/values.yaml"]
+    assert values["smf1"]["config"]["nrfUri"] == ""
+    assert values["pcf"]["config"]["mongodb"]["url"] == ""
+
+
+def test_slice_groups_reach_the_control_plane_release():
+    slice_net = SliceNetModeOne(3, ["internet"] * 3)
+    slice_net.release_size = 2
+    slice_net.release_name = "core"
+    values = rendered_values(slice_net)
+    assert sorted(values) == ["free5gc-slices1/values.yaml", "free5gc-slices2/values.yaml", "free5gc/values.yaml"]
+    assert sorted(values["free5gc-slices1/values.yaml"]) == ["smf1", "smf2", "upf1", "upf2"]
+    assert sorted(values["free5gc-slices2/values.yaml"]) == ["smf3", "upf3"]
+    for release_values in values.values():
+        for name, section in release_values.items():
+            config = section.get("config", {})
+            if "nrfUri" in config and name != "nrf":
+                assert config["nrfUri"] == "http://core-nrf:8000", name
+            if "url" in config.get("mongodb", {}):
+                assert config["mongodb"]["url"] == "mongodb://core-mongodb/free5gc", name
+    # the rewrite works on copies, the NF values are left as they are
+    assert slice_net.smf_list[0].values_yaml["smf"]["config"]["nrfUri"] == ""
+
+
+def test_subchart_values_of_moved_nfs_are_rewritten():
+    slice_net = SliceNetModeThree(1, ["internet"], 2)
+    slice_net.release_size = 1
+    slice_net.values_output = "subcharts"
+    values = rendered_values(slice_net)
+    assert values["free5gc-pcf2/values.yaml"]["config"]["nrfUri"] == "http://free5gc-nrf:8000"
+    assert values["free5gc-pcf2/values.yaml"]["config"]["mongodb"]["url"] == "mongodb://free5gc-mongodb/free5gc"
+    assert values["free5gc-slices2/values.yaml"] == {"amf2": {"enabled": True}, "pcf2": {"enabled": True},
+                                                     "smf2": {"enabled": True}, "upf2": {"enabled": True}}
@@ -0,0 +1,20 @@
+from network.sizing import SliceDemand
+from network.slice_nets import SliceNetModeOne, SliceNetModeFour
+
+
+def test_upfs_of_slices_with_different_demand_are_sized_apart():
+    slice_net = SliceNetModeOne(2, ["internet", "internet"])
+    report = slice_net.size_resources([SliceDemand(1000, 10, 1000), SliceDemand(1000, 10, 20000)])
+    upf1, upf2 = (dict(slice_net.iter_values())[name] for name in ("upf1", "upf2"))
+    assert upf1["replicaCount"] == 1
+    assert upf2["replicaCount"] == 4
+    assert upf1["resources"] != upf2["resources"]
+    assert report.nfs["upf1"]["demand"]["throughput_mbps"] == 1000
+    assert report.nfs["upf2"]["demand"]["throughput_mbps"] == 20000
+
+
+def test_every_upf_is_in_the_report():
+    slice_net = SliceNetModeFour(2, ["internet", "internet"])
+    report = slice_net.size_resources([SliceDemand(1000, 10, 1000)] * 2)
+    assert {upf.name for upf in slice_net.upf_list} <= set(report.nfs)
+    assert {"iupf1", "psaupf1", "iupf2", "psaupf2"} <= set(report.nfs)
@@ -0,0 +1,31 @@
+from collections import Counter
+
+import pytest
+
+from network.slice_nets import SliceNetModeOne, SliceNetModeTwo, SliceNetModeThree, SliceNetModeFour
+
+NETS = {
+    "mode1": lambda: SliceNetModeOne(2, ["internet", "internet"]),
+    "mode1_replicas": lambda: SliceNetModeOne(2, ["internet", "internet"], upf_replicas=[1, 2]),
+    "mode2": lambda: SliceNetModeTwo(2, ["internet", "internet"]),
+    "mode3": lambda: SliceNetModeThree(1, ["internet"], 2),
+    "mode4": lambda: SliceNetModeFour(2, ["internet", "internet"]),
+}
+
+
+def nf_names(slice_net):
+    """
+    :return: Counter of the names of the distinct NFs of `slice_net`, each name being a values section
+    """
+    nfs = {id(nf): nf for nf in slice_net.nf_list()}
+    return Counter(nf.name for nf in nfs.values())
+
+
+@pytest.mark.parametrize("net", sorted(NETS))
+def test_every_dependency_has_one_values_section(net):
+    slice_net = NETS[net]()
+    names = nf_names(slice_net)
+    aliases = [dependency.get("alias", dependency["name"])
+               for dependency in slice_net.release_charts()["free5gc"]["dependencies"]]
+    assert [alias for alias in aliases if alias != "common" and names[alias] != 1] == []
+    assert [name for name, count in names.items() if count != 1] == []
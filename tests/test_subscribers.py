@@ -0,0 +1,99 @@
+import json
+import struct
+
+import pytest
+
+from network.backends import MemoryBackend
+from network.identifiers import NSSAI, PLMN
+from network.subscribers import AUTHENTICATION_SUBSCRIPTION, COLLECTIONS, SubscriberGenerator, encode_bson
+
+
+def decode_bson(data, offset=0):
+    """
+    :return: (document, offset after it) of the BSON types `encode_bson` writes
+    """
+    size, = struct.unpack_from("<i", data, offset)
+    end, offset = offset + size - 1, offset + 4
+    document = {}
+    while offset < end:
+        kind, offset = data[offset], offset + 1
+        name_end = data.index(b"\x00", offset)
+        name, offset = data[offset:name_end].decode(), name_end + 1
+        if kind == 0x08:
+            value, offset = data[offset] == 1, offset + 1
+        elif kind == 0x10:
+            (value,), offset = struct.unpack_from("<i", data, offset), offset + 4
+        elif kind == 0x12:
+            (value,), offset = struct.unpack_from("<q", data, offset), offset + 8
+        elif kind == 0x01:
+            (value,), offset = struct.unpack_from("<d", data, offset), offset + 8
+        elif kind == 0x02:
+            length, = struct.unpack_from("<i", data, offset)
+            value, offset = data[offset + 4:offset + 3 + length].decode(), offset + 4 + length
+        elif kind in (0x03, 0x04):
+            value, offset = decode_bson(data, offset)
+            if kind == 0x04:
+                value = [value[str(index)] for index in range(len(value))]
+        elif kind == 0x0a:
+            value = None
+        else:
+            raise ValueError(f"unexpected BSON type {kind}")
+        document[name] = value
+    return document, end + 1
+
+
+def decode(data, output_format):
+    if output_format == "jsonl":
+        return [json.loads(line) for line in data.decode().splitlines()]
+    documents, offset = [], 0
+    while offset < len(data):
+        document, offset = decode_bson(data, offset)
+        documents.append(document)
+    return documents
+
+
+def generator(**kwargs):
+    slices = [(NSSAI(1, "000001"), ["internet"]), (NSSAI(2, "00000a"), ["internet", "mec"])]
+    return SubscriberGenerator(PLMN("999", "70"), slices, [5, 3], seed=1, chunk_size=2, **kwargs)
+
+
+def test_bson_encoding_of_every_type():
+    document = {"a": True, "b": 1, "c": 2 ** 40, "d": 1.5, "e": "é", "f": {"g": None}, "h": [1, "x", [False]]}
+    assert decode_bson(encode_bson(document)) == (document, len(encode_bson(document)))
+
+
+@pytest.mark.parametrize("output_format", ["jsonl", "bson"])
+def test_written_files_decode_to_the_documents(output_format):
+    backend = MemoryBackend()
+    subscribers = generator()
+    assert subscribers.write("subscribers", output_format, backend) == 8
+    chunks = list(subscribers.iter_chunks())
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1, 2, 1]
+    assert backend.list_files("subscribers") == sorted(f"{collection}/part-{part:05d}.{output_format}"
+                                                      for collection in COLLECTIONS for part in range(len(chunks)))
+    for part, chunk in enumerate(chunks):
+        for collection, documents in subscribers.documents(chunk).items():
+            data = backend.read_bytes(f"subscribers/{collection}/part-{part:05d}.{output_format}")
+            assert decode(data, output_format) == documents
+
+
+def test_seeded_subscribers_are_reproducible():
+    first, second = generator(), generator()
+    assert list(first.iter_chunks()) == list(second.iter_chunks())
+    supis = [supi for chunk in first.iter_chunks() for supi, *_ in chunk]
+    assert supis == [f"imsi-99970{msin:010d}" for msin in range(1, 9)]
+    assert len({key for chunk in first.iter_chunks() for _, _, key, _ in chunk}) == 8
+    shared = generator(shared_keys=True)
+    assert {(key, opc) for chunk in shared.iter_chunks() for _, index, key, opc in chunk if index == 1} == \
+        {shared.slice_keys(1)}
+
+
+def test_insert_many_per_chunk_and_collection():
+    class Collection(list):
+        def insert_many(self, documents, ordered=True):
+            self.append(documents)
+
+    database = {collection: Collection() for collection in COLLECTIONS}
+    assert generator().insert(database) == 8
+    assert [len(documents) for documents in database[AUTHENTICATION_SUBSCRIPTION]] == [2, 2, 1, 2, 1]
+    assert database[AUTHENTICATION_SUBSCRIPTION][0][0]["ueId"] == "imsi-999700000000001"
@@ -0,0 +1,78 @@
+import io
+import json
+import os
+
+import pytest
+
+from network.identifiers import NssaiAllocator
+from network.topology import TopologyError, _JsonStream, iter_spec, load_topology
+
+NETWORK_JSON = os.path.join(os.path.dirname(__file__), os.pardir, "network.json")
+
+
+def write_spec(tmp_path, spec):
+    path = tmp_path / "topology.json"
+    path.write_text(spec if isinstance(spec, str) else json.dumps(spec))
+    return str(path)
+
+
+def test_stream_and_whole_file_loading_match():
+    loaded = [load_topology(NETWORK_JSON, stream=stream, nssai_allocator=NssaiAllocator(seed=1))
+              for stream in (False, True)]
+    assert list(iter_spec(NETWORK_JSON, stream=True)) == list(iter_spec(NETWORK_JSON))
+    assert loaded[0].to_dict() == loaded[1].to_dict()
+    assert loaded[0].release_charts() == loaded[1].release_charts()
+
+
+def test_stream_reads_values_split_across_chunks():
+    document = {"slices": {"s1": ["a" * 100, "b"]}, "network_functions": [{"name": "n", "weight": 12345678}],
+                "other": [1.5, True, None]}
+    reader = _JsonStream(io.StringIO(json.dumps(document, indent=2)), chunk_size=3)
+    parsed = {}
+    for key in reader.iter_object():
+        if key == "network_functions":
+            parsed[key] = [reader.value() for _ in reader.iter_array()]
+        else:
+            parsed[key] = reader.value()
+    assert parsed == document
+
+
+def test_stream_decodes_a_large_value_a_logarithmic_number_of_times():
+    reader = _JsonStream(io.StringIO(json.dumps(["x" * 64] * 4096)), chunk_size=64)
+    decode = reader.decoder.raw_decode
+    calls = []
+    reader.decoder.raw_decode = lambda *args: calls.append(args) or decode(*args)
+    assert len(reader.value()) == 4096
+    assert len(calls) <= 20
+
+
+@pytest.mark.parametrize("stream", [False, True])
+@pytest.mark.parametrize("spec", ['{"slices": {"s1": ["smf1"]', '{"slices": [}', '{"slices" {}}', ""])
+def test_malformed_json(tmp_path, spec, stream):
+    with pytest.raises(TopologyError, match="Malformed JSON"):
+        load_topology(write_spec(tmp_path, spec), stream=stream)
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_every_invalid_network_function_is_reported(tmp_path, stream):
+    spec = {
+        "slices": {"s1": ["smf1", "amf9"]},
+        "network_functions": [
+            {"name": "smf1", "type": "smf", "interfaces": ["N4_1"]},
+            {"name": "smf1", "type": "smf", "interfaces": []},
+            {"name": "x1", "type": "mme", "interfaces": []},
+            {"type": "upf", "interfaces": []},
+            {"name": "upf1", "type": "upf", "interfaces": ["N7_1"]},
+            "upf2",
+        ],
+    }
+    with pytest.raises(TopologyError) as error:
+        load_topology(write_spec(tmp_path, spec), stream=stream)
+    assert error.value.errors == [
+        "network function 'smf1' is defined twice",
+        "network function 'x1' has unknown type 'mme'",
+        "network function without name: {'type': 'upf', 'interfaces': []}",
+        "network function 'upf1': invalid interface 'N7_1'",
+        "network function is not an object: upf2",
+        "slice 's1' references unknown network function 'amf9'",
+    ]
@@ -0,0 +1,70 @@
+import pytest
+
+from network.identifiers import DnnUpfInfo, GnbNode, Interface, IUpfNode, PSAUpfNode, SnssaiUpfInfo, NSSAI
+from network.userplane import UserPlaneError, UserPlaneGraph
+
+
+def upf(node_class, name, dnn="internet"):
+    infos = [SnssaiUpfInfo(NSSAI(1, "000001"), [DnnUpfInfo(dnn, "10.60.0.0/16", "10.60.16.0/20")])]
+    return node_class(name, infos, [Interface("", dnn)])
+
+
+def ulcl():
+    """
+    gNB1 -> IUPF -> PSAUPF1 (internet) and PSAUPF2 (mec)
+    """
+    graph = UserPlaneGraph()
+    gnb, iupf = GnbNode("gNB1"), upf(IUpfNode, "iupf")
+    psa_upfs = [upf(PSAUpfNode, "psaupf1"), upf(PSAUpfNode, "psaupf2", "mec")]
+    for node in [gnb, iupf] + psa_upfs:
+        graph.add_node(node)
+    graph.chain(gnb, iupf, psa_upfs[0])
+    graph.add_link(iupf, psa_upfs[1])
+    return graph
+
+
+def validation_errors(graph):
+    with pytest.raises(UserPlaneError) as error:
+        graph.validate()
+    return error.value.errors
+
+
+def test_valid_ulcl_graph():
+    graph = ulcl()
+    graph.validate()
+    assert graph.branching_points() == ["IUPF"]
+    assert graph.all_paths("mec") == {"gNB1": [["gNB1", "IUPF", "PSAUPF2"]]}
+    assert len(graph.all_paths()["gNB1"]) == 2
+
+
+def test_cycle_is_detected():
+    graph = ulcl()
+    extra = graph.add_node(upf(IUpfNode, "iupf2"))
+    graph.add_link("IUPF", extra)
+    graph.add_link(extra, "IUPF")
+    assert "cycle IUPF -> IUPF2 -> IUPF" in validation_errors(graph)
+
+
+def test_dangling_node_is_detected():
+    graph = ulcl()
+    graph.add_link("IUPF", "PSAUPF9")
+    graph.add_link("PSAUPF1", "gNB1")
+    assert validation_errors(graph) == ["link IUPF - PSAUPF9 references unknown node PSAUPF9",
+                                        "link PSAUPF1 - gNB1 enters gNB gNB1, gNBs only start paths",
+                                        "cycle gNB1 -> IUPF -> PSAUPF1 -> gNB1"]
+
+
+def test_unreachable_and_dead_end_upfs_are_detected():
+    graph = ulcl()
+    graph.add_node(upf(PSAUpfNode, "psaupf3"))
+    graph.add_link("gNB1", graph.add_node(upf(IUpfNode, "iupf2")))
+    assert validation_errors(graph) == ["PSA-UPF PSAUPF3 is not reachable from any gNB",
+                                        "I-UPF IUPF2 leads to no PSA-UPF"]
+
+
+def test_gnb_without_psa_upf():
+    graph = UserPlaneGraph()
+    graph.add_node(GnbNode("gNB1"))
+    assert validation_errors(graph) == ["gNB gNB1 reaches no PSA-UPF"]
+    with pytest.raises(ValueError, match="Duplicated"):
+        graph.add_node(GnbNode("gNB1"))
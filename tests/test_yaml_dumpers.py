@@ -0,0 +1,50 @@
+import os
+
+import pytest
+import yaml
+
+from benchmark import fixture_workdir
+from network.identifiers import NssaiAllocator
+from network.slice_nets import SliceNetModeOne, SliceNetModeTwo, SliceNetModeThree, SliceNetModeFour
+from network.utils import ConfigUtils, PyYamlDumper
+
+NETS = {
+    "mode1": lambda path: SliceNetModeOne(2, ["internet", "mec"], path=path, nssai_allocator=NssaiAllocator(seed=1)),
+    "mode2": lambda path: SliceNetModeTwo(2, ["internet", "mec"], path=path, nssai_allocator=NssaiAllocator(seed=1)),
+    "mode3": lambda path: SliceNetModeThree(1, ["internet"], 2, path=path, nssai_allocator=NssaiAllocator(seed=1)),
+    "mode4": lambda path: SliceNetModeFour(2, ["internet", "mec"], path=path, nssai_allocator=NssaiAllocator(seed=1)),
+}
+
+
+def read_output(path):
+    """
+    :return: dict of file path relative to `path` -> content
+    """
+    files = {}
+    for root, _, file_names in os.walk(path):
+        for file_name in file_names:
+            file_path = os.path.join(root, file_name)
+            with open(file_path, 'rb') as file:
+                files[os.path.relpath(file_path, path)] = file.read()
+    return files
+
+
+@pytest.mark.skipif(not yaml.__with_libyaml__, reason="PyYAML is built without libyaml")
+@pytest.mark.parametrize("net", sorted(NETS))
+@pytest.mark.parametrize("values_output", ["umbrella", "subcharts"])
+def test_libyaml_output_matches_the_pure_python_one(net, values_output, monkeypatch):
+    with fixture_workdir(files_per_chart=1):
+        slice_net = NETS[net]("out_c")
+        slice_net.values_output = values_output
+        slice_net.configure()
+
+        dump_yaml = ConfigUtils.dump_yaml
+        monkeypatch.setattr(ConfigUtils, "dump_yaml", classmethod(
+            lambda cls, data, stream=None, dumper=None: dump_yaml(data, stream, dumper=PyYamlDumper)))
+        slice_net = NETS[net]("out_py")
+        slice_net.values_output = values_output
+        slice_net.configure()
+
+        written_c, written_py = read_output("out_c"), read_output("out_py")
+    assert "free5gc/values.yaml" in written_c and "free5gc/Chart.yaml" in written_c
+    assert written_c == written_py